@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agrichain.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """Django's ASGI app, plus lifespan handling that closes the pooled provider clients on shutdown."""
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
+    from maps import provider_client
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await provider_client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -144,6 +144,20 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Transactions take the write lock when they begin, so concurrent
+        # read-then-write blocks (update_or_create, the database cache) wait
+        # for each other instead of failing with "database is locked"
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
+    }
+}
+
+# Shared by every worker process, so invalidating a cached map tile or farm
+# count in one is seen by all (the default LocMemCache is per process). The
+# table is created by `migrate`; point this at Redis or Memcached to scale out.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "agrichain_cache",
     }
 }
 
@@ -171,4 +185,82 @@ USE_TZ = True
 STATIC_URL = "static/"
 
 # Default primary key field type
-DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
\ No newline at end of file
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Maps provider settings
+# Thread pool used to fan out the external environment lookups of a map click
+MAPS_PROVIDER_WORKERS = 16
+# Size of the grid cells (in degrees) SoilGrids results are cached by
+SOIL_CACHE_CELL_DEG = 0.0025
+# Open-Meteo forecasts are shared per grid cell and cached for this many seconds
+OPEN_METEO_CELL_DEG = 0.1
+OPEN_METEO_CACHE_TTL = 3600
+# Offline elevation and land/water grids built by `manage.py import_terrain`
+TERRAIN_DIR = os.path.join(BASE_DIR, 'data', 'terrain')
+# Per-provider overrides for maps.provider_client, e.g.
+# {"soilgrids": {"timeout": 10, "retries": 0, "failure_threshold": 3, "reset_timeout": 60}}
+MAPS_PROVIDERS = {}
+# Serve the provider-bound map endpoints with async views (requires httpx and an ASGI server)
+MAPS_ASYNC_VIEWS = False
+# Base URL overrides for the external providers (nominatim, open_meteo, soilgrids,
+# open_elevation, sunrise_sunset). Setting MAPS_PROVIDER_STUB to the address of
+# `manage.py provider_stub` points all of them at the local replay server.
+MAPS_PROVIDER_STUB = os.environ.get('MAPS_PROVIDER_STUB')
+MAPS_PROVIDER_URLS = {
+    name: f"{MAPS_PROVIDER_STUB.rstrip('/')}/{name}"
+    for name in ['nominatim', 'open_meteo', 'soilgrids', 'open_elevation', 'sunrise_sunset']
+} if MAPS_PROVIDER_STUB else {}
+# Batch recommendation endpoint: concurrent location lookups, points per request,
+# and the grid cell size (degrees) points are deduplicated by
+MAPS_BATCH_WORKERS = 8
+MAPS_BATCH_MAX_POINTS = 1000
+MAPS_BATCH_CELL_DEG = SOIL_CACHE_CELL_DEG
+# ML models are loaded lazily on first use; set MAPS_PRELOAD_MODELS when the
+# server loads the app before forking workers so they share the loaded pages
+MAPS_PRELOAD_MODELS = os.environ.get('MAPS_PRELOAD_MODELS') == '1'
+MAPS_MODEL_MMAP_MODE = 'r'
+# Score crops with the array export of the forest (see `manage.py export_forest`)
+MAPS_ARRAY_FOREST = True
+# Per-process LRU cache of crop recommendations keyed by quantized inputs
+MAPS_RECOMMENDATION_CACHE_SIZE = 10000
+MAPS_RECOMMENDATION_CACHE_TTL = OPEN_METEO_CACHE_TTL
+# Versioned model artifacts (`manage.py model_registry`). Workers check for a
+# newly activated version every MAPS_MODEL_CHECK_INTERVAL seconds, or at once on
+# MAPS_MODEL_RELOAD_SIGNAL (installed only where the server leaves it unhandled)
+MODEL_REGISTRY_DIR = os.path.join(BASE_DIR, 'data', 'models')
+MAPS_MODEL_CHECK_INTERVAL = 5
+MAPS_MODEL_RELOAD_SIGNAL = 'SIGUSR2'
+# Grid cell size (degrees) of the per-cell crop counts used for neighbourhood
+# summaries; `manage.py crop_cells rebuild` after changing it
+MAPS_CROP_CELL_DEG = 0.02
+# Grid cell size (degrees) of the indexed Farm.cell_row/cell_col columns used by
+# bbox, radius and nearest-farm queries; run `manage.py reindex_farms` after changing it
+MAPS_FARM_CELL_DEG = 0.01
+# Map tiles (/maps/tiles/<z>/<x>/<y>/): clustered up to MAPS_TILE_CLUSTER_MAX_ZOOM
+# in MAPS_TILE_CLUSTER_GRID^2 bins, cached up to MAPS_TILE_CACHE_MAX_ZOOM
+MAPS_TILE_CLUSTER_MAX_ZOOM = 11
+MAPS_TILE_CLUSTER_GRID = 8
+MAPS_TILE_CACHE_MAX_ZOOM = 14
+MAPS_TILE_CACHE_TTL = 300
+# Delta sync (?since=<cursor> on get_farm_data and my_farms) can look back this
+# many days; `manage.py prune_tombstones` drops older deleted-farm tombstones
+MAPS_FARM_TOMBSTONE_DAYS = 30
+# Bulk farm export (maps/export/, `manage.py export_farms`). Government users
+# export the farms assigned to their profile's jurisdiction (Farm.jurisdiction).
+# MAPS_JURISDICTION_REGIONS = {"kerala": [(min_lat, min_lon, max_lat, max_lon), ...], ...}
+# replaces the built-in regions (the first listed wins overlapping borders; run
+# `manage.py reindex_farms` after changing it) and MAPS_NATIONAL_JURISDICTIONS
+# the ones exporting a whole box. Parquet needs pyarrow.
+MAPS_EXPORT_CHUNK_ROWS = 10000
+MAPS_EXPORT_STREAM_MAX_ROWS = 100000
+MAPS_EXPORT_DIR = BASE_DIR / 'data' / 'exports'
+# Background exports are run by `manage.py export_farms --run-jobs --poll 10`
+# (or --run-jobs from cron), never by web workers; True runs them in a thread
+# of the web process, for development without a runner
+MAPS_EXPORT_RUN_IN_THREAD = False
+# Running jobs with no progress for this long are requeued, at most MAPS_EXPORT_MAX_ATTEMPTS times
+MAPS_EXPORT_STALE_SECONDS = 600
+MAPS_EXPORT_MAX_ATTEMPTS = 3
+# Deltas re-send changes this many seconds before the ?since= cursor, covering
+# transactions that committed after the cursor with an earlier updated_at
+MAPS_FARM_SYNC_OVERLAP_SECONDS = 120
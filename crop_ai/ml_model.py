@@ -1,12 +1,8 @@
 # crop_ai/ml_model.py
-import joblib
-
-try:
-    crop_model = joblib.load("maps/crop_recommendation_model.pkl")
-except:
-    crop_model = None
+from maps import model_loader
 
 def recommend_crop_ml(area, climate, soil_type, nearby_crop=None, preferred_crop=None):
+    crop_model = model_loader.get_crop_model()
     if not crop_model:
         return "wheat"  # Fallback
     # Mock features for now (integrate real data later)
@@ -1,6 +1,36 @@
+import signal
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MapsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "maps"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+        from . import crop_cells, model_loader, sync, tiles
+        from .models import Farm
+
+        pre_save.connect(crop_cells.farm_pre_save, sender=Farm, dispatch_uid="maps.crop_cells.pre_save")
+        post_save.connect(crop_cells.farm_saved, sender=Farm, dispatch_uid="maps.crop_cells.saved")
+        pre_delete.connect(crop_cells.farm_pre_delete, sender=Farm, dispatch_uid="maps.crop_cells.pre_delete")
+        post_delete.connect(crop_cells.farm_deleted, sender=Farm, dispatch_uid="maps.crop_cells.deleted")
+        pre_save.connect(tiles.farm_pre_save, sender=Farm, dispatch_uid="maps.tiles.pre_save")
+        post_save.connect(tiles.farm_saved, sender=Farm, dispatch_uid="maps.tiles.saved")
+        pre_delete.connect(tiles.farm_pre_delete, sender=Farm, dispatch_uid="maps.tiles.pre_delete")
+        post_delete.connect(tiles.farm_deleted, sender=Farm, dispatch_uid="maps.tiles.deleted")
+        post_save.connect(sync.farm_saved, sender=Farm, dispatch_uid="maps.sync.saved")
+        post_delete.connect(sync.farm_deleted, sender=Farm, dispatch_uid="maps.sync.deleted")
+
+        reload_signal = getattr(settings, "MAPS_MODEL_RELOAD_SIGNAL", None)
+        if reload_signal:
+            signum = getattr(signal, reload_signal)
+            # Leave signals the server already uses alone
+            if signal.getsignal(signum) == signal.SIG_DFL:
+                model_loader.install_reload_signal(signum)
+
+        # With a preforking server loading the app before fork (gunicorn --preload),
+        # workers inherit the model pages instead of each unpickling a copy.
+        if getattr(settings, "MAPS_PRELOAD_MODELS", False):
+            model_loader.preload()
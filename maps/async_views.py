@@ -0,0 +1,187 @@
+import json
+import logging
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.contrib.auth.decorators import login_required
+from . import provider_client
+from .environment import afetch_environment
+from .models import Farm
+from .views import (
+    VALID_CROPS,
+    add_market_status,
+    estimate_crop_price,
+    get_crop_recommendations,
+    location_details_response,
+)
+
+logger = logging.getLogger(__name__)
+
+# Async versions of the map endpoints that mostly wait on external providers.
+# Under ASGI they hold no thread while waiting; maps/urls.py routes to them
+# when MAPS_ASYNC_VIEWS is enabled and the sync views in views.py remain for WSGI.
+
+available = provider_client.httpx is not None
+
+# Scoring and CSV reads are blocking, so they run in the default executor
+# rather than on the event loop.
+arecommend_crops = sync_to_async(get_crop_recommendations, thread_sensitive=False)
+aestimate_crop_price = sync_to_async(estimate_crop_price, thread_sensitive=False)
+aadd_market_status = sync_to_async(add_market_status, thread_sensitive=False)
+
+@csrf_exempt
+@login_required
+async def save_location(request):
+    """Save a farm location."""
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            latitude = float(data.get("latitude"))
+            longitude = float(data.get("longitude"))
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                return JsonResponse({"error": "Invalid coordinates"}, status=400)
+
+            env = await afetch_environment(latitude, longitude)
+            # Check if location is water
+            if env["is_water"]:
+                return JsonResponse({"error": "Cannot process request for water location"}, status=400)
+
+            soil, climate, weather = env["soil"], env["climate"], env["weather"]
+            recommended_crops = await arecommend_crops(soil, weather, climate, latitude, longitude)
+
+            farm = await Farm.objects.acreate(
+                farmer=await request.auser(),
+                latitude=latitude,
+                longitude=longitude,
+                soil_type=soil["soil_type"],
+                climate="tropical" if climate["avg_temp"] > 25 else "subtropical",
+                recommended_crop=recommended_crops[0]["crop"],
+                oversupply_risk=False
+            )
+            return JsonResponse({"message": "Farm saved", "farm_id": farm.id}, status=201)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Invalid data in save_location: {e}")
+            return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"error": "Invalid method"}, status=405)
+
+@csrf_exempt
+@login_required
+async def get_location_details(request):
+    """Fetch location details."""
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            lat = float(data["latitude"])
+            lon = float(data["longitude"])
+            more_details = data.get("more_details", False)
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                logger.error(f"Invalid coordinates: ({lat}, {lon})")
+                return JsonResponse({"error": "Invalid coordinates"}, status=400)
+
+            env = await afetch_environment(lat, lon, more_details=more_details)
+            # Check if location is water
+            if env["is_water"]:
+                logger.info(f"Blocked water location details request for ({lat}, {lon})")
+                return JsonResponse({"error": "Cannot process request for water location"}, status=400)
+
+            recommended_crops = await arecommend_crops(env["soil"], env["weather"], env["climate"], lat, lon)
+            response = location_details_response(env, recommended_crops, more_details)
+            logger.info(f"Successfully fetched location details for ({lat}, {lon})")
+            return JsonResponse(response)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Invalid data in get_location_details: {e}")
+            return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"error": "Invalid method"}, status=405)
+
+@csrf_exempt
+@login_required
+async def add_farm(request):
+    """Add a new farm."""
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            lat = float(data["latitude"])
+            lon = float(data["longitude"])
+            farm_size = float(data.get("farmSize", 1.0))
+            farm_status = data.get("farmStatus", "green")
+            user_crop = data.get("user_crop_preferences")
+            planting_date = data.get("planting_date")
+            yield_per_acre = float(data.get("yield_per_acre", 10.0))
+
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                return JsonResponse({"error": "Invalid coordinates"}, status=400)
+            if farm_size <= 0 or yield_per_acre <= 0:
+                return JsonResponse({"error": "Invalid farm size or yield"}, status=400)
+            if user_crop and user_crop not in dict(Farm.CROP_CHOICES):
+                return JsonResponse({"error": f"Invalid crop: {user_crop}"}, status=400)
+
+            env = await afetch_environment(lat, lon)
+            # Check if location is water
+            if env["is_water"]:
+                return JsonResponse({"error": "Cannot process request for water location"}, status=400)
+
+            weather, soil, climate = env["weather"], env["soil"], env["climate"]
+            recommended_crops = await arecommend_crops(soil, weather, climate, lat, lon)
+
+            farm = await Farm.objects.acreate(
+                farmer=await request.auser(),
+                latitude=lat,
+                longitude=lon,
+                area=farm_size,
+                status=farm_status,
+                soil_type=soil["soil_type"],
+                climate="tropical" if climate["avg_temp"] > 25 else "subtropical",
+                recommended_crop=recommended_crops[0]["crop"],
+                user_crop_preferences=user_crop,
+                planting_date=datetime.strptime(planting_date, '%Y-%m-%d').date() if planting_date else None,
+                yield_per_acre=yield_per_acre,
+                oversupply_risk=False
+            )
+            return JsonResponse({
+                "message": "Farm added",
+                "farm_id": farm.id,
+                "recommended_crop": farm.recommended_crop
+            }, status=201)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Invalid data in add_farm: {e}")
+            return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"error": "Invalid method"}, status=405)
+
+@csrf_exempt
+@login_required
+async def get_price_prediction(request):
+    """Predict crop price with improved accuracy."""
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            crop = data.get("crop")
+            harvest_date = data.get("harvest_date")
+            farm_id = data.get("farm_id")
+            lat = float(data.get("latitude", 9.9312))  # Default to Kochi
+            lon = float(data.get("longitude", 76.2673))
+            if not crop or not harvest_date:
+                return JsonResponse({"error": "Crop and harvest date required"}, status=400)
+            if crop not in VALID_CROPS:
+                logger.error(f"Invalid crop: {crop}")
+                return JsonResponse({"error": f"Invalid crop: {crop}"}, status=400)
+
+            response, final_price, market = await aestimate_crop_price(crop, harvest_date, lat, lon)
+
+            if farm_id:
+                try:
+                    farm = await Farm.objects.aget(id=farm_id, farmer=await request.auser())
+                    response.update({
+                        "total_yield": float(farm.area * farm.yield_per_acre),
+                        "estimated_revenue": float(farm.area * farm.yield_per_acre * final_price)
+                    })
+                except Farm.DoesNotExist:
+                    response["warning"] = response.get("warning", "") + " Farm not found"
+
+            await aadd_market_status(response, crop, market, harvest_date)
+            logger.info(f"Final price for {crop}_{market}: {response['predicted_price']}")
+            return JsonResponse(response, status=200)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Invalid data in get_price_prediction: {e}")
+            return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"error": "Invalid method"}, status=405)
@@ -0,0 +1,146 @@
+import json
+import logging
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.contrib.auth.decorators import login_required
+from . import soil_cache
+from .environment import fetch_environments
+from .geo import grid_cell, cell_center
+from .views import recommend_crops_batch, streamed
+
+logger = logging.getLogger(__name__)
+
+# Points in the same cell share one environment lookup and one score. The
+# default matches the soil cache, the finest grid any provider is cached on.
+CELL_DEG = getattr(settings, "MAPS_BATCH_CELL_DEG", soil_cache.CELL_DEG)
+MAX_POINTS = getattr(settings, "MAPS_BATCH_MAX_POINTS", 1000)
+# Cells fetched and scored together before their results are streamed
+CHUNK_CELLS = 64
+
+def _point(lat, lon, point_id=None):
+    lat, lon = float(lat), float(lon)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"Invalid coordinates: ({lat}, {lon})")
+    return lat, lon, point_id
+
+def _geometry_points(geometry, point_id=None):
+    kind = geometry.get("type")
+    if kind == "Point":
+        lon, lat = geometry["coordinates"][:2]
+        return [_point(lat, lon, point_id)]
+    if kind == "MultiPoint":
+        return [_point(lat, lon, point_id) for lon, lat, *_ in geometry["coordinates"]]
+    if kind == "GeometryCollection":
+        return [p for g in geometry["geometries"] for p in _geometry_points(g, point_id)]
+    raise ValueError(f"Unsupported geometry type: {kind}")
+
+def parse_points(data):
+    """Return [(lat, lon, id)] from a list of points or a GeoJSON object.
+
+    Accepts [[lat, lon], ...], [{"latitude": ..., "longitude": ..., "id": ...}, ...],
+    either wrapped as {"points": [...]}, or GeoJSON Point/MultiPoint geometries,
+    Features and FeatureCollections (GeoJSON coordinates are [lon, lat]).
+    Raises ValueError on malformed input.
+    """
+    try:
+        if isinstance(data, dict) and "points" in data:
+            data = data["points"]
+        if isinstance(data, list):
+            points = []
+            for item in data:
+                if isinstance(item, dict):
+                    points.append(_point(item["latitude"], item["longitude"], item.get("id")))
+                else:
+                    points.append(_point(item[0], item[1]))
+            return points
+        if not isinstance(data, dict):
+            raise ValueError("Expected a list of points or a GeoJSON object")
+        if data.get("type") == "FeatureCollection":
+            features = data["features"]
+        elif data.get("type") == "Feature":
+            features = [data]
+        else:
+            return _geometry_points(data)
+        points = []
+        for feature in features:
+            point_id = feature.get("id", (feature.get("properties") or {}).get("id"))
+            points.extend(_geometry_points(feature["geometry"], point_id))
+        return points
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Malformed points: {e!r}")
+
+def group_by_cell(points, cell_deg=CELL_DEG):
+    """Map each grid cell to the indexes of its points, in order of first appearance."""
+    cells = {}
+    for index, (lat, lon, _) in enumerate(points):
+        cells.setdefault(grid_cell(lat, lon, cell_deg), []).append(index)
+    return cells
+
+def recommend_cells(cells, cell_deg=CELL_DEG):
+    """Fetch and score the centres of grid cells.
+
+    Returns (envs, recommendations) in the order of `cells`; the
+    recommendations of water cells are None.
+    """
+    centers = [cell_center(row, col, cell_deg) for row, col in cells]
+    envs = fetch_environments(centers)
+    land = [i for i, env in enumerate(envs) if not env["is_water"]]
+    recommendations = [None] * len(cells)
+    if land:
+        scored = recommend_crops_batch([
+            (envs[i]["soil"], envs[i]["weather"], envs[i]["climate"], *centers[i]) for i in land
+        ])
+        for i, recommended in zip(land, scored):
+            recommendations[i] = recommended
+    return envs, recommendations
+
+def iter_results(points, cells):
+    """Yield one result dict per point, fetching and scoring CHUNK_CELLS cells at a time."""
+    cell_list = list(cells)
+    for start in range(0, len(cell_list), CHUNK_CELLS):
+        chunk = cell_list[start:start + CHUNK_CELLS]
+        envs, recommendations = recommend_cells(chunk)
+
+        for i, cell in enumerate(chunk):
+            env = envs[i]
+            for index in cells[cell]:
+                lat, lon, point_id = points[index]
+                result = {"index": index, "latitude": lat, "longitude": lon}
+                if point_id is not None:
+                    result["id"] = point_id
+                if env["is_water"]:
+                    result["error"] = "Cannot process request for water location"
+                else:
+                    result.update({
+                        "soil_type": env["soil"]["soil_type"],
+                        "climate": "tropical" if env["climate"]["avg_temp"] > 25 else "subtropical",
+                        "recommended_crops": recommendations[i],
+                    })
+                yield result
+
+@csrf_exempt
+@login_required
+def batch_recommendations(request):
+    """Recommend crops for many points, streamed back as NDJSON (one line per point)."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+    try:
+        points = parse_points(json.loads(request.body))
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.error(f"Invalid data in batch_recommendations: {e}")
+        return JsonResponse({"error": str(e)}, status=400)
+    if not points:
+        return JsonResponse({"error": "No points given"}, status=400)
+    if len(points) > MAX_POINTS:
+        return JsonResponse({"error": f"At most {MAX_POINTS} points per request"}, status=400)
+
+    cells = group_by_cell(points)
+    logger.info(f"Batch recommendation for {len(points)} points in {len(cells)} cells")
+    response = streamed(request, StreamingHttpResponse(
+        (json.dumps(result) + "\n" for result in iter_results(points, cells)),
+        content_type="application/x-ndjson",
+    ))
+    response["X-Batch-Points"] = str(len(points))
+    response["X-Batch-Cells"] = str(len(cells))
+    return response
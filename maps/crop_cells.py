@@ -0,0 +1,150 @@
+import logging
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+import numpy as np
+from . import geo
+from .models import PREVIOUS_FIELDS, CropCell, Farm
+
+logger = logging.getLogger(__name__)
+
+# ~2 km cells: a 10 km neighbourhood covers about 65 of them
+CELL_DEG = getattr(settings, "MAPS_CROP_CELL_DEG", 0.02)
+# Farm fields the summary depends on
+FIELDS = PREVIOUS_FIELDS
+
+def _contribution(lat, lon, crop, area):
+    """Return the (row, col, crop) a farm is counted under and the area it adds."""
+    row, col = geo.grid_cell(float(lat), float(lon), CELL_DEG)
+    return (row, col, crop or ""), None if area is None else float(area)
+
+def _add(key, area, sign):
+    row, col, crop = key
+    has_area = area is not None
+    updated = CropCell.objects.filter(row=row, col=col, crop=crop).update(
+        farms=F("farms") + sign,
+        area_farms=F("area_farms") + (sign if has_area else 0),
+        area_sum=F("area_sum") + (sign * area if has_area else 0),
+    )
+    if not updated and sign > 0:
+        cell, created = CropCell.objects.get_or_create(
+            row=row, col=col, crop=crop,
+            defaults={"farms": 1, "area_farms": int(has_area), "area_sum": area or 0},
+        )
+        if not created:
+            _add(key, area, sign)
+
+def farm_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Remember the stored values of a farm about to be saved, to move its counts."""
+    instance._crop_cell_previous = None
+    if instance.pk is None or (update_fields is not None and not set(FIELDS) & set(update_fields)):
+        return
+    instance._crop_cell_previous = instance.previous_values()
+
+def farm_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and not set(FIELDS) & set(update_fields):
+        return
+    stored = getattr(instance, "_crop_cell_previous", None)
+    current = [getattr(instance, name) for name in FIELDS]
+    if stored is not None and update_fields is not None:
+        # Fields left out of update_fields keep their stored values, whatever the instance holds
+        current = [value if name in update_fields else old for name, value, old in zip(FIELDS, current, stored)]
+    previous = _contribution(*stored) if stored is not None else None
+    current = _contribution(*current)
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            _add(*previous, -1)
+        _add(*current, 1)
+
+def farm_pre_delete(sender, instance, **kwargs):
+    """Remember the stored values of a farm about to be deleted; the instance may be stale."""
+    instance._crop_cell_previous = instance.previous_values()
+
+def farm_deleted(sender, instance, **kwargs):
+    stored = getattr(instance, "_crop_cell_previous", None)
+    if stored is None:
+        stored = [getattr(instance, name) for name in FIELDS]
+    _add(*_contribution(*stored), -1)
+
+def rebuild():
+    """Recompute every cell from the farm table, e.g. after bulk changes that bypass signals."""
+    cells = {}
+    for farm in Farm.objects.values_list(*FIELDS).iterator():
+        key, area = _contribution(*farm)
+        counts = cells.setdefault(key, [0, 0, 0.0])
+        counts[0] += 1
+        if area is not None:
+            counts[1] += 1
+            counts[2] += area
+    with transaction.atomic():
+        CropCell.objects.all().delete()
+        CropCell.objects.bulk_create(
+            [CropCell(row=row, col=col, crop=crop, farms=farms, area_farms=area_farms, area_sum=area_sum)
+             for (row, col, crop), (farms, area_farms, area_sum) in cells.items()],
+            batch_size=1000,
+        )
+    logger.info(f"Rebuilt {len(cells)} crop cells")
+    return len(cells)
+
+def cells_within(lat, lon, radius_km):
+    """Return the grid cells whose centres lie within radius_km of (lat, lon)."""
+    min_lat, min_lon, max_lat, max_lon = geo.bbox(lat, lon, radius_km)
+    min_row, min_col = geo.grid_cell(min_lat, min_lon, CELL_DEG)
+    max_row, max_col = geo.grid_cell(max_lat, max_lon, CELL_DEG)
+    rows, cols = np.meshgrid(np.arange(min_row, max_row + 1), np.arange(min_col, max_col + 1), indexing="ij")
+    rows, cols = rows.ravel(), cols.ravel()
+    inside = geo.haversine_km(lat, lon, (rows + 0.5) * CELL_DEG, (cols + 0.5) * CELL_DEG) <= radius_km
+    return set(zip(rows[inside].tolist(), cols[inside].tolist()))
+
+def neighbourhood(lat, lon, radius_km, exclude_farmer=None):
+    """Summarize the farms in the cells within radius_km of (lat, lon).
+
+    Returns {"farms", "avg_area", "crops"} where crops counts farms per
+    recommended crop. Farms count whole cells, so the radius is honoured to
+    within half a cell diagonal. The farms of `exclude_farmer` are left out.
+    """
+    cells = cells_within(lat, lon, radius_km)
+    rows = {row for row, _ in cells}
+    cols = {col for _, col in cells}
+    crops = Counter()
+    farms = area_farms = 0
+    area_sum = 0.0
+    if cells:
+        # The row/col ranges form a box; cells outside the circle are dropped below
+        queryset = CropCell.objects.filter(
+            row__range=(min(rows), max(rows)), col__range=(min(cols), max(cols)), farms__gt=0,
+        ).values_list("row", "col", "crop", "farms", "area_farms", "area_sum")
+        for row, col, crop, count, with_area, area in queryset:
+            if (row, col) in cells:
+                crops[crop] += count
+                farms += count
+                area_farms += with_area
+                area_sum += area
+
+    if exclude_farmer is not None and cells:
+        # Only the farmer's farms inside the box of cells can be counted above
+        own = Farm.objects.filter(farmer=exclude_farmer).in_bbox(
+            min(rows) * CELL_DEG, min(cols) * CELL_DEG, (max(rows) + 1) * CELL_DEG, (max(cols) + 1) * CELL_DEG,
+        )
+        for farm in own.values_list(*FIELDS):
+            (row, col, crop), area = _contribution(*farm)
+            if (row, col) in cells:
+                crops[crop] -= 1
+                farms -= 1
+                if area is not None:
+                    area_farms -= 1
+                    area_sum -= area
+
+    crops.pop("", None)
+    return {
+        "farms": farms,
+        "avg_area": area_sum / area_farms if area_farms else None,
+        "crops": +crops,
+    }
+
+def dominant_crop(summary):
+    """Return the most common recommended crop of a neighbourhood summary, or None."""
+    return summary["crops"].most_common(1)[0][0] if summary["crops"] else None
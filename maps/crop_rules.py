@@ -0,0 +1,234 @@
+import numpy as np
+
+# Growing conditions per crop: (parameter, min, max, weight). The soil_type
+# rule names the preferred soil instead of a range.
+CROP_RULES = {
+    'coconut': [
+        ('ph', 5.5, 8.0, 0.15),
+        ('N', 0.5, 1.5, 0.1),
+        ('P', 0.3, 1.0, 0.1),
+        ('K', 0.5, 1.5, 0.1),
+        ('avg_temp', 25, 35, 0.25),
+        ('humidity', 60, 90, 0.1),
+        ('avg_rainfall', 1500, 3000, 0.25),
+        ('soil_type', 'sandy', None, 0.15),
+        ('elevation', 0, 600, 0.05)
+    ],
+    'rice': [
+        ('ph', 5.0, 7.0, 0.15),
+        ('N', 0.5, 1.5, 0.15),
+        ('P', 30, 70, 0.1),
+        ('K', 30, 50, 0.1),
+        ('avg_temp', 20, 35, 0.2),
+        ('humidity', 70, 100, 0.15),
+        ('avg_rainfall', 1000, 2000, 0.3),
+        ('soil_type', 'clay', None, 0.1),
+        ('elevation', 0, 1500, 0.05)
+    ],
+    'banana': [
+        ('ph', 5.5, 7.5, 0.15),
+        ('N', 0.7, 1.8, 0.15),
+        ('P', 40, 80, 0.1),
+        ('K', 50, 90, 0.15),
+        ('avg_temp', 20, 35, 0.2),
+        ('humidity', 70, 95, 0.15),
+        ('avg_rainfall', 1000, 2500, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 1200, 0.05)
+    ],
+    'cardamom': [
+        ('ph', 4.5, 6.5, 0.15),
+        ('N', 0.5, 1.2, 0.1),
+        ('P', 20, 50, 0.1),
+        ('K', 30, 60, 0.1),
+        ('avg_temp', 15, 30, 0.2),
+        ('humidity', 70, 95, 0.2),
+        ('avg_rainfall', 1500, 4000, 0.25),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 600, 1500, 0.1)
+    ],
+    'cotton': [
+        ('ph', 5.5, 7.5, 0.15),
+        ('N', 0.8, 1.8, 0.15),
+        ('P', 30, 60, 0.1),
+        ('K', 20, 50, 0.1),
+        ('avg_temp', 20, 35, 0.25),
+        ('humidity', 50, 80, 0.1),
+        ('avg_rainfall', 600, 1200, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 1000, 0.05)
+    ],
+    'gram': [
+        ('ph', 6.0, 7.5, 0.15),
+        ('N', 0.2, 0.8, 0.1),
+        ('P', 20, 50, 0.15),
+        ('K', 15, 40, 0.1),
+        ('avg_temp', 15, 30, 0.2),
+        ('humidity', 40, 70, 0.1),
+        ('avg_rainfall', 400, 800, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 1000, 0.05)
+    ],
+    'groundnut': [
+        ('ph', 6.0, 7.5, 0.15),
+        ('N', 0.3, 1.0, 0.1),
+        ('P', 20, 50, 0.15),
+        ('K', 20, 50, 0.1),
+        ('avg_temp', 20, 35, 0.2),
+        ('humidity', 50, 80, 0.1),
+        ('avg_rainfall', 500, 1000, 0.2),
+        ('soil_type', 'sandy', None, 0.1),
+        ('elevation', 0, 1000, 0.05)
+    ],
+    'maize': [
+        ('ph', 5.5, 7.5, 0.15),
+        ('N', 0.8, 1.8, 0.15),
+        ('P', 40, 80, 0.1),
+        ('K', 30, 60, 0.1),
+        ('avg_temp', 18, 35, 0.2),
+        ('humidity', 50, 80, 0.1),
+        ('avg_rainfall', 500, 1500, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 2500, 0.05)
+    ],
+    'mustard': [
+        ('ph', 6.0, 7.5, 0.15),
+        ('N', 0.5, 1.5, 0.1),
+        ('P', 20, 50, 0.1),
+        ('K', 20, 50, 0.1),
+        ('avg_temp', 10, 25, 0.25),
+        ('humidity', 40, 70, 0.1),
+        ('avg_rainfall', 300, 700, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 1500, 0.05)
+    ],
+    'pepper': [
+        ('ph', 4.5, 6.5, 0.15),
+        ('N', 0.5, 1.5, 0.1),
+        ('P', 20, 50, 0.1),
+        ('K', 30, 60, 0.1),
+        ('avg_temp', 20, 35, 0.2),
+        ('humidity', 70, 95, 0.2),
+        ('avg_rainfall', 1500, 3000, 0.25),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 1500, 0.05)
+    ],
+    'rubber': [
+        ('ph', 4.5, 6.0, 0.15),
+        ('N', 0.5, 1.5, 0.1),
+        ('P', 20, 50, 0.1),
+        ('K', 20, 50, 0.1),
+        ('avg_temp', 25, 35, 0.25),
+        ('humidity', 70, 95, 0.15),
+        ('avg_rainfall', 2000, 4000, 0.25),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 700, 0.05)
+    ],
+    'soybean': [
+        ('ph', 6.0, 7.5, 0.15),
+        ('N', 0.5, 1.5, 0.1),
+        ('P', 30, 60, 0.15),
+        ('K', 20, 50, 0.1),
+        ('avg_temp', 20, 30, 0.2),
+        ('humidity', 50, 80, 0.1),
+        ('avg_rainfall', 600, 1200, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 1500, 0.05)
+    ],
+    'tapioca': [
+        ('ph', 5.0, 7.0, 0.15),
+        ('N', 0.5, 1.5, 0.1),
+        ('P', 20, 50, 0.1),
+        ('K', 30, 70, 0.15),
+        ('avg_temp', 20, 35, 0.2),
+        ('humidity', 60, 90, 0.1),
+        ('avg_rainfall', 1000, 2000, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 1000, 0.05)
+    ],
+    'turmeric': [
+        ('ph', 5.5, 7.5, 0.15),
+        ('N', 0.8, 1.8, 0.15),
+        ('P', 20, 50, 0.1),
+        ('K', 30, 60, 0.1),
+        ('avg_temp', 20, 35, 0.2),
+        ('humidity', 60, 90, 0.1),
+        ('avg_rainfall', 1000, 2000, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 1500, 0.05)
+    ],
+    'wheat': [
+        ('ph', 6.0, 7.5, 0.15),
+        ('N', 0.8, 1.8, 0.15),
+        ('P', 30, 60, 0.1),
+        ('K', 20, 50, 0.1),
+        ('avg_temp', 10, 25, 0.25),
+        ('humidity', 50, 80, 0.1),
+        ('avg_rainfall', 500, 1000, 0.2),
+        ('soil_type', 'loamy', None, 0.1),
+        ('elevation', 0, 2000, 0.05)
+    ]
+}
+
+# Numeric parameters, in the column order of the feature matrix
+FEATURES = ("ph", "N", "P", "K", "avg_temp", "humidity", "avg_rainfall", "elevation")
+CROPS = tuple(sorted(CROP_RULES))
+
+def _compile(rules):
+    """Turn the rule table into (crops x features) min/max/weight matrices."""
+    shape = (len(CROPS), len(FEATURES))
+    minimum = np.zeros(shape)
+    maximum = np.ones(shape)
+    weight = np.zeros(shape)
+    soil_types = np.empty(len(CROPS), dtype=object)
+    soil_weight = np.zeros(len(CROPS))
+    for i, crop in enumerate(CROPS):
+        for param, min_val, max_val, w in rules[crop]:
+            if param == "soil_type":
+                soil_types[i] = min_val
+                soil_weight[i] = w
+            else:
+                j = FEATURES.index(param)
+                minimum[i, j], maximum[i, j], weight[i, j] = min_val, max_val, w
+    return minimum, maximum, weight, soil_types, soil_weight
+
+MIN, MAX, WEIGHT, SOIL_TYPES, SOIL_WEIGHT = _compile(CROP_RULES)
+MID = (MIN + MAX) / 2
+SPAN = MAX - MIN
+TOTAL_WEIGHT = WEIGHT.sum(axis=1) + SOIL_WEIGHT
+
+def feature_row(soil, weather, climate):
+    """Return the rule features of one location in FEATURES order (missing values as NaN)."""
+    values = {**soil, **climate, "humidity": weather.get("humidity")}
+    return [np.nan if values.get(name) is None else values[name] for name in FEATURES]
+
+def environment_scores(features, soil_types):
+    """Score every crop's growing conditions for many locations at once.
+
+    `features` is an (n_points x len(FEATURES)) matrix and `soil_types` the
+    n_points soil type names. Returns an (n_points x len(CROPS)) array of
+    weighted scores in [0, 1]: values inside a crop's range score by distance
+    from its midpoint, values outside fall off linearly with the range width,
+    and missing values score 0.6.
+    """
+    x = np.asarray(features, dtype=float)[:, None, :]
+    inside = 1 - np.abs(x - MID) / (SPAN / 2)
+    below = np.maximum(0, 1 - (MIN - x) / SPAN)
+    above = np.maximum(0, 1 - (x - MAX) / SPAN)
+    with np.errstate(invalid="ignore"):
+        normalized = np.where(x < MIN, below, np.where(x > MAX, above, inside))
+    normalized = np.where(np.isnan(x), 0.6, normalized)
+    soil_match = np.asarray(soil_types, dtype=object)[:, None] == SOIL_TYPES
+    score = (normalized * WEIGHT).sum(axis=2) + np.where(soil_match, 1, 0.6) * SOIL_WEIGHT
+    return score / TOTAL_WEIGHT
+
+def rule_scores(features, soil_types, prices):
+    """Blend environmental scores (70%) with relative price (30%) into 0-100 suitability.
+
+    `prices` holds one price per crop in CROPS order, either shared by all
+    points or as an (n_points x len(CROPS)) matrix.
+    """
+    prices = np.asarray(prices, dtype=float)
+    max_price = prices.max(axis=-1, keepdims=True)
+    price_score = np.divide(prices, max_price, out=np.ones_like(prices), where=max_price > 0)
+    return np.round((0.7 * environment_scores(features, soil_types) + 0.3 * price_score) * 100, 1)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from . import terrain
+from .providers import (
+    lookup_water_place,
+    resolve_water_location,
+    get_weather_data,
+    get_soil_properties,
+    get_climate_data,
+    get_soil_moisture,
+    get_sunlight_hours,
+    fetch_elevation,
+    alookup_water_place,
+    aget_weather_data,
+    aget_soil_properties,
+    aget_climate_data,
+    aget_soil_moisture,
+    aget_sunlight_hours,
+    afetch_elevation,
+    SOIL_FALLBACK,
+)
+
+logger = logging.getLogger(__name__)
+
+# Shared across requests so a burst of map clicks reuses threads instead of
+# spawning a pool per request.
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "MAPS_PROVIDER_WORKERS", 16),
+    thread_name_prefix="maps-provider",
+)
+# Batch requests fetch many locations at once; each location fans out on the
+# executor above, so the outer calls need their own pool.
+batch_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "MAPS_BATCH_WORKERS", 8),
+    thread_name_prefix="maps-batch",
+)
+
+def _task(func, *args):
+    """Run a pool task, honouring CONN_MAX_AGE for the DB connection of the pool thread.
+
+    Django only closes connections at the end of a request, and pool threads
+    outlive requests, so the soil cache lookups would keep theirs open forever.
+    """
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+def fetch_environment(lat, lon, more_details=False):
+    """Fetch all environmental data for a location concurrently.
+
+    Every provider call is independent, so they are issued in parallel and
+    the total latency is that of the slowest provider rather than the sum.
+    Returns a dict with ``is_water``, ``weather``, ``soil`` and ``climate``
+    (plus ``moisture`` and ``sunlight_hours`` when ``more_details`` is set).
+    """
+    calls = {
+        "weather": (get_weather_data, lat, lon),
+        "soil": (get_soil_properties, lat, lon),
+        "climate": (get_climate_data, lat, lon),
+    }
+    # Terrain comes from the offline store when it covers the point
+    terrain_point = terrain.lookup(lat, lon)
+    if terrain_point is None:
+        calls["water_place"] = (lookup_water_place, lat, lon)
+        calls["elevation"] = (fetch_elevation, lat, lon)
+    if more_details:
+        calls["moisture"] = (get_soil_moisture, lat, lon)
+        calls["sunlight_hours"] = (get_sunlight_hours, lat, lon)
+
+    futures = {name: executor.submit(_task, *call) for name, call in calls.items()}
+    results = {name: future.result() for name, future in futures.items()}
+    return _assemble(lat, lon, terrain_point, results)
+
+def fetch_environments(points, more_details=False):
+    """Fetch the environment of many (lat, lon) points concurrently, in input order."""
+    futures = [batch_executor.submit(_task, fetch_environment, lat, lon, more_details) for lat, lon in points]
+    return [future.result() for future in futures]
+
+async def afetch_environment(lat, lon, more_details=False):
+    """Async version of fetch_environment, gathering the provider calls on the event loop."""
+    calls = {
+        "weather": aget_weather_data(lat, lon),
+        "soil": aget_soil_properties(lat, lon),
+        "climate": aget_climate_data(lat, lon),
+    }
+    terrain_point = terrain.lookup(lat, lon)
+    if terrain_point is None:
+        calls["water_place"] = alookup_water_place(lat, lon)
+        calls["elevation"] = afetch_elevation(lat, lon)
+    if more_details:
+        calls["moisture"] = aget_soil_moisture(lat, lon)
+        calls["sunlight_hours"] = aget_sunlight_hours(lat, lon)
+
+    values = await asyncio.gather(*calls.values())
+    return _assemble(lat, lon, terrain_point, dict(zip(calls, values)))
+
+def _assemble(lat, lon, terrain_point, results):
+    if terrain_point is not None:
+        elevation, results["is_water"] = terrain_point
+    else:
+        elevation = results.pop("elevation")
+        results["is_water"] = resolve_water_location(lat, lon, results.pop("water_place"), elevation)
+    soil = results["soil"]
+    results["soil"] = {**soil, "elevation": elevation} if soil is not None else dict(SOIL_FALLBACK)
+    logger.debug(f"Fetched environment for ({lat}, {lon}): {sorted(results)}")
+    return results
@@ -0,0 +1,322 @@
+import csv
+import io
+import logging
+import os
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db import close_old_connections
+from django.db.models import F
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from users.models import UserType
+from . import jurisdictions
+from .models import ExportJob, Farm
+from .views import streamed
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# Rows read per query and written per CSV block / Parquet row group
+CHUNK_ROWS = getattr(settings, "MAPS_EXPORT_CHUNK_ROWS", 10000)
+# CSV exports up to this many farms stream straight back; larger ones become jobs
+STREAM_MAX_ROWS = getattr(settings, "MAPS_EXPORT_STREAM_MAX_ROWS", 100000)
+EXPORT_DIR = getattr(settings, "MAPS_EXPORT_DIR", os.path.join(settings.BASE_DIR, "data", "exports"))
+# Jobs are run by `manage.py export_farms --run-jobs`, off the web workers;
+# True runs them in a thread of the web process instead (development only)
+RUN_IN_THREAD = getattr(settings, "MAPS_EXPORT_RUN_IN_THREAD", False)
+# Running jobs without a heartbeat for this long are handed to the next runner
+STALE_SECONDS = getattr(settings, "MAPS_EXPORT_STALE_SECONDS", 600)
+# Jobs reclaimed this many times are failed instead of retried
+MAX_ATTEMPTS = getattr(settings, "MAPS_EXPORT_MAX_ATTEMPTS", 3)
+
+# (values_list field, column name, Arrow type name)
+COLUMNS = [
+    ("id", "id", "int64"),
+    ("farmer__username", "farmer", "string"),
+    ("latitude", "latitude", "float64"),
+    ("longitude", "longitude", "float64"),
+    ("area", "area", "float64"),
+    ("status", "status", "string"),
+    ("soil_type", "soil_type", "string"),
+    ("climate", "climate", "string"),
+    ("recommended_crop", "recommended_crop", "string"),
+    ("user_crop_preferences", "user_crop_preferences", "string"),
+    ("planting_date", "planting_date", "date32"),
+    ("yield_per_acre", "yield_per_acre", "float64"),
+    ("oversupply_risk", "oversupply_risk", "bool_"),
+    ("oversupply_status", "oversupply_status", "string"),
+    ("updated_at", "updated_at", "timestamp"),
+]
+FORMATS = ("csv", "parquet")
+
+class ExportDenied(Exception):
+    """Raised when a user may not export the requested farms."""
+
+class JobReclaimed(Exception):
+    """Raised inside a runner whose job was handed to another runner."""
+
+def intersect(a, b):
+    """Return the overlap of two bounding boxes, or None if they do not overlap."""
+    box = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+    return box if box[0] <= box[2] and box[1] <= box[3] else None
+
+def allowed_scope(user, bbox=None):
+    """Return the (jurisdiction, bbox) `user` may export, narrowed to `bbox`.
+
+    Staff export anything. Government users of a region only export the
+    farms assigned to it (Farm.jurisdiction), so the overlapping borders of
+    neighbouring regions never leak farms between them; national
+    jurisdictions export their whole box. A None bbox means no box limit.
+    Raises ExportDenied for everyone else.
+    """
+    if user.is_staff:
+        return "", tuple(bbox) if bbox else None
+    profile = getattr(user, "government_profile", None) if user.user_type == UserType.GOVERNMENT else None
+    if profile is None:
+        raise ExportDenied("Only government users can export farm data")
+    name = jurisdictions.normalize(profile.jurisdiction)
+    area = jurisdictions.bounds(name)
+    if area is None:
+        raise ExportDenied(f"No area is configured for jurisdiction '{profile.jurisdiction}'")
+    if bbox:
+        area = intersect(area, tuple(bbox))
+        if area is None:
+            raise ExportDenied("The bounding box is outside your jurisdiction")
+    if name in jurisdictions.NATIONAL:
+        return "", area
+    return name, tuple(bbox) if bbox else None
+
+def farms(jurisdiction="", bbox=None):
+    """Return the farms assigned to `jurisdiction` (any, if blank) inside `bbox` (anywhere, if None)."""
+    queryset = Farm.objects.all()
+    if jurisdiction:
+        queryset = queryset.filter(jurisdiction=jurisdiction)
+    return queryset.in_bbox(*bbox) if bbox else queryset
+
+def iter_chunks(queryset, chunk_size=CHUNK_ROWS):
+    """Yield lists of COLUMNS tuples in id order, reading by id range rather than offset."""
+    fields = [field for field, _, _ in COLUMNS]
+    after_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=after_id).order_by("id").values_list(*fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def iter_csv(queryset, chunk_size=CHUNK_ROWS):
+    """Yield the CSV text of a queryset a chunk at a time, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column for _, column, _ in COLUMNS])
+    for rows in iter_chunks(queryset, chunk_size):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def arrow_schema():
+    def arrow_type(name):
+        if name == "timestamp":
+            return pyarrow.timestamp("us", tz="UTC")
+        return getattr(pyarrow, name)()
+    return pyarrow.schema([(column, arrow_type(kind)) for _, column, kind in COLUMNS])
+
+def write_csv(queryset, path, chunk_size=CHUNK_ROWS, progress=None):
+    written = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([column for _, column, _ in COLUMNS])
+        for rows in iter_chunks(queryset, chunk_size):
+            writer.writerows(rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+def write_parquet(queryset, path, chunk_size=CHUNK_ROWS, progress=None):
+    """Write a queryset to a Parquet file, one typed row group per chunk."""
+    if pyarrow is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = arrow_schema()
+    written = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for rows in iter_chunks(queryset, chunk_size):
+            columns = list(zip(*rows))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+            ))
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+def write(fmt, queryset, path, chunk_size=CHUNK_ROWS, progress=None):
+    """Write a queryset to `path` as CSV or Parquet; returns the number of farms written.
+
+    `progress(farms_written)` is called after every chunk.
+    """
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        written = (write_parquet if fmt == "parquet" else write_csv)(queryset, tmp, chunk_size, progress)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return written
+
+def job_path(job):
+    return os.path.join(EXPORT_DIR, f"farms-{job.pk}.{job.format}")
+
+def run_job(job_id):
+    """Run one pending job; jobs already claimed by another runner are skipped."""
+    now = timezone.now()
+    claimed = ExportJob.objects.filter(pk=job_id, status="pending").update(
+        status="running", attempts=F("attempts") + 1, started_at=now, heartbeat_at=now,
+    )
+    if not claimed:
+        return
+    job = ExportJob.objects.get(pk=job_id)
+    # Only this attempt may write; a reclaimed job belongs to the next runner
+    mine = ExportJob.objects.filter(pk=job.pk, status="running", attempts=job.attempts)
+
+    def heartbeat(written):
+        if not mine.update(rows=written, heartbeat_at=timezone.now()):
+            raise JobReclaimed(f"Export job {job.pk} attempt {job.attempts} was reclaimed")
+
+    try:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = job_path(job)
+        rows = write(job.format, farms(job.jurisdiction, job.bbox), path, progress=heartbeat)
+        result = {"status": "done", "rows": rows, "path": path, "error": ""}
+        logger.info(f"Export job {job.pk} wrote {rows} farms to {path}")
+    except JobReclaimed as e:
+        logger.warning(str(e))
+        return
+    except Exception as e:
+        logger.error(f"Export job {job.pk} failed: {e}")
+        result = {"status": "failed", "error": str(e)}
+    mine.update(finished_at=timezone.now(), **result)
+
+def reclaim_stale():
+    """Return running jobs whose runner stopped beating to the queue; returns how many were requeued.
+
+    Jobs that already used MAX_ATTEMPTS runs are failed instead.
+    """
+    now = timezone.now()
+    stale = ExportJob.objects.filter(status="running", heartbeat_at__lt=now - timedelta(seconds=STALE_SECONDS))
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status="failed", error=f"Export runner stopped {MAX_ATTEMPTS} times", finished_at=now,
+    )
+    requeued = stale.update(status="pending")
+    if failed or requeued:
+        logger.warning(f"Requeued {requeued} and failed {failed} stale export jobs")
+    return requeued
+
+def run_pending():
+    """Requeue stale jobs, then run every pending job in creation order; returns how many were picked up."""
+    reclaim_stale()
+    job_ids = list(ExportJob.objects.filter(status="pending").order_by("id").values_list("id", flat=True))
+    for job_id in job_ids:
+        run_job(job_id)
+    return len(job_ids)
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+def start(job):
+    """Queue a job for `export_farms --run-jobs`, or run it in a thread when RUN_IN_THREAD is set."""
+    if RUN_IN_THREAD:
+        threading.Thread(target=_run_in_thread, args=(job.pk,), daemon=True).start()
+
+def job_status(job):
+    status = {
+        "id": job.pk,
+        "format": job.format,
+        "jurisdiction": job.jurisdiction,
+        "bbox": job.bbox,
+        "status": job.status,
+        "rows": job.rows,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == "done":
+        status["download"] = reverse("maps:export-download", args=[job.pk])
+    return status
+
+def parse_bbox(value):
+    """Parse a ?bbox=min_lat,min_lon,max_lat,max_lon parameter."""
+    if not value:
+        return None
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox needs min_lat,min_lon,max_lat,max_lon")
+    return tuple(parts)
+
+@login_required
+def export_farms(request):
+    """Export farms of the user's jurisdiction (or ?bbox=) as ?format=csv or parquet.
+
+    Small CSV exports stream back directly; Parquet and large exports
+    (or ?background=1) start an ExportJob and return 202 with its status URL.
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"Unknown format: {fmt}"}, status=400)
+    if fmt == "parquet" and pyarrow is None:
+        return JsonResponse({"error": "Parquet export is not available on this server"}, status=501)
+    try:
+        jurisdiction, bbox = allowed_scope(request.user, parse_bbox(request.GET.get("bbox")))
+    except ExportDenied as e:
+        return JsonResponse({"error": str(e)}, status=403)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    queryset = farms(jurisdiction, bbox)
+    if fmt == "csv" and request.GET.get("background") != "1" and queryset.count() <= STREAM_MAX_ROWS:
+        response = streamed(request, StreamingHttpResponse(iter_csv(queryset), content_type="text/csv"))
+        response["Content-Disposition"] = 'attachment; filename="farms.csv"'
+        return response
+
+    job = ExportJob.objects.create(
+        requested_by=request.user, format=fmt, jurisdiction=jurisdiction, bbox=list(bbox) if bbox else None,
+    )
+    start(job)
+    response = JsonResponse(job_status(job), status=202)
+    response["Location"] = reverse("maps:export-job", args=[job.pk])
+    return response
+
+def _own_job(request, job_id):
+    return ExportJob.objects.filter(pk=job_id, requested_by=request.user).first()
+
+@login_required
+def export_job(request, job_id):
+    """Return the status of one of the user's export jobs."""
+    job = _own_job(request, job_id)
+    if job is None:
+        return JsonResponse({"error": f"No export job {job_id}"}, status=404)
+    return JsonResponse(job_status(job))
+
+@login_required
+def export_download(request, job_id):
+    """Send the file of a finished export job."""
+    job = _own_job(request, job_id)
+    if job is None or job.status != "done" or not os.path.exists(job.path):
+        return JsonResponse({"error": f"Export job {job_id} has no file to download"}, status=404)
+    return streamed(request, FileResponse(open(job.path, "rb"), as_attachment=True, filename=os.path.basename(job.path)))
@@ -0,0 +1,125 @@
+import json
+import os
+import numpy as np
+
+# Files of an exported forest; every array is a plain .npy so it can be memory-mapped
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes")
+META_FILE = "forest.json"
+
+class ArrayForest:
+    """A trained decision-tree ensemble flattened into contiguous NumPy arrays.
+
+    All trees' nodes live in one set of arrays indexed by global node id;
+    `roots` holds each tree's root node and leaves point to themselves. Rows
+    descend all trees together, one level per NumPy step, and then average
+    the class distributions of the leaves they reached. predict_proba matches
+    scikit-learn's forest predict_proba and accepts the same inputs.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+        self.is_leaf = left == np.arange(len(left))
+
+    def apply(self, X):
+        """Return the leaf reached in each tree, as an (n_rows x n_trees) array of node ids."""
+        # scikit-learn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n_trees = len(self.roots)
+        leaf = np.tile(self.roots, len(X))
+        # Walk the (row, tree) pairs that have not reached a leaf yet, one level per step
+        active = np.arange(len(leaf))
+        rows = active // n_trees
+        node = leaf.copy()
+        while len(active):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+            leaf[active] = node
+            inner = ~self.is_leaf[node]
+            active, rows, node = active[inner], rows[inner], node[inner]
+        return leaf.reshape(len(X), n_trees)
+
+    def predict_proba(self, X):
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def save(self, directory, source=None):
+        """Write the arrays as .npy files plus a small JSON header describing the source model."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            array = self.classes_ if name == "classes" else getattr(self, name)
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(array), allow_pickle=False)
+        with open(os.path.join(directory, META_FILE), "w") as f:
+            json.dump({"max_depth": self.max_depth, "n_features": self.n_features_in_, "source": source}, f)
+
+def export_forest(model, leaf_dtype=np.float64):
+    """Flatten a fitted single-output scikit-learn forest (e.g. RandomForestClassifier).
+
+    `leaf_dtype=np.float32` halves the size of the leaf distributions, which
+    make up most of the export, at the cost of rounding the probabilities.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise TypeError("Only single-output forests can be exported")
+
+    classes = np.asarray(model.classes_)
+    if classes.dtype == object:
+        # String labels are stored as a fixed-width array so no pickling is needed
+        classes = classes.astype(str)
+
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+    feature, threshold, left, right, value = [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        # Leaves loop back to themselves and test feature 0 harmlessly
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(is_leaf, ids, tree.children_left) + offset)
+        right.append(np.where(is_leaf, ids, tree.children_right) + offset)
+        counts = tree.value[:, 0, :]
+        value.append(counts / counts.sum(axis=1, keepdims=True))
+
+    return ArrayForest(
+        feature=np.concatenate(feature).astype(np.intp),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        left=np.concatenate(left).astype(np.intp),
+        right=np.concatenate(right).astype(np.intp),
+        value=np.concatenate(value).astype(leaf_dtype),
+        roots=offsets[:-1].astype(np.intp),
+        classes=classes,
+        max_depth=max(tree.max_depth for tree in trees),
+        n_features=model.n_features_in_,
+    )
+
+def source_signature(path):
+    """Identify a model file by size and modification time, to tell whether an export is stale."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load(directory, mmap_mode=None):
+    """Load an exported forest; with mmap_mode the arrays are mapped rather than read."""
+    meta = read_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f"No exported forest in {directory}")
+    arrays = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in ARRAYS
+    }
+    return ArrayForest(max_depth=meta["max_depth"], n_features=meta["n_features"], **arrays)
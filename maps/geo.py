@@ -0,0 +1,87 @@
+from math import floor
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEG_LAT = 111.32
+# Rows compared against all sites at once in Sites.nearest, to bound memory
+CHUNK_ROWS = 65536
+
+def grid_cell(lat, lon, cell_deg):
+    """Quantize coordinates to the integer (row, col) of a grid with cell_deg sized cells."""
+    return floor(lat / cell_deg), floor(lon / cell_deg)
+
+def cell_center(row, col, cell_deg):
+    """Return the (lat, lon) centre of a grid cell."""
+    return (row + 0.5) * cell_deg, (col + 0.5) * cell_deg
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points given in degrees.
+
+    Arguments broadcast like NumPy arrays, so one point against many
+    (point-to-many) returns an array of distances; scalars give a float.
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(np.subtract(lon2, lon1)) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def pairwise_km(lats1, lons1, lats2, lons2):
+    """Return the (len(lats1) x len(lats2)) matrix of distances between two point sets."""
+    lats1, lons1 = np.asarray(lats1, dtype=np.float64)[:, None], np.asarray(lons1, dtype=np.float64)[:, None]
+    return haversine_km(lats1, lons1, np.asarray(lats2, dtype=np.float64), np.asarray(lons2, dtype=np.float64))
+
+def bbox(lat, lon, radius_km):
+    """Return (min_lat, min_lon, max_lat, max_lon) enclosing the circle of radius_km around a point."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlon = min(radius_km / (KM_PER_DEG_LAT * max(np.cos(np.radians(lat)), 1e-6)), 180.0)
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+def in_bbox(lats, lons, box):
+    """Return a boolean mask of the points inside box (see bbox)."""
+    min_lat, min_lon, max_lat, max_lon = box
+    lats, lons = np.asarray(lats), np.asarray(lons)
+    return (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+
+def within_km(lat, lon, lats, lons, radius_km):
+    """Return the indices of the points within radius_km of (lat, lon), nearest first.
+
+    Points outside the bounding box are dropped with cheap comparisons before
+    any trigonometry is done.
+    """
+    lats, lons = np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+    candidates = np.flatnonzero(in_bbox(lats, lons, bbox(lat, lon, radius_km)))
+    distances = haversine_km(lat, lon, lats[candidates], lons[candidates])
+    inside = distances <= radius_km
+    return candidates[inside][np.argsort(distances[inside], kind="stable")]
+
+class Sites:
+    """A fixed set of named sites (e.g. markets) to find the nearest one for many points."""
+
+    def __init__(self, sites):
+        self.names = list(sites)
+        coords = np.array([sites[name] for name in self.names], dtype=np.float64).reshape(-1, 2)
+        self.lat = np.radians(coords[:, 0])
+        self.lon = np.radians(coords[:, 1])
+        self.cos_lat = np.cos(self.lat)
+
+    def nearest(self, lats, lons):
+        """Return (site indices, distances in km) of the nearest site to each point."""
+        lats = np.radians(np.atleast_1d(np.asarray(lats, dtype=np.float64)))
+        lons = np.radians(np.atleast_1d(np.asarray(lons, dtype=np.float64)))
+        index = np.empty(len(lats), dtype=np.intp)
+        a_min = np.empty(len(lats))
+        for start in range(0, len(lats), CHUNK_ROWS):
+            lat = lats[start:start + CHUNK_ROWS, None]
+            lon = lons[start:start + CHUNK_ROWS, None]
+            # The haversine term grows with distance, so its argmin is the nearest site
+            a = np.sin((self.lat - lat) / 2) ** 2 + np.cos(lat) * self.cos_lat * np.sin((self.lon - lon) / 2) ** 2
+            index[start:start + len(lat)] = a.argmin(axis=1)
+            a_min[start:start + len(lat)] = a[np.arange(len(lat)), index[start:start + len(lat)]]
+        return index, 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a_min, 1.0)))
+
+    def nearest_name(self, lat, lon):
+        """Return the name of the site nearest to one point."""
+        return self.names[int(self.nearest(lat, lon)[0][0])]
+
+    def nearest_names(self, lats, lons):
+        """Return the name of the nearest site for each point."""
+        return [self.names[i] for i in self.nearest(lats, lons)[0]]
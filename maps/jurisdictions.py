@@ -0,0 +1,52 @@
+from django.conf import settings
+
+# Regions government profiles can be scoped to, each a list of
+# (min_lat, min_lon, max_lat, max_lon) boxes. Boxes of neighbouring regions
+# overlap at their borders; every farm is assigned to exactly one region,
+# the first listed whose boxes contain it (Farm.jurisdiction), so list the
+# regions in the order that should win shared ground.
+DEFAULT_REGIONS = {
+    "delhi": [(28.4, 76.8, 28.9, 77.4)],
+    "punjab": [(29.5, 73.8, 32.6, 77.0)],
+    "kerala": [(8.2, 74.8, 12.8, 77.5)],
+    "tamil nadu": [(8.0, 76.2, 13.6, 80.4)],
+    "karnataka": [(11.5, 74.0, 18.5, 78.6)],
+    "maharashtra": [(15.6, 72.6, 22.1, 80.9)],
+}
+# Jurisdictions spanning several regions; their users export every farm inside the box
+DEFAULT_NATIONAL = {
+    "india": (6.5, 68.0, 37.1, 97.5),
+}
+
+def normalize(name):
+    return (name or "").strip().lower()
+
+REGIONS = {
+    normalize(name): [tuple(box) for box in boxes]
+    for name, boxes in getattr(settings, "MAPS_JURISDICTION_REGIONS", DEFAULT_REGIONS).items()
+}
+NATIONAL = {
+    normalize(name): tuple(box)
+    for name, box in getattr(settings, "MAPS_NATIONAL_JURISDICTIONS", DEFAULT_NATIONAL).items()
+}
+
+def locate(lat, lon):
+    """Return the region a point is assigned to, or "" outside every region."""
+    for name, boxes in REGIONS.items():
+        for min_lat, min_lon, max_lat, max_lon in boxes:
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                return name
+    return ""
+
+def bounds(name):
+    """Return the box enclosing a region or national jurisdiction, or None if it is not configured."""
+    name = normalize(name)
+    if name in NATIONAL:
+        return NATIONAL[name]
+    boxes = REGIONS.get(name)
+    if not boxes:
+        return None
+    return (
+        min(box[0] for box in boxes), min(box[1] for box in boxes),
+        max(box[2] for box in boxes), max(box[3] for box in boxes),
+    )
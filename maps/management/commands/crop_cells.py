@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from maps import crop_cells
+from maps.models import CropCell
+
+
+class Command(BaseCommand):
+    help = "Rebuild or inspect the per-cell crop counts behind nearby-farm summaries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["rebuild", "stats"])
+
+    def handle(self, *args, **options):
+        if options["action"] == "rebuild":
+            cells = crop_cells.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {cells} crop cells."))
+        else:
+            cells = CropCell.objects.filter(farms__gt=0)
+            self.stdout.write(f"Crop cells: {cells.count()}")
+            self.stdout.write(f"Cell size: {crop_cells.CELL_DEG} degrees")
@@ -0,0 +1,54 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from maps import export, jurisdictions
+
+
+class Command(BaseCommand):
+    help = "Export farms of a jurisdiction or bounding box as CSV or Parquet, or run queued export jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", nargs="?", help="File to write.")
+        parser.add_argument("--format", choices=export.FORMATS, help="Output format (default: from the file extension, else csv).")
+        parser.add_argument(
+            "--jurisdiction",
+            help=f"Export the farms of one jurisdiction: {', '.join(sorted({*jurisdictions.REGIONS, *jurisdictions.NATIONAL}))}.",
+        )
+        parser.add_argument(
+            "--bbox", nargs=4, type=float, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"),
+            help="Export farms inside this bounding box.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_ROWS, help=f"Farms per query (default: {export.CHUNK_ROWS}).")
+        parser.add_argument("--run-jobs", action="store_true", help="Run the pending export jobs queued through the web endpoint.")
+        parser.add_argument(
+            "--poll", type=float, metavar="SECONDS",
+            help="With --run-jobs, keep running and check for new jobs this often.",
+        )
+
+    def handle(self, *args, **options):
+        if options["run_jobs"]:
+            while True:
+                count = export.run_pending()
+                if count or not options["poll"]:
+                    self.stdout.write(self.style.SUCCESS(f"Ran {count} export jobs."))
+                if not options["poll"]:
+                    return
+                time.sleep(options["poll"])
+        output = options["output"]
+        if not output:
+            raise CommandError("Give an output file, or --run-jobs")
+        fmt = options["format"] or ("parquet" if output.endswith(".parquet") else "csv")
+        if fmt == "parquet" and export.pyarrow is None:
+            raise CommandError("Parquet export needs pyarrow (pip install pyarrow)")
+        name, bbox = jurisdictions.normalize(options["jurisdiction"]), options["bbox"]
+        if name:
+            area = jurisdictions.bounds(name)
+            if area is None:
+                raise CommandError(f"Unknown jurisdiction: {options['jurisdiction']}")
+            if name in jurisdictions.NATIONAL:
+                # National jurisdictions cover every farm in their box
+                bbox = export.intersect(area, bbox) if bbox else area
+                name = ""
+                if bbox is None:
+                    raise CommandError("The bounding box is outside the jurisdiction")
+        written = export.write(fmt, export.farms(name, bbox), output, options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} farms to {output}"))
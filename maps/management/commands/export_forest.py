@@ -0,0 +1,41 @@
+import os
+import shutil
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from maps import forest
+from maps.model_loader import CROP_FOREST_DIR, CROP_MODEL_PATH
+
+
+class Command(BaseCommand):
+    help = "Export the crop recommendation forest to memory-mappable NumPy arrays."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=CROP_MODEL_PATH, help="Pickled scikit-learn forest to export.")
+        parser.add_argument("--output", default=CROP_FOREST_DIR, help="Directory to write the arrays to.")
+        parser.add_argument(
+            "--float32-leaves", action="store_true",
+            help="Store leaf class distributions as float32, halving most of the export.",
+        )
+
+    def handle(self, *args, **options):
+        model_path = options["model"]
+        output = options["output"]
+        try:
+            model = joblib.load(model_path)
+            leaf_dtype = np.float32 if options["float32_leaves"] else np.float64
+            exported = forest.export_forest(model, leaf_dtype=leaf_dtype)
+        except (OSError, AttributeError, TypeError) as e:
+            raise CommandError(f"Cannot export {model_path}: {e}")
+
+        # Write next to the target and swap it in; workers that mapped the old
+        # arrays keep reading them until they reload.
+        tmp = output + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        exported.save(tmp, source=forest.source_signature(model_path))
+        shutil.rmtree(output, ignore_errors=True)
+        os.replace(tmp, output)
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(exported.roots)} trees, {len(exported.feature)} nodes "
+            f"(max depth {exported.max_depth}) to {output}"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from maps import terrain
+
+
+class Command(BaseCommand):
+    help = "Import a DEM and land/water mask (ESRI ASCII grids) into the offline terrain store."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dem", help="Elevation grid in ESRI ASCII (.asc) format, in metres.")
+        parser.add_argument(
+            "--water-mask",
+            help="Land/water grid on the same grid as the DEM; non-zero cells are water. "
+                 "Defaults to treating cells at or below sea level as water.",
+        )
+        parser.add_argument(
+            "--output", default=terrain.TERRAIN_DIR,
+            help=f"Directory to write the store to (default: {terrain.TERRAIN_DIR}).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            store = terrain.import_ascii_grids(options["dem"], options["water_mask"], options["output"])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Terrain import failed: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {store.rows}x{store.cols} cells covering {store.bounds}. "
+            "Restart workers to pick up the new store."
+        ))
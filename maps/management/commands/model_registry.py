@@ -0,0 +1,115 @@
+import os
+import signal
+import joblib
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from maps import forest, model_registry
+from maps.model_loader import forest_dir
+
+
+class Command(BaseCommand):
+    help = "Publish, activate, list and verify versioned model artifacts, and signal workers to reload."
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="action", required=True)
+
+        publish = subparsers.add_parser("publish", help="Add model files as new versions.")
+        publish.add_argument("paths", nargs="+", help="Model files; several files need --name-from-file.")
+        publish.add_argument("--name", help="Registry name (e.g. crop_recommendation).")
+        publish.add_argument(
+            "--name-from-file", action="store_true",
+            help="Name each model after its file, e.g. data/arima_rice_Kochi.pkl -> arima_rice_Kochi.",
+        )
+        publish.add_argument("--version", help="Version label (default: timestamp and checksum).")
+        publish.add_argument("--no-activate", action="store_true", help="Publish without making it current.")
+        publish.add_argument(
+            "--export-forest", action="store_true",
+            help="Also store a memory-mappable array export of a scikit-learn forest.",
+        )
+        publish.add_argument(
+            "--float32-leaves", action="store_true",
+            help="Store the exported leaf distributions as float32 (see scripts/sweep_crop_model.py).",
+        )
+
+        activate = subparsers.add_parser("activate", help="Make a published version current (also used to roll back).")
+        activate.add_argument("name")
+        activate.add_argument("version")
+
+        listing = subparsers.add_parser("list", help="List models and their versions.")
+        listing.add_argument("name", nargs="?")
+
+        verify = subparsers.add_parser("verify", help="Check artifact checksums.")
+        verify.add_argument("name", nargs="?")
+
+        reload = subparsers.add_parser("reload", help="Signal worker processes to pick up activated versions now.")
+        reload.add_argument("pids", nargs="+", type=int)
+
+    def handle(self, *args, **options):
+        try:
+            getattr(self, f"handle_{options['action']}")(options)
+        except model_registry.RegistryError as e:
+            raise CommandError(str(e))
+
+    def handle_publish(self, options):
+        paths = options["paths"]
+        if not options["name_from_file"] and (not options["name"] or len(paths) > 1):
+            raise CommandError("Pass --name for a single file, or --name-from-file.")
+        self.leaf_dtype = np.float32 if options["float32_leaves"] else np.float64
+        prepare = self.export_forest if options["export_forest"] else None
+        for path in paths:
+            if not os.path.isfile(path):
+                raise CommandError(f"No such file: {path}")
+            name = os.path.splitext(os.path.basename(path))[0] if options["name_from_file"] else options["name"]
+            version = model_registry.publish(
+                name, path, version=options["version"], activate=not options["no_activate"], prepare=prepare,
+            )
+            state = "published" if options["no_activate"] else "published and activated"
+            self.stdout.write(self.style.SUCCESS(f"{name} {version} {state}"))
+
+    def export_forest(self, artifact):
+        try:
+            exported = forest.export_forest(joblib.load(artifact), leaf_dtype=self.leaf_dtype)
+        except (AttributeError, TypeError) as e:
+            raise CommandError(f"Cannot export {artifact} as a forest: {e}")
+        exported.save(forest_dir(artifact), source=forest.source_signature(artifact))
+
+    def handle_activate(self, options):
+        model_registry.set_current(options["name"], options["version"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['name']} {options['version']} activated; workers switch within "
+            f"{getattr(settings, 'MAPS_MODEL_CHECK_INTERVAL', 5)}s or on reload."
+        ))
+
+    def handle_list(self, options):
+        for name in [options["name"]] if options["name"] else model_registry.names():
+            current = model_registry.current_version(name)
+            self.stdout.write(f"{name} (current: {current or 'none'})")
+            for manifest in model_registry.versions(name):
+                marker = "*" if manifest["version"] == current else " "
+                self.stdout.write(
+                    f"  {marker} {manifest['version']}  {manifest['sha256'][:12]}  "
+                    f"{manifest['size']} bytes  {manifest['created_at']}"
+                )
+
+    def handle_verify(self, options):
+        failed = 0
+        for name in [options["name"]] if options["name"] else model_registry.names():
+            for manifest in model_registry.versions(name):
+                try:
+                    model_registry.verify(name, manifest["version"])
+                    self.stdout.write(f"{name} {manifest['version']}: ok")
+                except model_registry.RegistryError as e:
+                    failed += 1
+                    self.stderr.write(f"{name} {manifest['version']}: {e}")
+        if failed:
+            raise CommandError(f"{failed} artifact(s) failed verification")
+
+    def handle_reload(self, options):
+        signum = getattr(signal, getattr(settings, "MAPS_MODEL_RELOAD_SIGNAL", None) or "SIGUSR2")
+        for pid in options["pids"]:
+            try:
+                os.kill(pid, signum)
+                self.stdout.write(f"Sent {signum.name} to {pid}")
+            except OSError as e:
+                self.stderr.write(f"Could not signal {pid}: {e}")
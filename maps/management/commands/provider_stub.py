@@ -0,0 +1,161 @@
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from maps.provider_client import DEFAULT_URLS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "provider_fixtures")
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Read the recorded response of every provider as raw JSON bytes."""
+    fixtures = {}
+    for name in DEFAULT_URLS:
+        path = os.path.join(directory, f"{name}.json")
+        if not os.path.exists(path):
+            raise CommandError(f"Missing fixture for {name}: {path}")
+        with open(path, "rb") as f:
+            body = f.read()
+        json.loads(body)
+        fixtures[name] = body
+    return fixtures
+
+
+def parse_provider_values(values, convert, option):
+    parsed = {}
+    for value in values or []:
+        name, _, setting = value.partition("=")
+        if name not in DEFAULT_URLS or not setting:
+            raise CommandError(f"{option} expects PROVIDER=VALUE with one of {', '.join(DEFAULT_URLS)}, got {value!r}")
+        parsed[name] = convert(setting)
+    return parsed
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Replay a provider's recorded response for any GET under /<provider>/."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        provider = urlsplit(self.path).path.strip("/").split("/")[0]
+        body = server.fixtures.get(provider)
+        if body is None:
+            self.send_json(404, b'{"error": "unknown provider"}')
+            return
+
+        latency = server.latency.get(provider, server.default_latency)
+        if latency or server.jitter:
+            time.sleep(max(0.0, latency + random.uniform(-server.jitter, server.jitter)) / 1000)
+
+        error_rate = server.error_rate.get(provider, server.default_error_rate)
+        if error_rate and random.random() < error_rate:
+            server.count(provider, "errors")
+            self.send_json(server.error_status, b'{"error": "injected failure"}')
+            return
+        server.count(provider, "requests")
+        self.send_json(200, body)
+
+    def send_json(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixtures, default_latency=0, latency=None, jitter=0,
+                 default_error_rate=0, error_rate=None, error_status=503, verbose=False):
+        super().__init__(address, StubHandler)
+        self.fixtures = fixtures
+        self.default_latency = default_latency
+        self.latency = latency or {}
+        self.jitter = jitter
+        self.default_error_rate = default_error_rate
+        self.error_rate = error_rate or {}
+        self.error_status = error_status
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def count(self, provider, key):
+        with self.lock:
+            counters = self.counters.setdefault(provider, {"requests": 0, "errors": 0})
+            counters[key] += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve recorded responses of the external map providers locally, with "
+        "configurable latency and error injection, for offline benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8099)
+        parser.add_argument(
+            "--fixtures", default=FIXTURES_DIR,
+            help="Directory with one <provider>.json recorded response per provider.",
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0,
+            help="Delay in milliseconds added to every response (default: 0).",
+        )
+        parser.add_argument(
+            "--provider-latency", action="append", metavar="PROVIDER=MS",
+            help="Per-provider delay overriding --latency, e.g. soilgrids=800. Repeatable.",
+        )
+        parser.add_argument(
+            "--jitter", type=float, default=0,
+            help="Random +/- milliseconds added to each delay (default: 0).",
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0,
+            help="Fraction of requests answered with --error-status (default: 0).",
+        )
+        parser.add_argument(
+            "--provider-error-rate", action="append", metavar="PROVIDER=RATE",
+            help="Per-provider error rate overriding --error-rate, e.g. nominatim=0.2. Repeatable.",
+        )
+        parser.add_argument(
+            "--error-status", type=int, default=503,
+            help="HTTP status of injected failures (default: 503).",
+        )
+        parser.add_argument("--seed", type=int, help="Seed the jitter and error injection for repeatable runs.")
+
+    def handle(self, *args, **options):
+        if options["seed"] is not None:
+            random.seed(options["seed"])
+        server = StubServer(
+            (options["host"], options["port"]),
+            load_fixtures(options["fixtures"]),
+            default_latency=options["latency"],
+            latency=parse_provider_values(options["provider_latency"], float, "--provider-latency"),
+            jitter=options["jitter"],
+            default_error_rate=options["error_rate"],
+            error_rate=parse_provider_values(options["provider_error_rate"], float, "--provider-error-rate"),
+            error_status=options["error_status"],
+            verbose=options["verbosity"] > 1,
+        )
+        address = f"http://{options['host']}:{server.server_address[1]}"
+        self.stdout.write(self.style.SUCCESS(f"Provider stub listening on {address}"))
+        self.stdout.write(f"Start the app with MAPS_PROVIDER_STUB={address} to use it.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            for provider, counters in sorted(server.counters.items()):
+                self.stdout.write(f"{provider}: {counters['requests']} served, {counters['errors']} injected errors")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from maps import sync
+
+
+class Command(BaseCommand):
+    help = "Delete tombstones of deleted farms older than the delta sync retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=sync.TOMBSTONE_DAYS,
+            help=f"Keep tombstones this many days (default: {sync.TOMBSTONE_DAYS}).",
+        )
+
+    def handle(self, *args, **options):
+        deleted = sync.prune(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} tombstones."))
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import time
+from functools import partial
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from maps import batch, crop_cells, model_loader, refresh, tiles
+
+
+class Command(BaseCommand):
+    help = "Recompute the recommended crop of every farm, or of one region, with current prices and models."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bbox", nargs=4, type=float, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"),
+            help="Only refresh farms inside this bounding box.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Farms per chunk (default: 5000).")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Worker processes scoring chunks; 0 scores in this process (default: CPU count).",
+        )
+        parser.add_argument(
+            "--cell-deg", type=float, default=batch.CELL_DEG,
+            help="Farms in the same grid cell share one environment lookup "
+                 f"(default: {batch.CELL_DEG}; 0.1 matches the Open-Meteo cache).",
+        )
+        parser.add_argument("--resume", action="store_true", help="Continue after the last chunk of an interrupted run.")
+        parser.add_argument("--checkpoint", default=refresh.CHECKPOINT_FILE, help="Progress file used by --resume.")
+
+    def handle(self, *args, **options):
+        bbox = options["bbox"]
+        checkpoint = options["checkpoint"]
+        state = {"bbox": bbox, "cell_deg": options["cell_deg"], "last_id": 0, "done": 0, "changed": 0}
+        if options["resume"]:
+            saved = refresh.read_checkpoint(checkpoint)
+            if saved is None:
+                raise CommandError(f"No checkpoint to resume from in {checkpoint}")
+            if saved["bbox"] != bbox or saved["cell_deg"] != options["cell_deg"]:
+                raise CommandError(
+                    f"Checkpoint is for --bbox {saved['bbox']} --cell-deg {saved['cell_deg']}; pass the same options."
+                )
+            state = saved
+            self.stdout.write(f"Resuming after farm {state['last_id']} ({state['done']} farms done)")
+
+        queryset = refresh.farms(bbox)
+        total = state["done"] + queryset.filter(id__gt=state["last_id"]).count()
+        if total == state["done"]:
+            self.stdout.write("No farms to refresh.")
+            refresh.clear_checkpoint(checkpoint)
+            return
+        self.stdout.write(f"Refreshing {total - state['done']} of {total} farms")
+
+        chunks = refresh.iter_chunks(queryset, options["chunk_size"], after_id=state["last_id"])
+        score = partial(refresh.recommend_chunk, cell_deg=options["cell_deg"])
+        pool = None
+        if options["workers"] > 0:
+            # Load the model before forking so workers share its pages, and
+            # drop DB connections the children must not reuse
+            model_loader.preload()
+            connections.close_all()
+            pool = multiprocessing.get_context("fork").Pool(options["workers"])
+            # Keep every worker busy with one chunk queued behind it, and no more in memory
+            results = refresh.imap_bounded(pool, score, chunks, 2 * options["workers"])
+        else:
+            results = map(score, chunks)
+
+        start = time.monotonic()
+        done_at_start = state["done"]
+        try:
+            # Results arrive in chunk order, so the checkpoint always marks a contiguous prefix
+            for last_id, seen, changed in results:
+                with transaction.atomic():
+                    refresh.write_changes(changed)
+                state.update(last_id=last_id, done=state["done"] + seen, changed=state["changed"] + len(changed))
+                refresh.write_checkpoint(state, checkpoint)
+                rate = (state["done"] - done_at_start) / max(time.monotonic() - start, 1e-9)
+                eta = (total - state["done"]) / rate if rate else 0
+                self.stdout.write(
+                    f"{state['done']}/{total} farms, {state['changed']} changed, "
+                    f"{rate:.0f} farms/s, about {eta:.0f}s left"
+                )
+        except KeyboardInterrupt:
+            raise CommandError(f"Interrupted after farm {state['last_id']}; rerun with --resume to continue.")
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        # bulk_update bypasses the signals that keep the per-cell crop counts and tiles current
+        if state["changed"]:
+            crop_cells.rebuild()
+            tiles.invalidate_all()
+        refresh.clear_checkpoint(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {state['done']} farms, {state['changed']} changed recommendation."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from maps.models import FARM_CELL_DEG, Farm
+
+
+class Command(BaseCommand):
+    help = ("Recompute the indexed grid cell and jurisdiction of every farm, "
+            "e.g. after changing MAPS_FARM_CELL_DEG or MAPS_JURISDICTION_REGIONS.")
+
+    def handle(self, *args, **options):
+        updated = Farm.objects.reindex_cells()
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {updated} farms into {FARM_CELL_DEG} degree cells."))
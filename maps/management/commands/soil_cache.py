@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from maps import soil_cache
+from maps.geo import grid_cell
+from maps.models import Farm, SoilCell
+from maps.providers import fetch_soil_properties
+
+
+class Command(BaseCommand):
+    help = "Warm up, invalidate or inspect the grid-quantized SoilGrids cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["warm", "invalidate", "stats"])
+        parser.add_argument(
+            "--bbox", nargs=4, type=float, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"),
+            help="Limit the action to cells inside this bounding box.",
+        )
+        parser.add_argument(
+            "--farms", action="store_true",
+            help="Warm the cells of every registered farm.",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Concurrent SoilGrids requests during warm-up (default: 4).",
+        )
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        bbox = options["bbox"]
+
+        if action == "warm":
+            cells = set()
+            if bbox:
+                cells.update(soil_cache.cells_in_bbox(*bbox))
+            if options["farms"]:
+                for lat, lon in Farm.objects.values_list("latitude", "longitude").iterator():
+                    cells.add(grid_cell(lat, lon, soil_cache.CELL_DEG))
+            if not cells:
+                raise CommandError("Nothing to warm: pass --bbox and/or --farms.")
+            self.stdout.write(f"Warming up to {len(cells)} cells...")
+            fetched, failed = soil_cache.warm(cells, fetch_soil_properties, workers=options["workers"])
+            self.stdout.write(self.style.SUCCESS(f"Fetched {fetched} cells, {failed} failed."))
+
+        elif action == "invalidate":
+            deleted = soil_cache.invalidate(bbox)
+            self.stdout.write(self.style.SUCCESS(f"Invalidated {deleted} cells."))
+
+        else:
+            cells = SoilCell.objects.all()
+            latest = cells.order_by("-fetched_at").values_list("fetched_at", flat=True).first()
+            self.stdout.write(f"Cached cells: {cells.count()}")
+            self.stdout.write(f"Cell size: {soil_cache.CELL_DEG} degrees")
+            self.stdout.write(f"Last fetched: {latest or 'never'}")
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0006_remove_priceprediction_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SoilCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.IntegerField()),
+                ('col', models.IntegerField()),
+                ('nitrogen', models.FloatField()),
+                ('phosphorus', models.FloatField()),
+                ('potassium', models.FloatField()),
+                ('ph', models.FloatField()),
+                ('soil_type', models.CharField(max_length=20)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('row', 'col')},
+            },
+        ),
+    ]
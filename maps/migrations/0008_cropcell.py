@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:26
+
+from math import floor
+from django.conf import settings
+from django.db import migrations, models
+
+
+def count_farms(apps, schema_editor):
+    """Fill the table from existing farms; afterwards signals keep it current."""
+    Farm = apps.get_model('maps', 'Farm')
+    CropCell = apps.get_model('maps', 'CropCell')
+    cell_deg = getattr(settings, 'MAPS_CROP_CELL_DEG', 0.02)
+    cells = {}
+    for lat, lon, crop, area in Farm.objects.values_list('latitude', 'longitude', 'recommended_crop', 'area').iterator():
+        counts = cells.setdefault((floor(lat / cell_deg), floor(lon / cell_deg), crop or ''), [0, 0, 0.0])
+        counts[0] += 1
+        if area is not None:
+            counts[1] += 1
+            counts[2] += area
+    CropCell.objects.bulk_create(
+        [CropCell(row=row, col=col, crop=crop, farms=farms, area_farms=area_farms, area_sum=area_sum)
+         for (row, col, crop), (farms, area_farms, area_sum) in cells.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0007_soilcell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CropCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.IntegerField()),
+                ('col', models.IntegerField()),
+                ('crop', models.CharField(blank=True, max_length=100)),
+                ('farms', models.IntegerField(default=0)),
+                ('area_farms', models.IntegerField(default=0)),
+                ('area_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'unique_together': {('row', 'col', 'crop')},
+            },
+        ),
+        migrations.RunPython(count_farms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from math import floor
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_cells(apps, schema_editor):
+    """Compute the grid cell of existing farms; Farm.save() does it for new ones."""
+    Farm = apps.get_model('maps', 'Farm')
+    cell_deg = getattr(settings, 'MAPS_FARM_CELL_DEG', 0.01)
+    batch = []
+    for farm in Farm.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=1000):
+        farm.cell_row = floor(farm.latitude / cell_deg)
+        farm.cell_col = floor(farm.longitude / cell_deg)
+        batch.append(farm)
+        if len(batch) == 1000:
+            Farm.objects.bulk_update(batch, ['cell_row', 'cell_col'])
+            batch = []
+    if batch:
+        Farm.objects.bulk_update(batch, ['cell_row', 'cell_col'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0008_cropcell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farm',
+            name='cell_col',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='cell_row',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_cells, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(fields=['cell_row', 'cell_col'], name='maps_farm_cell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(fields=['latitude', 'longitude'], name='maps_farm_latlon_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0010_farm_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(fields=['farmer', 'planting_date', 'id'], name='maps_farm_planted_idx'),
+        ),
+    ]
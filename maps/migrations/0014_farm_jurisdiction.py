@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+def assign_jurisdictions(apps, schema_editor):
+    """Assign existing farms to their region; Farm.save() does it for new ones."""
+    from maps.jurisdictions import locate
+    Farm = apps.get_model('maps', 'Farm')
+    batch = []
+    for farm in Farm.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=1000):
+        farm.jurisdiction = locate(farm.latitude, farm.longitude)
+        batch.append(farm)
+        if len(batch) == 1000:
+            Farm.objects.bulk_update(batch, ['jurisdiction'])
+            batch = []
+    if batch:
+        Farm.objects.bulk_update(batch, ['jurisdiction'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0013_exportjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='jurisdiction',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='jurisdiction',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(assign_jurisdictions, migrations.RunPython.noop),
+    ]
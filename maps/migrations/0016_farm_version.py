@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    """Create the single row FarmVersion.bump() increments."""
+    apps.get_model('maps', 'FarmVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0015_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
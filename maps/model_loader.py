@@ -0,0 +1,230 @@
+import logging
+import os
+import signal
+import threading
+import time
+import joblib
+from django.conf import settings
+from . import forest, model_registry
+
+logger = logging.getLogger(__name__)
+
+CROP_MODEL = "crop_recommendation"
+CROP_MODEL_PATH = os.path.join(settings.BASE_DIR, "maps", "crop_recommendation_model.pkl")
+# Fixed paths models are served from while they have no active registry version
+LEGACY_PATHS = {
+    CROP_MODEL: CROP_MODEL_PATH,
+    "oversupply_model": os.path.join(settings.BASE_DIR, "data", "oversupply_model.pkl"),
+    "pest_risk_model": os.path.join(settings.BASE_DIR, "data", "pest_risk_model.pkl"),
+}
+# Serve recommendations from the array-based forest instead of scikit-learn
+ARRAY_FOREST = getattr(settings, "MAPS_ARRAY_FOREST", True)
+# joblib memory-maps arrays it stored uncompressed, so forked workers share
+# those pages with the page cache instead of each holding a private copy.
+MMAP_MODE = getattr(settings, "MAPS_MODEL_MMAP_MODE", "r")
+# Seconds between checks for a newly activated registry version
+CHECK_INTERVAL = getattr(settings, "MAPS_MODEL_CHECK_INTERVAL", 5)
+
+def forest_dir(model_path):
+    """Return where the array export of a pickled forest lives (see `manage.py export_forest`)."""
+    return os.path.splitext(model_path)[0] + ".forest"
+
+CROP_FOREST_DIR = forest_dir(CROP_MODEL_PATH)
+
+class LoadedModel:
+    """A model loaded from disk together with what it cost to load."""
+
+    def __init__(self, path, model, load_seconds, file_size, rss_delta, version=None, checksum=None):
+        self.path = path
+        self.model = model
+        self.load_seconds = load_seconds
+        self.file_size = file_size
+        self.rss_delta = rss_delta
+        self.version = version
+        self.checksum = checksum
+        self.loaded_at = time.time()
+        # Registry state this model was resolved from, and when it was last checked
+        self.marker = None
+        self.generation = 0
+        self.checked_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "loaded": self.model is not None,
+            "path": self.path,
+            "version": self.version,
+            "sha256": self.checksum,
+            "load_seconds": round(self.load_seconds, 3),
+            "file_size": self.file_size,
+            "rss_delta": self.rss_delta,
+            "loaded_at": self.loaded_at,
+        }
+
+_lock = threading.Lock()
+_models = {}
+_named = {}
+_refresh_locks = {}
+# Bumped by the reload signal handler; named models re-check the registry when it changes
+_generation = 0
+
+def _rss_bytes():
+    """Return this process's resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _size(path):
+    if path is None:
+        return None
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path) if os.path.exists(path) else None
+
+def _load(path, mmap_mode, loader):
+    rss_before = _rss_bytes()
+    start = time.monotonic()
+    try:
+        model = loader(path, mmap_mode=mmap_mode)
+        logger.info(f"ML model loaded successfully from {path}")
+    except Exception as e:
+        logger.error(f"Error loading model {path}: {e}")
+        model = None
+    load_seconds = time.monotonic() - start
+    rss_after = _rss_bytes()
+    rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+    return LoadedModel(path, model, load_seconds, _size(path), rss_delta)
+
+def get_model(path=CROP_MODEL_PATH, mmap_mode=MMAP_MODE, loader=joblib.load):
+    """Return the model stored at `path`, loading it on first use.
+
+    Each path is loaded once per process and shared by every caller. Returns
+    None if the model could not be loaded; the failure is not retried.
+    """
+    path = os.path.abspath(os.path.join(settings.BASE_DIR, path))
+    loaded = _models.get(path)
+    if loaded is None:
+        with _lock:
+            loaded = _models.get(path)
+            if loaded is None:
+                loaded = _models[path] = _load(path, mmap_mode, loader)
+    return loaded.model
+
+def _resolve(name):
+    """Return (version, path, checksum) of the artifact a named model should be served from."""
+    version = model_registry.current_version(name)
+    if version is not None:
+        path = model_registry.verify(name, version)
+        return version, path, model_registry.manifest(name, version)["sha256"]
+    path = LEGACY_PATHS.get(name, os.path.join(settings.BASE_DIR, "data", f"{name}.pkl"))
+    return None, path, None
+
+def _refresh(name, loader, current):
+    """Load the active version of a named model if it changed, swapping it in atomically."""
+    with _lock:
+        refresh_lock = _refresh_locks.setdefault(name, threading.Lock())
+    # While one thread loads a new version the others keep serving the current one
+    if not refresh_lock.acquire(blocking=current is None):
+        return current
+    try:
+        current = _named.get(name)
+        generation = _generation
+        marker = model_registry.current_marker_mtime(name)
+        if current is not None and current.marker == marker:
+            current.checked_at = time.monotonic()
+            current.generation = generation
+            return current
+        try:
+            version, path, checksum = _resolve(name)
+        except model_registry.RegistryError as e:
+            logger.error(f"Not loading {name}: {e}")
+            if current is not None:
+                current.checked_at = time.monotonic()
+                current.generation = generation
+                return current
+            version, path, checksum = None, LEGACY_PATHS.get(name), None
+
+        loaded = _load(path, MMAP_MODE, loader)
+        loaded.version, loaded.checksum = version, checksum
+        loaded.marker, loaded.generation = marker, generation
+        if loaded.model is None and current is not None:
+            logger.error(f"Keeping {name} version {current.version}; version {version} failed to load")
+            current.marker, current.checked_at, current.generation = marker, time.monotonic(), generation
+            return current
+        if current is not None:
+            logger.info(f"Swapped {name} from version {current.version} to {version}")
+        _named[name] = loaded
+        return loaded
+    finally:
+        refresh_lock.release()
+
+def get_named_model(name, loader=joblib.load):
+    """Return the active version of a registered model, loading or swapping it as needed.
+
+    The registry is re-checked every CHECK_INTERVAL seconds and right after
+    the reload signal. The first request to notice a new version loads it
+    synchronously, while concurrent requests keep serving the old one, and
+    then swaps it in with a single assignment.
+    Falls back to LEGACY_PATHS for models without a registry version.
+    """
+    loaded = _named.get(name)
+    if loaded is None or loaded.generation != _generation or time.monotonic() - loaded.checked_at >= CHECK_INTERVAL:
+        loaded = _refresh(name, loader, loaded)
+    return loaded.model if loaded else None
+
+def _load_crop_model(path, mmap_mode=None):
+    """Load the crop model as an array forest when enabled, otherwise as scikit-learn's."""
+    if ARRAY_FOREST:
+        directory = forest_dir(path)
+        meta = forest.read_meta(directory)
+        if meta is not None and meta.get("source") == forest.source_signature(path):
+            return forest.load(directory, mmap_mode=mmap_mode)
+        if meta is not None:
+            logger.warning(f"Array forest in {directory} is stale, exporting {path} in memory")
+    model = joblib.load(path, mmap_mode=mmap_mode)
+    if not ARRAY_FOREST:
+        return model
+    try:
+        return forest.export_forest(model)
+    except (AttributeError, TypeError) as e:
+        logger.warning(f"Serving {path} with scikit-learn, array export failed: {e}")
+        return model
+
+def get_crop_model():
+    """Return the crop recommendation model used for inference.
+
+    This is the array-based forest (memory-mapped from its export when that
+    is current, otherwise exported in memory), or the scikit-learn model if
+    the array forest is disabled or cannot be built.
+    """
+    return get_named_model(CROP_MODEL, loader=_load_crop_model)
+
+def crop_model_version():
+    """Return an identifier of the crop model being served that changes whenever it is swapped."""
+    get_crop_model()
+    loaded = _named.get(CROP_MODEL)
+    return (loaded.version, loaded.checksum, loaded.loaded_at) if loaded else None
+
+def request_reload(signum=None, frame=None):
+    """Make every named model re-check the registry on its next use; safe as a signal handler."""
+    global _generation
+    _generation += 1
+
+def install_reload_signal(signum):
+    """Reload models when this process receives `signum`; only possible from the main thread."""
+    try:
+        signal.signal(signum, request_reload)
+    except ValueError as e:
+        logger.warning(f"Cannot install model reload signal handler: {e}")
+
+def preload():
+    """Load the crop model eagerly, e.g. in a preforking server's master before workers fork."""
+    get_crop_model()
+
+def stats():
+    """Return the version, load time and size of every model loaded in this process."""
+    with _lock:
+        loaded = {name: model.stats() for name, model in sorted(_named.items())}
+        loaded.update((path, model.stats()) for path, model in sorted(_models.items()))
+    return loaded
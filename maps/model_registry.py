@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Layout: <REGISTRY_DIR>/<name>/<version>/{manifest.json, <artifact>[, <artifact stem>.forest/]}
+# plus <REGISTRY_DIR>/<name>/CURRENT naming the active version.
+REGISTRY_DIR = getattr(settings, "MODEL_REGISTRY_DIR", os.path.join(settings.BASE_DIR, "data", "models"))
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+class RegistryError(Exception):
+    """Raised for unknown models or versions and for artifacts failing their checksum."""
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _model_dir(name):
+    if not name or os.sep in name or name.startswith("."):
+        raise RegistryError(f"Invalid model name: {name!r}")
+    return os.path.join(REGISTRY_DIR, name)
+
+def names():
+    """Return the names of all registered models."""
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    return sorted(entry.name for entry in os.scandir(REGISTRY_DIR) if entry.is_dir())
+
+def manifest(name, version):
+    try:
+        with open(os.path.join(_model_dir(name), version, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise RegistryError(f"Unknown version {version} of {name}")
+
+def versions(name):
+    """Return the manifests of every published version of a model, oldest first."""
+    directory = _model_dir(name)
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for entry in os.scandir(directory):
+        if entry.is_dir() and os.path.exists(os.path.join(entry.path, MANIFEST_FILE)):
+            found.append(manifest(name, entry.name))
+    return sorted(found, key=lambda m: m["created_at"])
+
+def current_version(name):
+    """Return the active version of a model, or None if it has none."""
+    try:
+        with open(os.path.join(_model_dir(name), CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def artifact_path(name, version):
+    return os.path.join(_model_dir(name), version, manifest(name, version)["artifact"])
+
+def verify(name, version):
+    """Raise RegistryError unless the artifact of a version matches its recorded checksum."""
+    recorded = manifest(name, version)
+    path = os.path.join(_model_dir(name), version, recorded["artifact"])
+    if not os.path.exists(path) or sha256(path) != recorded["sha256"]:
+        raise RegistryError(f"Checksum mismatch for {name} version {version}")
+    return path
+
+def publish(name, source, version=None, activate=True, prepare=None):
+    """Copy a model file into the registry as a new version and return the version.
+
+    The version is staged in a temporary directory and renamed into place
+    once complete, so readers never see a half-written artifact. `prepare`
+    may add derived files (e.g. an array export) to the staged directory; it
+    is called with the staged artifact path.
+    """
+    checksum = sha256(source)
+    version = version or f"{datetime.now(timezone.utc):%Y%m%d%H%M%S}-{checksum[:8]}"
+    directory = _model_dir(name)
+    target = os.path.join(directory, version)
+    if os.path.exists(target):
+        raise RegistryError(f"{name} version {version} already exists")
+
+    staging = os.path.join(directory, f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        artifact = os.path.basename(source)
+        shutil.copy2(source, os.path.join(staging, artifact))
+        if prepare:
+            prepare(os.path.join(staging, artifact))
+        _write_atomic(os.path.join(staging, MANIFEST_FILE), json.dumps({
+            "name": name,
+            "version": version,
+            "artifact": artifact,
+            "sha256": checksum,
+            "size": os.path.getsize(source),
+            "source": os.path.abspath(source),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }, indent=2))
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    logger.info(f"Published {name} version {version} ({checksum[:12]})")
+    if activate:
+        set_current(name, version)
+    return version
+
+def set_current(name, version):
+    """Make a verified version the active one; running workers pick it up on their next check."""
+    verify(name, version)
+    _write_atomic(os.path.join(_model_dir(name), CURRENT_FILE), version + "\n")
+    logger.info(f"Activated {name} version {version}")
+
+def current_marker_mtime(name):
+    """Return the modification time of a model's CURRENT file, or None; cheap enough to poll."""
+    try:
+        return os.stat(os.path.join(_model_dir(name), CURRENT_FILE)).st_mtime_ns
+    except OSError:
+        return None
@@ -2,6 +2,78 @@
 from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
+from . import geo, jurisdictions
+
+# ~1 km grid cells farms are indexed by (cell_row, cell_col)
+FARM_CELL_DEG = getattr(settings, "MAPS_FARM_CELL_DEG", 0.01)
+# Radius of the first ring searched by FarmQuerySet.nearest, grown until k farms are found
+NEAREST_START_KM = 2
+# Stored values the Farm pre_save and pre_delete receivers (crop_cells, tiles) work from
+PREVIOUS_FIELDS = ("latitude", "longitude", "recommended_crop", "area")
+
+class FarmQuerySet(models.QuerySet):
+    """Spatial lookups that narrow farms through the indexed grid cell before exact checks."""
+
+    def in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Farms inside a bounding box; the cell range selects candidates from the (cell_row, cell_col) index."""
+        min_row, min_col = geo.grid_cell(min_lat, min_lon, FARM_CELL_DEG)
+        max_row, max_col = geo.grid_cell(max_lat, max_lon, FARM_CELL_DEG)
+        return self.filter(
+            cell_row__range=(min_row, max_row), cell_col__range=(min_col, max_col),
+            latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon),
+        )
+
+    def within_km(self, lat, lon, radius_km):
+        """Return the farms within radius_km of (lat, lon), nearest first, each with a distance_km attribute."""
+        farms = list(self.in_bbox(*geo.bbox(lat, lon, radius_km)))
+        if not farms:
+            return []
+        distances = geo.haversine_km(lat, lon, [farm.latitude for farm in farms], [farm.longitude for farm in farms])
+        for farm, distance in zip(farms, distances.tolist()):
+            farm.distance_km = distance
+        return sorted((farm for farm in farms if farm.distance_km <= radius_km), key=lambda farm: farm.distance_km)
+
+    def nearest(self, lat, lon, k=1, max_radius_km=100):
+        """Return up to k farms nearest to (lat, lon) within max_radius_km, searching growing rings."""
+        radius = min(NEAREST_START_KM, max_radius_km)
+        while True:
+            farms = self.within_km(lat, lon, radius)
+            if len(farms) >= k or radius >= max_radius_km:
+                return farms[:k]
+            radius = min(radius * 2, max_radius_km)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.set_cell()
+            obj.set_jurisdiction()
+        created = super().bulk_create(objs, *args, **kwargs)
+        FarmVersion.bump()
+        return created
+
+    def update(self, **kwargs):
+        # Also reached by bulk_update; saves and deletes are counted by the maps.sync receivers
+        updated = super().update(**kwargs)
+        if updated:
+            FarmVersion.bump()
+        return updated
+
+    def reindex_cells(self, batch_size=1000):
+        """Recompute the grid cell and jurisdiction of every farm, e.g. after changing
+        MAPS_FARM_CELL_DEG or MAPS_JURISDICTION_REGIONS."""
+        fields = ["cell_row", "cell_col", "jurisdiction"]
+        updated = 0
+        batch = []
+        for farm in self.only("id", "latitude", "longitude").iterator(chunk_size=batch_size):
+            farm.set_cell()
+            farm.set_jurisdiction()
+            batch.append(farm)
+            if len(batch) == batch_size:
+                updated += self.model.objects.bulk_update(batch, fields)
+                batch = []
+        if batch:
+            updated += self.model.objects.bulk_update(batch, fields)
+        return updated
 
 class Farm(models.Model):
     STATUS_CHOICES = [
@@ -67,14 +139,163 @@ class Farm(models.Model):
     yield_per_acre = models.FloatField(null=True, blank=True)
     oversupply_risk = models.BooleanField(default=False)
     oversupply_status = models.CharField(max_length=20, default="Low")
+    # Grid cell of (latitude, longitude), see FARM_CELL_DEG; kept current by save()
+    cell_row = models.IntegerField(default=0, editable=False)
+    cell_col = models.IntegerField(default=0, editable=False)
+    # Region the farm is assigned to, see maps.jurisdictions; kept current by save()
+    jurisdiction = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
+    # Delta sync cursors (maps.sync) compare against updated_at
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = FarmQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cell_row", "cell_col"], name="maps_farm_cell_idx"),
+            models.Index(fields=["latitude", "longitude"], name="maps_farm_latlon_idx"),
+            # Keyset pagination of a farmer's farms by planting date (maps.pagination)
+            models.Index(fields=["farmer", "planting_date", "id"], name="maps_farm_planted_idx"),
+        ]
 
     def __str__(self):
         return f"{self.farmer.username}'s farm at ({self.latitude}, {self.longitude})"
 
+    def set_cell(self):
+        self.cell_row, self.cell_col = geo.grid_cell(float(self.latitude), float(self.longitude), FARM_CELL_DEG)
+
+    def set_jurisdiction(self):
+        self.jurisdiction = jurisdictions.locate(float(self.latitude), float(self.longitude))
+
+    def previous_values(self):
+        """Return the stored PREVIOUS_FIELDS of a farm being saved or deleted, or None for a new farm.
+
+        Read at most once per save or delete, however many receivers ask for it.
+        """
+        if self.pk is None:
+            return None
+        if "_previous_values" not in self.__dict__:
+            self._previous_values = Farm.objects.filter(pk=self.pk).values_list(*PREVIOUS_FIELDS).first()
+        return self._previous_values
+
+    def save(self, *args, **kwargs):
+        self.set_cell()
+        self.set_jurisdiction()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "cell_row", "cell_col", "jurisdiction"}
+        self.__dict__.pop("_previous_values", None)
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self.__dict__.pop("_previous_values", None)
+
+    def delete(self, *args, **kwargs):
+        self.__dict__.pop("_previous_values", None)
+        try:
+            return super().delete(*args, **kwargs)
+        finally:
+            self.__dict__.pop("_previous_values", None)
+
+class FarmVersion(models.Model):
+    # A single row counting writes to the farm table. Sync ETags include it, so
+    # a transaction that commits with an updated_at older than the latest one
+    # still changes them when it commits.
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Farm data version {self.version}"
+
+    @classmethod
+    def bump(cls):
+        """Count a write to the farm table, inside the writer's transaction."""
+        if not cls.objects.filter(pk=1).update(version=models.F("version") + 1):
+            cls.objects.get_or_create(pk=1, defaults={"version": 1})
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+class FarmTombstone(models.Model):
+    # Left behind by a deleted farm so delta sync clients can drop it
+    farm_id = models.BigIntegerField()
+    farmer_id = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Farm {self.farm_id} deleted at {self.deleted_at}"
+
+class ExportJob(models.Model):
+    # A bulk farm export written to a file in the background (maps.export)
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet'),
+    ]
+
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    # Only farms assigned to this region (Farm.jurisdiction), when set
+    jurisdiction = models.CharField(max_length=100, blank=True)
+    # [min_lat, min_lon, max_lat, max_lon], or null for every farm
+    bbox = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    rows = models.IntegerField(default=0)
+    path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Runs so far; a runner only writes to the job while its attempt is current
+    attempts = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched after every chunk; running jobs that stop beating are reclaimed
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.format} export {self.pk} ({self.status})"
+
 class PricePrediction(models.Model):
     crop = models.CharField(max_length=100)
     date = models.DateField()
     predicted_price = models.FloatField()
 
     def __str__(self):
-        return f"{self.crop} on {self.date}: ₹{self.predicted_price}"
\ No newline at end of file
+        return f"{self.crop} on {self.date}: ₹{self.predicted_price}"
+
+class SoilCell(models.Model):
+    # Grid cell indices, see maps.geo.grid_cell
+    row = models.IntegerField()
+    col = models.IntegerField()
+    nitrogen = models.FloatField()
+    phosphorus = models.FloatField()
+    potassium = models.FloatField()
+    ph = models.FloatField()
+    soil_type = models.CharField(max_length=20)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("row", "col")
+
+    def __str__(self):
+        return f"Soil cell ({self.row}, {self.col}): {self.soil_type}"
+
+class CropCell(models.Model):
+    # Farms per recommended crop in a grid cell, kept current by maps.crop_cells
+    row = models.IntegerField()
+    col = models.IntegerField()
+    crop = models.CharField(max_length=100, blank=True)
+    farms = models.IntegerField(default=0)
+    # Farms with a known area, and the sum of those areas
+    area_farms = models.IntegerField(default=0)
+    area_sum = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ("row", "col", "crop")
+
+    def __str__(self):
+        return f"Crop cell ({self.row}, {self.col}): {self.farms} x {self.crop or 'none'}"
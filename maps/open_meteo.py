@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import threading
+import weakref
+from datetime import datetime, timezone
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from . import provider_client
+from .geo import grid_cell, cell_center
+
+logger = logging.getLogger(__name__)
+
+# Open-Meteo's models are ~10 km, so neighbouring farms share one forecast
+CELL_DEG = getattr(settings, "OPEN_METEO_CELL_DEG", 0.1)
+CACHE_TTL = getattr(settings, "OPEN_METEO_CACHE_TTL", 3600)
+PAST_DAYS = 30
+HOURLY = "temperature_2m,relative_humidity_2m,precipitation,windspeed_10m,soil_moisture_0_1cm"
+DAILY = "temperature_2m_mean,precipitation_sum"
+
+_inflight_lock = threading.Lock()
+_inflight = {}
+# Per event loop: cache key -> task fetching it
+_ainflight = weakref.WeakKeyDictionary()
+
+def _summarize(data):
+    """Reduce the Open-Meteo payload to the values the map views use."""
+    hourly = data["hourly"]
+    # Hourly series start PAST_DAYS days back; this is today's first hour.
+    now = PAST_DAYS * 24
+    daily = data["daily"]
+    temps = daily["temperature_2m_mean"][:PAST_DAYS]
+    rain = daily["precipitation_sum"][:PAST_DAYS]
+    return {
+        "weather": {
+            "temperature": hourly["temperature_2m"][now],
+            "humidity": hourly["relative_humidity_2m"][now],
+            "rainfall": hourly["precipitation"][now],
+            "wind_speed": hourly["windspeed_10m"][now],
+        },
+        "climate": {
+            "avg_temp": sum(temps) / len(temps),
+            "avg_rainfall": sum(rain) / PAST_DAYS * 365,
+        },
+        "soil_moisture": hourly["soil_moisture_0_1cm"][now] * 100,
+    }
+
+def forecast_url(lat, lon):
+    return (
+        f"{provider_client.base_url('open_meteo')}/v1/forecast?latitude={lat}&longitude={lon}"
+        f"&hourly={HOURLY}&daily={DAILY}&past_days={PAST_DAYS}&forecast_days=1"
+    )
+
+def fetch_forecast(lat, lon):
+    """Fetch hourly and daily variables for a location in a single Open-Meteo request."""
+    try:
+        response = provider_client.get("open_meteo", forecast_url(lat, lon))
+        return _summarize(response.json())
+    except (requests.RequestException, KeyError, IndexError, TypeError, ZeroDivisionError) as e:
+        logger.error(f"Error fetching Open-Meteo forecast at ({lat}, {lon}): {e}")
+        return None
+
+async def afetch_forecast(lat, lon):
+    """Async version of fetch_forecast."""
+    try:
+        data = await provider_client.aget_json("open_meteo", forecast_url(lat, lon))
+        return _summarize(data)
+    except (requests.RequestException, KeyError, IndexError, TypeError, ZeroDivisionError) as e:
+        logger.error(f"Error fetching Open-Meteo forecast at ({lat}, {lon}): {e}")
+        return None
+
+def _cache_key(lat, lon):
+    row, col = grid_cell(lat, lon, CELL_DEG)
+    hour = datetime.now(timezone.utc).strftime("%Y%m%d%H")
+    return row, col, f"open-meteo:{CELL_DEG}:{row}:{col}:{hour}"
+
+def get_forecast(lat, lon):
+    """Return the cached forecast summary for the grid cell containing (lat, lon).
+
+    Entries are keyed by grid cell and forecast hour. Concurrent callers for
+    the same key wait on a single request instead of each fetching it.
+    Returns None if Open-Meteo could not be reached.
+    """
+    row, col, key = _cache_key(lat, lon)
+    forecast = cache.get(key)
+    if forecast is not None:
+        return forecast
+
+    with _inflight_lock:
+        lock = _inflight.setdefault(key, threading.Lock())
+    with lock:
+        forecast = cache.get(key)
+        if forecast is None:
+            forecast = fetch_forecast(*cell_center(row, col, CELL_DEG))
+            if forecast is not None:
+                cache.set(key, forecast, CACHE_TTL)
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    return forecast
+
+async def aget_forecast(lat, lon):
+    """Async version of get_forecast; concurrent callers on one event loop share a single request."""
+    row, col, key = _cache_key(lat, lon)
+    forecast = await cache.aget(key)
+    if forecast is not None:
+        return forecast
+
+    inflight = _ainflight.setdefault(asyncio.get_running_loop(), {})
+    task = inflight.get(key)
+    if task is None:
+        async def fetch():
+            try:
+                result = await afetch_forecast(*cell_center(row, col, CELL_DEG))
+                if result is not None:
+                    await cache.aset(key, result, CACHE_TTL)
+                return result
+            finally:
+                inflight.pop(key, None)
+
+        task = inflight[key] = asyncio.ensure_future(fetch())
+    return await asyncio.shield(task)
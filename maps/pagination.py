@@ -0,0 +1,119 @@
+import base64
+import json
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 500
+# Total counts are cached per farmer, sync cursor and FarmVersion, so any save or delete starts a new entry
+COUNT_CACHE_TTL = getattr(settings, "MAPS_FARM_COUNT_CACHE_TTL", 600)
+
+# Orderings clients may page through; each ends with the unique id
+ORDERINGS = ("id", "planting_date")
+
+def encode_cursor(order, row):
+    """Return an opaque URL-safe cursor pointing at a values() row."""
+    key = [row["id"]]
+    if order == "planting_date":
+        key.insert(0, row["planting_date"].isoformat() if row["planting_date"] else None)
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(order, cursor):
+    """Return the sort key a cursor points at; raises ValueError for malformed cursors."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if order == "id":
+        if not (isinstance(key, list) and len(key) == 1 and isinstance(key[0], int)):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return key
+    if not (isinstance(key, list) and len(key) == 2 and isinstance(key[0], (str, type(None))) and isinstance(key[1], int)):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return [date.fromisoformat(key[0]) if key[0] is not None else None, key[1]]
+
+def _after(order, key):
+    """Rows that sort after `key`; farms without a planting date come last."""
+    if order == "id":
+        return Q(id__gt=key[0])
+    planted, farm_id = key
+    if planted is None:
+        return Q(planting_date__isnull=True, id__gt=farm_id)
+    return (
+        Q(planting_date__gt=planted) | Q(planting_date=planted, id__gt=farm_id)
+        | Q(planting_date__isnull=True)
+    )
+
+def _before(order, key):
+    if order == "id":
+        return Q(id__lt=key[0])
+    planted, farm_id = key
+    if planted is None:
+        return Q(planting_date__isnull=False) | Q(planting_date__isnull=True, id__lt=farm_id)
+    return Q(planting_date__lt=planted) | Q(planting_date=planted, id__lt=farm_id)
+
+def _ordering(order, reverse=False):
+    if order == "id":
+        return ["-id" if reverse else "id"]
+    if reverse:
+        return [F("planting_date").desc(nulls_first=True), "-id"]
+    return [F("planting_date").asc(nulls_last=True), "id"]
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset, with cursors to its neighbours."""
+
+    def __init__(self, order, items, has_next, has_previous):
+        self.order = order
+        self.items = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.order, self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.order, self.items[0]) if self.has_previous and self.items else None
+
+def keyset_page(rows, order="id", after=None, before=None, page_size=PAGE_SIZE):
+    """Return the KeysetPage of a values() queryset following cursor `after`, or preceding `before`.
+
+    Unlike OFFSET pagination, every page is an indexed range scan of
+    page_size + 1 rows, however deep into the listing it is, and no
+    COUNT(*) is needed. The values() rows must include the ordering fields.
+    """
+    if order not in ORDERINGS:
+        raise ValueError(f"Unknown ordering: {order}")
+    if before:
+        items = list(rows.filter(_before(order, decode_cursor(order, before))).order_by(*_ordering(order, reverse=True))[:page_size + 1])
+        has_previous = len(items) > page_size
+        return KeysetPage(order, items[:page_size][::-1], has_next=True, has_previous=has_previous)
+    if after:
+        rows = rows.filter(_after(order, decode_cursor(order, after)))
+    items = list(rows.order_by(*_ordering(order))[:page_size + 1])
+    return KeysetPage(order, items[:page_size], has_next=len(items) > page_size, has_previous=bool(after))
+
+def page_size(value, default=PAGE_SIZE):
+    """Parse a ?page_size= parameter, clamped to 1..MAX_PAGE_SIZE."""
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return default
+
+def cached_count(queryset, key, version):
+    """Return queryset.count(), cached under `key` until `version` (e.g. a sync cursor) changes."""
+    cache_key = f"maps:count:{key}:{version}"
+    total = cache.get(cache_key)
+    if total is None:
+        total = queryset.count()
+        cache.set(cache_key, total, COUNT_CACHE_TTL)
+    return total
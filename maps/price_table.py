@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+from bisect import bisect_right
+from datetime import date, datetime
+import pandas as pd
+from django.conf import settings
+from . import geo
+
+logger = logging.getLogger(__name__)
+
+PRICE_CSV = os.path.join(settings.BASE_DIR, "data", "price_predictions.csv")
+MARKETS = {
+    'Kochi': (9.9312, 76.2673),
+    'Chennai': (13.0827, 80.2707),
+    'Delhi': (28.7041, 77.1025),
+    'Ludhiana': (30.9009, 75.8573)
+}
+_MARKET_SITES = geo.Sites(MARKETS)
+
+def nearest_market(lat, lon):
+    """Return the market closest to (lat, lon) by great-circle distance."""
+    return _MARKET_SITES.nearest_name(lat, lon)
+
+def nearest_markets(lats, lons):
+    """Return the closest market of each point, in one vectorized pass."""
+    return _MARKET_SITES.nearest_names(lats, lons)
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+class PriceTable:
+    """Predicted prices indexed by (crop, market, date), reloaded when the CSV changes.
+
+    Rows of the CSV are keyed "<crop>_<market>". The index is rebuilt and
+    swapped in as a whole, so readers never see a partially loaded table.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.lock = threading.Lock()
+        # (prices by (crop, market, date), (dates, prices) series by (crop, market))
+        self.index = ({}, {})
+
+    def _load(self):
+        df = pd.read_csv(self.path)
+        dates = pd.to_datetime(df["date"], errors='coerce')
+        prices, series = {}, {}
+        for key, day, price in zip(df["crop"], dates, df["predicted_price"]):
+            # Blank crop cells come back as NaN floats; keys must look like <crop>_<market>
+            if pd.isna(day) or pd.isna(price) or not isinstance(key, str) or "_" not in key:
+                continue
+            crop, _, market = key.rpartition("_")
+            prices[(crop, market, day.date())] = float(price)
+        for (crop, market, day), price in sorted(prices.items()):
+            days, values = series.setdefault((crop, market), ([], []))
+            days.append(day)
+            values.append(price)
+        return prices, series
+
+    def refresh(self):
+        """Reload the table if the CSV's modification time changed since the last load."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self.mtime:
+            return self.index
+        with self.lock:
+            if mtime != self.mtime:
+                if mtime is None:
+                    logger.warning(f"Price CSV missing at {self.path}")
+                    self.index = ({}, {})
+                else:
+                    try:
+                        self.index = self._load()
+                        logger.info(f"Loaded {len(self.index[0])} price predictions from {self.path}")
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.error(f"Error loading {self.path}: {e}")
+                self.mtime = mtime
+        return self.index
+
+    def get(self, crop, market, day, default=None):
+        """Return the predicted price for an exact date, or `default`."""
+        prices, _ = self.refresh()
+        return prices.get((crop, market, _as_date(day)), default)
+
+    def latest(self, crop, market, day):
+        """Return the most recent predicted price on or before `day`, or None."""
+        _, series = self.refresh()
+        days, values = series.get((crop, market), ((), ()))
+        position = bisect_right(days, _as_date(day))
+        return values[position - 1] if position else None
+
+_table = PriceTable(PRICE_CSV)
+
+def version():
+    """Return an identifier of the loaded price data that changes whenever it is reloaded."""
+    _table.refresh()
+    return _table.mtime
+
+def get_price(crop, market, day, default=None):
+    """Return the predicted price of a crop at a market on a date."""
+    return _table.get(crop, market, day, default)
+
+def latest_price(crop, market, day):
+    """Return the latest predicted price of a crop at a market on or before a date."""
+    return _table.latest(crop, market, day)
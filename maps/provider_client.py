@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDERS = {
+    "nominatim": {"timeout": 5},
+    "open_meteo": {"timeout": 5},
+    "soilgrids": {"timeout": 14},
+    "open_elevation": {"timeout": 5},
+    "sunrise_sunset": {"timeout": 5},
+}
+DEFAULT_URLS = {
+    "nominatim": "https://nominatim.openstreetmap.org",
+    "open_meteo": "https://api.open-meteo.com",
+    "soilgrids": "https://rest.isric.org",
+    "open_elevation": "https://api.open-elevation.com",
+    "sunrise_sunset": "https://api.sunrise-sunset.org",
+}
+DEFAULTS = {
+    "timeout": 5,
+    "retries": 1,
+    "backoff": 0.2,
+    "failure_threshold": 5,
+    "reset_timeout": 30,
+    "pool_size": 20,
+}
+USER_AGENT = "agrichain/1.0"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class ProviderError(requests.RequestException):
+    """Raised for failures of the async client, so callers handle one exception family."""
+
+class ProviderUnavailable(ProviderError):
+    """Raised without touching the network while a provider's circuit is open."""
+
+class CircuitBreaker:
+    """Stop calling a provider after repeated failures, then probe it again after a cool-down."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Return True if a call may go through; only one probe is let through when half-open."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let this caller probe; others keep short-circuiting until it reports back
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+class ProviderClient:
+    """Pooled keep-alive session for one provider host with retries and a circuit breaker.
+
+    The sync session serves WSGI views; async views get an httpx client per
+    event loop that shares the same breaker and counters.
+    """
+
+    def __init__(self, name, timeout, retries, backoff, failure_threshold, reset_timeout, pool_size):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.async_clients = weakref.WeakKeyDictionary()
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "errors": 0,
+            "retries": 0,
+            "short_circuits": 0,
+            "total_latency": 0.0,
+            "max_latency": 0.0,
+        }
+
+    def _count(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.counters[key] += value
+
+    def _record_latency(self, elapsed):
+        with self.lock:
+            self.counters["requests"] += 1
+            self.counters["total_latency"] += elapsed
+            self.counters["max_latency"] = max(self.counters["max_latency"], elapsed)
+
+    def get(self, url, **kwargs):
+        """GET a URL and return the response, raising requests.RequestException on failure.
+
+        Transient failures (connection errors, timeouts, 429/5xx) are retried
+        with jittered exponential backoff and count towards opening the circuit.
+        """
+        if not self.breaker.allow():
+            self._count(short_circuits=1)
+            raise ProviderUnavailable(f"{self.name} circuit is open")
+
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = self.session.get(url, **kwargs)
+                self._record_latency(time.monotonic() - start)
+                if response.status_code not in RETRY_STATUSES:
+                    # 4xx means the request was bad, not that the provider is down
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                response.raise_for_status()
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code not in RETRY_STATUSES:
+                    self._count(errors=1)
+                    raise
+                error = e
+            except requests.RequestException as e:
+                self._record_latency(time.monotonic() - start)
+                error = e
+
+            if attempt >= self.retries:
+                self._count(errors=1)
+                self.breaker.record_failure()
+                raise error
+            attempt += 1
+            self._count(retries=1)
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self.async_clients.get(loop)
+        if client is None:
+            # Clients of finished loops can no longer be closed cleanly; drop
+            # them so their sockets are released with them
+            for old_loop in [old_loop for old_loop in list(self.async_clients) if old_loop.is_closed()]:
+                self.async_clients.pop(old_loop, None)
+            client = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+            self.async_clients[loop] = client
+        return client
+
+    async def aget_json(self, url, **kwargs):
+        """Async GET returning the decoded JSON body; same retry and breaker rules as get().
+
+        Raises ProviderError on failure.
+        """
+        if httpx is None:
+            raise ProviderError("httpx is required for async provider calls")
+        if not self.breaker.allow():
+            self._count(short_circuits=1)
+            raise ProviderUnavailable(f"{self.name} circuit is open")
+
+        client = self._async_client()
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = await client.get(url, **kwargs)
+                self._record_latency(time.monotonic() - start)
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    return response.json()
+                error = ProviderError(f"{self.name} returned HTTP {response.status_code}")
+            except httpx.HTTPStatusError as e:
+                self._count(errors=1)
+                raise ProviderError(str(e)) from e
+            except ValueError as e:
+                self._count(errors=1)
+                raise ProviderError(f"{self.name} returned invalid JSON: {e}") from e
+            except httpx.HTTPError as e:
+                self._record_latency(time.monotonic() - start)
+                error = ProviderError(f"{self.name} request failed: {e!r}")
+
+            if attempt >= self.retries:
+                self._count(errors=1)
+                self.breaker.record_failure()
+                raise error
+            attempt += 1
+            self._count(retries=1)
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def aclose(self):
+        """Close the async client of the running event loop, if there is one."""
+        client = self.async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        counters["avg_latency"] = counters["total_latency"] / counters["requests"] if counters["requests"] else 0.0
+        counters["circuit"] = self.breaker.state
+        return counters
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def base_url(provider):
+    """Return the base URL for a provider, honouring MAPS_PROVIDER_URLS overrides."""
+    return getattr(settings, "MAPS_PROVIDER_URLS", {}).get(provider, DEFAULT_URLS[provider]).rstrip("/")
+
+def get_client(name):
+    """Return the shared client for a provider, creating it on first use."""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                configured = getattr(settings, "MAPS_PROVIDERS", {})
+                options = {**DEFAULTS, **DEFAULT_PROVIDERS.get(name, {}), **configured.get(name, {})}
+                client = ProviderClient(name, **options)
+                _clients[name] = client
+    return client
+
+def get(provider, url, **kwargs):
+    """GET a URL through the named provider's pooled client."""
+    return get_client(provider).get(url, **kwargs)
+
+async def aget_json(provider, url, **kwargs):
+    """Async GET of a JSON document through the named provider's pooled client."""
+    return await get_client(provider).aget_json(url, **kwargs)
+
+async def aclose():
+    """Close every provider's async client on the running loop, e.g. at ASGI shutdown."""
+    for client in list(_clients.values()):
+        await client.aclose()
+
+def stats():
+    """Return latency, error and circuit state counters for every provider used so far."""
+    return {name: client.stats() for name, client in sorted(_clients.items())}
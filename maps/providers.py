@@ -0,0 +1,226 @@
+import logging
+import requests
+from datetime import datetime
+from . import open_meteo, provider_client, soil_cache, terrain
+
+logger = logging.getLogger(__name__)
+
+WATER_KEYWORDS = ['sea', 'ocean', 'waterbody', 'lake', 'river', 'bay', 'gulf']
+SOIL_FALLBACK = {"N": 0.8, "P": 40, "K": 50, "ph": 6.5, "soil_type": "loamy", "elevation": 28}
+
+# Each provider is split into a URL builder and a parser so the sync
+# fetchers below and their async counterparts share the same logic.
+
+def water_place_url(lat, lon):
+    return f"{provider_client.base_url('nominatim')}/reverse?format=json&lat={lat}&lon={lon}&zoom=10"
+
+def parse_water_place(lat, lon, data):
+    location_type = data.get('type', '')
+    display_name = data.get('display_name', '')
+    is_water = any(keyword in location_type.lower() or keyword in display_name.lower() for keyword in WATER_KEYWORDS)
+    if is_water:
+        logger.info(f"Water location detected at ({lat}, {lon}): {display_name}")
+    return is_water
+
+def lookup_water_place(lat, lon):
+    """Ask Nominatim whether the coordinates are a water body.
+
+    Returns True/False, or None if the lookup failed.
+    """
+    try:
+        response = provider_client.get("nominatim", water_place_url(lat, lon))
+        return parse_water_place(lat, lon, response.json())
+    except requests.RequestException as e:
+        logger.error(f"Error checking location at ({lat}, {lon}): {e}")
+        return None
+
+async def alookup_water_place(lat, lon):
+    """Async version of lookup_water_place."""
+    try:
+        data = await provider_client.aget_json("nominatim", water_place_url(lat, lon))
+        return parse_water_place(lat, lon, data)
+    except requests.RequestException as e:
+        logger.error(f"Error checking location at ({lat}, {lon}): {e}")
+        return None
+
+def resolve_water_location(lat, lon, place_is_water, elevation):
+    """Combine the Nominatim answer with elevation (sea typically has elevation <= 0)."""
+    if place_is_water:
+        return True
+    if elevation <= 0:
+        if place_is_water is None:
+            logger.warning(f"API failed, elevation {elevation} at ({lat}, {lon}), assuming water")
+        else:
+            logger.warning(f"Location ({lat}, {lon}) has elevation {elevation}, likely water")
+        return True
+    return False
+
+def check_water_location(lat, lon, elevation=None):
+    """Check if the given coordinates are over water.
+
+    Uses the offline terrain store when it covers the point, otherwise
+    Nominatim with an elevation fallback.
+    """
+    terrain_point = terrain.lookup(lat, lon)
+    if terrain_point is not None:
+        return terrain_point[1]
+    place_is_water = lookup_water_place(lat, lon)
+    if place_is_water:
+        return True
+    if elevation is None:
+        elevation = get_elevation(lat, lon)
+    return resolve_water_location(lat, lon, place_is_water, elevation)
+
+def weather_from_forecast(forecast):
+    if forecast is None:
+        return {"temperature": 25, "humidity": 70, "rainfall": 0, "wind_speed": 2.5}
+    return dict(forecast["weather"])
+
+def get_weather_data(lat, lon):
+    """Get current weather from the shared Open-Meteo forecast."""
+    return weather_from_forecast(open_meteo.get_forecast(lat, lon))
+
+async def aget_weather_data(lat, lon):
+    """Async version of get_weather_data."""
+    return weather_from_forecast(await open_meteo.aget_forecast(lat, lon))
+
+def soil_properties_url(lat, lon):
+    return f"{provider_client.base_url('soilgrids')}/soilgrids/v2.0/properties/query?lat={lat}&lon={lon}&property=nitrogen&property=phh2o&property=clay&property=sand&property=silt&property=cec&depth=0-5cm&value=mean"
+
+def parse_soil_properties(data):
+    layers = data["properties"]["layers"]
+    soil_properties = {}
+    for layer in layers:
+        for depth in layer["depths"]:
+            if depth["range"]["top_depth"] == 0 and depth["range"]["bottom_depth"] == 5:
+                soil_properties[layer["name"]] = depth["values"]["mean"]
+
+    required = ["nitrogen", "phh2o", "clay", "sand", "silt"]
+    if not all(k in soil_properties for k in required):
+        raise KeyError("Incomplete SoilGrids data")
+
+    N = soil_properties["nitrogen"] / 100
+    ph = soil_properties["phh2o"] / 10
+    clay = soil_properties["clay"] / 10
+    sand = soil_properties["sand"] / 10
+    silt = soil_properties["silt"] / 10
+    soil_type = "sandy" if sand > 85 else "clay" if clay > 40 and silt < 40 else "silt" if silt > 40 and clay < 20 else "loamy"
+    K = (soil_properties.get("cec", 100) / 10)
+    P = 35 + (N * 7) if soil_type == "loamy" else 50 + (N * 10) if soil_type == "clay" else 20 + (N * 5) if soil_type == "sandy" else 40 + (N * 8)
+    P = min(max(P, 10), 100)
+    K = min(max(K, 20), 150)
+    return {"N": N, "P": P, "K": K, "ph": ph, "soil_type": soil_type}
+
+def fetch_soil_properties(lat, lon):
+    """Fetch soil properties (without elevation) from SoilGrids API."""
+    try:
+        response = provider_client.get("soilgrids", soil_properties_url(lat, lon))
+        return parse_soil_properties(response.json())
+    except (requests.RequestException, KeyError) as e:
+        logger.error(f"Error fetching soil data at ({lat}, {lon}): {e}")
+        return None
+
+async def afetch_soil_properties(lat, lon):
+    """Async version of fetch_soil_properties."""
+    try:
+        data = await provider_client.aget_json("soilgrids", soil_properties_url(lat, lon))
+        return parse_soil_properties(data)
+    except (requests.RequestException, KeyError) as e:
+        logger.error(f"Error fetching soil data at ({lat}, {lon}): {e}")
+        return None
+
+def get_soil_properties(lat, lon):
+    """Get soil properties (without elevation) from the soil cache, falling back to SoilGrids."""
+    return soil_cache.get_or_fetch(lat, lon, fetch_soil_properties)
+
+async def aget_soil_properties(lat, lon):
+    """Async version of get_soil_properties."""
+    return await soil_cache.aget_or_fetch(lat, lon, afetch_soil_properties)
+
+def get_soil_data(lat, lon):
+    """Fetch soil data from SoilGrids API."""
+    soil = get_soil_properties(lat, lon)
+    if soil is None:
+        return dict(SOIL_FALLBACK)
+    return {**soil, "elevation": get_elevation(lat, lon)}
+
+def climate_from_forecast(forecast):
+    if forecast is None:
+        return {"avg_temp": 24, "avg_rainfall": 1200}
+    return dict(forecast["climate"])
+
+def get_climate_data(lat, lon):
+    """Get 30-day climate averages from the shared Open-Meteo forecast."""
+    return climate_from_forecast(open_meteo.get_forecast(lat, lon))
+
+async def aget_climate_data(lat, lon):
+    """Async version of get_climate_data."""
+    return climate_from_forecast(await open_meteo.aget_forecast(lat, lon))
+
+def sunlight_hours_url(lat, lon):
+    return f"{provider_client.base_url('sunrise_sunset')}/json?lat={lat}&lng={lon}&formatted=0"
+
+def parse_sunlight_hours(data):
+    results = data["results"]
+    sunrise = datetime.fromisoformat(results["sunrise"])
+    sunset = datetime.fromisoformat(results["sunset"])
+    return round((sunset - sunrise).total_seconds() / 3600, 1)
+
+def get_sunlight_hours(lat, lon):
+    """Fetch sunlight hours from Sunrise-Sunset API."""
+    try:
+        response = provider_client.get("sunrise_sunset", sunlight_hours_url(lat, lon))
+        return parse_sunlight_hours(response.json())
+    except Exception as e:
+        logger.error(f"Error fetching sunlight hours at ({lat}, {lon}): {e}")
+        return 6.5
+
+async def aget_sunlight_hours(lat, lon):
+    """Async version of get_sunlight_hours."""
+    try:
+        data = await provider_client.aget_json("sunrise_sunset", sunlight_hours_url(lat, lon))
+        return parse_sunlight_hours(data)
+    except Exception as e:
+        logger.error(f"Error fetching sunlight hours at ({lat}, {lon}): {e}")
+        return 6.5
+
+def soil_moisture_from_forecast(forecast):
+    if forecast is None:
+        return 30.0
+    return forecast["soil_moisture"]
+
+def get_soil_moisture(lat, lon):
+    """Get soil moisture from the shared Open-Meteo forecast."""
+    return soil_moisture_from_forecast(open_meteo.get_forecast(lat, lon))
+
+async def aget_soil_moisture(lat, lon):
+    """Async version of get_soil_moisture."""
+    return soil_moisture_from_forecast(await open_meteo.aget_forecast(lat, lon))
+
+def get_elevation(lat, lon):
+    """Get elevation from the offline terrain store, falling back to Open-Elevation."""
+    terrain_point = terrain.lookup(lat, lon)
+    if terrain_point is not None:
+        return terrain_point[0]
+    return fetch_elevation(lat, lon)
+
+def elevation_url(lat, lon):
+    return f"{provider_client.base_url('open_elevation')}/api/v1/lookup?locations={lat},{lon}"
+
+def fetch_elevation(lat, lon):
+    """Fetch elevation from Open-Elevation API."""
+    try:
+        response = provider_client.get("open_elevation", elevation_url(lat, lon))
+        return response.json()["results"][0]["elevation"]
+    except Exception as e:
+        logger.error(f"Error fetching elevation at ({lat}, {lon}): {e}")
+        return 10
+
+async def afetch_elevation(lat, lon):
+    """Async version of fetch_elevation."""
+    try:
+        data = await provider_client.aget_json("open_elevation", elevation_url(lat, lon))
+        return data["results"][0]["elevation"]
+    except Exception as e:
+        logger.error(f"Error fetching elevation at ({lat}, {lon}): {e}")
+        return 10
@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from . import model_loader, price_table
+
+MAX_ENTRIES = getattr(settings, "MAPS_RECOMMENDATION_CACHE_SIZE", 10000)
+# Weather inputs change hourly, like the Open-Meteo cache; a price file reload
+# or a crop model swap also changes every key (see key()), so entries never
+# outlive the prices and model they were computed with.
+TTL = getattr(settings, "MAPS_RECOMMENDATION_CACHE_TTL", getattr(settings, "OPEN_METEO_CACHE_TTL", 3600))
+
+# Precision each input is rounded to before keying. Differences below these
+# steps do not change a recommendation in any meaningful way.
+QUANTA = (
+    ("soil", "N", 0.1),            # g/kg
+    ("soil", "P", 5),              # mg/kg
+    ("soil", "K", 5),              # mg/kg
+    ("soil", "ph", 0.1),
+    ("soil", "elevation", 50),     # m
+    ("weather", "temperature", 0.5),  # deg C
+    ("weather", "humidity", 5),    # %
+    ("climate", "avg_temp", 0.5),  # deg C
+    ("climate", "avg_rainfall", 50),  # mm/year
+)
+
+class LRUCache:
+    """A thread-safe least-recently-used cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                self.counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters, entries=len(self.entries), max_entries=self.max_entries)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        return counters
+
+_cache = LRUCache(MAX_ENTRIES, TTL)
+
+def _quantize(value, step):
+    return None if value is None else round(value / step)
+
+def key(soil, weather, climate, market):
+    """Return the cache key of a location's inputs, quantized to QUANTA."""
+    sources = {"soil": soil, "weather": weather, "climate": climate}
+    values = tuple(_quantize(sources[source].get(name), step) for source, name, step in QUANTA)
+    return values + (soil.get("soil_type"), market, price_table.version(), model_loader.crop_model_version())
+
+def lookup(cache_key):
+    """Return the cached recommendations for a key, or None."""
+    return _cache.get(cache_key)
+
+def store(cache_key, recommendations):
+    _cache.set(cache_key, recommendations)
+
+def clear():
+    _cache.clear()
+
+def stats():
+    """Return hit, miss, eviction and expiry counters plus the hit rate for this process."""
+    return _cache.stats()
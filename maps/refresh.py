@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+from collections import deque
+from django.conf import settings
+from django.utils import timezone
+from . import batch
+from .models import Farm
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = os.path.join(settings.BASE_DIR, "data", "refresh_recommendations.json")
+
+def farms(bbox=None):
+    """Return the farms of a region (min_lat, min_lon, max_lat, max_lon), or all farms."""
+    queryset = Farm.objects.all()
+    if bbox:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        queryset = queryset.filter(latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon))
+    return queryset
+
+def iter_chunks(queryset, chunk_size, after_id=0):
+    """Yield lists of (id, latitude, longitude, recommended_crop) in id order, starting after `after_id`.
+
+    Chunks are read by id range rather than by offset, so each query stays
+    cheap however far into the table the run is.
+    """
+    while True:
+        rows = list(
+            queryset.filter(id__gt=after_id).order_by("id")
+            .values_list("id", "latitude", "longitude", "recommended_crop")[:chunk_size]
+        )
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def recommend_chunk(rows, cell_deg=batch.CELL_DEG):
+    """Recompute the top crop of a chunk of farms; run in the worker processes.
+
+    Farms in the same grid cell share one environment lookup and one score.
+    Returns (last id of the chunk, farms seen, [(id, crop)] of the changed farms).
+    Farms on water cells keep their recommendation.
+    """
+    points = [(lat, lon, farm_id) for farm_id, lat, lon, _ in rows]
+    cells = batch.group_by_cell(points, cell_deg)
+    cell_list = list(cells)
+    changed = []
+    for start in range(0, len(cell_list), batch.CHUNK_CELLS):
+        chunk = cell_list[start:start + batch.CHUNK_CELLS]
+        _, recommendations = batch.recommend_cells(chunk, cell_deg)
+        for cell, recommended in zip(chunk, recommendations):
+            if not recommended:
+                continue
+            crop = recommended[0]["crop"]
+            for index in cells[cell]:
+                if rows[index][3] != crop:
+                    changed.append((rows[index][0], crop))
+    return rows[-1][0], len(rows), changed
+
+def imap_bounded(pool, func, iterable, max_in_flight):
+    """Like pool.imap, but reads `iterable` in this thread, at most max_in_flight items ahead.
+
+    pool.imap's feeder thread drains the whole iterable at once, which for
+    iter_chunks would run every chunk query and hold every chunk in memory.
+    Results are yielded in input order.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def write_changes(changed, batch_size=1000):
+    """Store recomputed recommendations with bulk UPDATEs."""
+    # bulk_update does not apply auto_now; delta sync clients need updated_at to move
+    now = timezone.now()
+    Farm.objects.bulk_update(
+        [Farm(id=farm_id, recommended_crop=crop, updated_at=now) for farm_id, crop in changed],
+        ["recommended_crop", "updated_at"], batch_size=batch_size,
+    )
+
+def read_checkpoint(path=CHECKPOINT_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_checkpoint(state, path=CHECKPOINT_FILE):
+    """Record progress atomically, so an interrupted run can resume after the last written chunk."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def clear_checkpoint(path=CHECKPOINT_FILE):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
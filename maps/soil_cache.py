@@ -0,0 +1,168 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import DatabaseError
+from .geo import grid_cell, cell_center
+from .models import SoilCell
+
+logger = logging.getLogger(__name__)
+
+# ~250 m at the equator, roughly the SoilGrids resolution
+CELL_DEG = getattr(settings, "SOIL_CACHE_CELL_DEG", 0.0025)
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0}
+
+def _count(key):
+    with _lock:
+        _stats[key] += 1
+
+def stats():
+    """Return hit/miss counters for this process."""
+    with _lock:
+        counters = dict(_stats)
+    lookups = counters["hits"] + counters["misses"]
+    counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+    return counters
+
+def _to_soil(cell):
+    return {
+        "N": cell.nitrogen,
+        "P": cell.phosphorus,
+        "K": cell.potassium,
+        "ph": cell.ph,
+        "soil_type": cell.soil_type,
+    }
+
+def lookup(lat, lon):
+    """Return cached soil properties for the cell containing (lat, lon), or None."""
+    row, col = grid_cell(lat, lon, CELL_DEG)
+    try:
+        cell = SoilCell.objects.filter(row=row, col=col).first()
+    except DatabaseError as e:
+        logger.error(f"Soil cache lookup failed for ({lat}, {lon}): {e}")
+        return None
+    if cell is None:
+        _count("misses")
+        return None
+    _count("hits")
+    return _to_soil(cell)
+
+async def alookup(lat, lon):
+    """Async version of lookup."""
+    row, col = grid_cell(lat, lon, CELL_DEG)
+    try:
+        cell = await SoilCell.objects.filter(row=row, col=col).afirst()
+    except DatabaseError as e:
+        logger.error(f"Soil cache lookup failed for ({lat}, {lon}): {e}")
+        return None
+    if cell is None:
+        _count("misses")
+        return None
+    _count("hits")
+    return _to_soil(cell)
+
+def _cell_defaults(soil):
+    return {
+        "nitrogen": soil["N"],
+        "phosphorus": soil["P"],
+        "potassium": soil["K"],
+        "ph": soil["ph"],
+        "soil_type": soil["soil_type"],
+    }
+
+def store(row, col, soil):
+    """Save soil properties for a grid cell. Returns True on success."""
+    try:
+        SoilCell.objects.update_or_create(row=row, col=col, defaults=_cell_defaults(soil))
+        _count("stores")
+        return True
+    except DatabaseError as e:
+        logger.error(f"Soil cache store failed for cell ({row}, {col}): {e}")
+        return False
+
+async def astore(row, col, soil):
+    """Async version of store."""
+    try:
+        await SoilCell.objects.aupdate_or_create(row=row, col=col, defaults=_cell_defaults(soil))
+        _count("stores")
+        return True
+    except DatabaseError as e:
+        logger.error(f"Soil cache store failed for cell ({row}, {col}): {e}")
+        return False
+
+def get_or_fetch(lat, lon, fetch):
+    """Return soil properties from the cache, calling fetch(lat, lon) for the cell centre on a miss.
+
+    Failed fetches (None) are not cached so the next request retries the provider.
+    """
+    soil = lookup(lat, lon)
+    if soil is not None:
+        return soil
+    row, col = grid_cell(lat, lon, CELL_DEG)
+    soil = fetch(*cell_center(row, col, CELL_DEG))
+    if soil is not None:
+        store(row, col, soil)
+    return soil
+
+async def aget_or_fetch(lat, lon, afetch):
+    """Async version of get_or_fetch; afetch is a coroutine function."""
+    soil = await alookup(lat, lon)
+    if soil is not None:
+        return soil
+    row, col = grid_cell(lat, lon, CELL_DEG)
+    soil = await afetch(*cell_center(row, col, CELL_DEG))
+    if soil is not None:
+        await astore(row, col, soil)
+    return soil
+
+def cells_in_bbox(min_lat, min_lon, max_lat, max_lon):
+    """Return the (row, col) of every grid cell overlapping a bounding box."""
+    min_row, min_col = grid_cell(min_lat, min_lon, CELL_DEG)
+    max_row, max_col = grid_cell(max_lat, max_lon, CELL_DEG)
+    return [(row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
+
+def warm(cells, fetch, workers=4):
+    """Fetch and store soil properties for every cell not already cached.
+
+    Returns the number of (fetched, failed) cells.
+    """
+    cells = set(cells)
+    if cells:
+        rows = [row for row, _ in cells]
+        cols = [col for _, col in cells]
+        cached = set(SoilCell.objects.filter(
+            row__range=(min(rows), max(rows)),
+            col__range=(min(cols), max(cols)),
+        ).values_list("row", "col"))
+        cells -= cached
+
+    def fetch_cell(cell):
+        return cell, fetch(*cell_center(*cell, CELL_DEG))
+
+    # Fetch concurrently but write from this thread; SQLite does not like
+    # concurrent writers.
+    fetched = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for cell, soil in pool.map(fetch_cell, sorted(cells)):
+            if soil is not None and store(*cell, soil):
+                fetched += 1
+            else:
+                failed += 1
+    logger.info(f"Soil cache warm-up: {fetched} cells fetched, {failed} failed")
+    return fetched, failed
+
+def invalidate(bbox=None):
+    """Delete cached cells, optionally only those inside (min_lat, min_lon, max_lat, max_lon).
+
+    Returns the number of deleted cells.
+    """
+    cells = SoilCell.objects.all()
+    if bbox:
+        min_row, min_col = grid_cell(bbox[0], bbox[1], CELL_DEG)
+        max_row, max_col = grid_cell(bbox[2], bbox[3], CELL_DEG)
+        cells = cells.filter(row__range=(min_row, max_row), col__range=(min_col, max_col))
+    deleted, _ = cells.delete()
+    logger.info(f"Soil cache invalidated {deleted} cells")
+    return deleted
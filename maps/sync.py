@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone as django_timezone
+from .models import Farm, FarmTombstone, FarmVersion
+
+# Tombstones older than this are pruned (`manage.py prune_tombstones`); older
+# cursors can no longer be answered and clients must download everything again.
+TOMBSTONE_DAYS = getattr(settings, "MAPS_FARM_TOMBSTONE_DAYS", 30)
+# A transaction that commits after a cursor was issued can carry an earlier
+# updated_at; deltas re-send this much history before the cursor so such
+# rows are not skipped. Clients apply deltas as upserts keyed by farm id.
+OVERLAP = timedelta(seconds=getattr(settings, "MAPS_FARM_SYNC_OVERLAP_SECONDS", 120))
+
+class CursorExpired(Exception):
+    """Raised for cursors older than the tombstone retention period."""
+
+def make_cursor(moment):
+    return moment.astimezone(timezone.utc).isoformat() if moment else ""
+
+def parse_cursor(value):
+    """Return the moment a ?since= cursor stands for; raises ValueError or CursorExpired."""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        raise ValueError(f"Invalid cursor: {value}")
+    if moment < django_timezone.now() - timedelta(days=TOMBSTONE_DAYS):
+        raise CursorExpired(f"Cursor {value} is older than {TOMBSTONE_DAYS} days")
+    return moment
+
+def scope(farmer=None):
+    """Return (farms, tombstones) of one farmer, or of everyone."""
+    if farmer is None:
+        return Farm.objects.all(), FarmTombstone.objects.all()
+    return Farm.objects.filter(farmer=farmer), FarmTombstone.objects.filter(farmer_id=farmer.pk)
+
+def latest_change(farms, tombstones):
+    """Return the time of the last update or deletion; both columns are indexed."""
+    updated = farms.aggregate(latest=Max("updated_at"))["latest"]
+    deleted = tombstones.aggregate(latest=Max("deleted_at"))["latest"]
+    return max((moment for moment in (updated, deleted) if moment), default=None)
+
+def etag(request, farms, tombstones, *parts):
+    """Return an ETag for a farm listing that changes whenever a farm is saved or deleted.
+
+    Besides the latest change it includes the FarmVersion counter, which also
+    moves when a transaction commits late with an older updated_at. Both are
+    kept on the request, so the view can reuse them without querying again.
+    """
+    request.farm_sync_latest = latest_change(farms, tombstones)
+    request.farm_sync_version = FarmVersion.current()
+    key = "|".join(str(part) for part in (make_cursor(request.farm_sync_latest), request.farm_sync_version, *parts))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def changes(farms, tombstones, since):
+    """Return (farms changed after `since`, ids of farms deleted after it), both overlapping by OVERLAP.
+
+    Farms re-sent from the overlap are ones the client already has, so
+    applying them again by id is harmless.
+    """
+    since = since - OVERLAP
+    removed = sorted(set(tombstones.filter(deleted_at__gt=since).values_list("farm_id", flat=True)))
+    return farms.filter(updated_at__gt=since), removed
+
+def farm_saved(sender, instance, **kwargs):
+    """post_save receiver counting the write, so listing ETags change."""
+    FarmVersion.bump()
+
+def farm_deleted(sender, instance, **kwargs):
+    """post_delete receiver leaving a tombstone for delta sync clients."""
+    FarmTombstone.objects.create(farm_id=instance.pk, farmer_id=instance.farmer_id)
+    FarmVersion.bump()
+
+def prune(days=TOMBSTONE_DAYS):
+    """Delete tombstones older than `days`; returns how many were removed."""
+    deleted, _ = FarmTombstone.objects.filter(deleted_at__lt=django_timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+from math import floor
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TERRAIN_DIR = getattr(settings, "TERRAIN_DIR", os.path.join(settings.BASE_DIR, "data", "terrain"))
+HEADER_FILE = "terrain.json"
+ELEVATION_FILE = "elevation.i2"
+WATER_FILE = "water.u1"
+NODATA = -32768
+
+class TerrainStore:
+    """Memory-mapped elevation and land/water grids for the operating region.
+
+    Both grids are stored north-up with row 0 at the northern edge, so a
+    lookup is two index computations and two array reads.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, HEADER_FILE)) as f:
+            header = json.load(f)
+        self.north = header["north"]
+        self.west = header["west"]
+        self.cell_deg = header["cell_deg"]
+        self.rows = header["rows"]
+        self.cols = header["cols"]
+        shape = (self.rows, self.cols)
+        self.elevation = np.memmap(os.path.join(directory, ELEVATION_FILE), dtype=np.int16, mode="r", shape=shape)
+        self.water = np.memmap(os.path.join(directory, WATER_FILE), dtype=np.uint8, mode="r", shape=shape)
+
+    @property
+    def bounds(self):
+        """Return (min_lat, min_lon, max_lat, max_lon) of the covered extent."""
+        south = self.north - self.rows * self.cell_deg
+        east = self.west + self.cols * self.cell_deg
+        return south, self.west, self.north, east
+
+    def lookup(self, lat, lon):
+        """Return (elevation, is_water) for a point, or None outside the extent or on nodata."""
+        row = floor((self.north - lat) / self.cell_deg)
+        col = floor((lon - self.west) / self.cell_deg)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        elevation = int(self.elevation[row, col])
+        if elevation == NODATA:
+            return None
+        return elevation, bool(self.water[row, col])
+
+_lock = threading.Lock()
+_store = None
+_loaded = False
+
+def get_store():
+    """Open the terrain store once per process; returns None if none has been imported."""
+    global _store, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                if os.path.exists(os.path.join(TERRAIN_DIR, HEADER_FILE)):
+                    try:
+                        _store = TerrainStore(TERRAIN_DIR)
+                        logger.info(f"Terrain store loaded: {_store.rows}x{_store.cols} cells, bounds {_store.bounds}")
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.error(f"Error loading terrain store from {TERRAIN_DIR}: {e}")
+                _loaded = True
+    return _store
+
+def lookup(lat, lon):
+    """Return (elevation, is_water) from the offline terrain store, or None if not covered."""
+    store = get_store()
+    return store.lookup(lat, lon) if store else None
+
+def _read_ascii_header(f):
+    header = {}
+    while True:
+        position = f.tell()
+        line = f.readline()
+        parts = line.split()
+        if len(parts) != 2 or not parts[0][0].isalpha():
+            f.seek(position)
+            return header
+        header[parts[0].lower()] = float(parts[1])
+
+def _read_ascii_grid(path, out, dtype, convert):
+    """Stream an ESRI ASCII grid into the memmap `out` row by row."""
+    with open(path) as f:
+        header = _read_ascii_header(f)
+        nodata = header.get("nodata_value")
+        index = 0
+        flat = out.reshape(-1)
+        for line in f:
+            values = np.array(line.split(), dtype=np.float64)
+            if not len(values):
+                continue
+            flat[index:index + len(values)] = convert(values, nodata).astype(dtype)
+            index += len(values)
+        if index != flat.size:
+            raise ValueError(f"{path}: expected {flat.size} values, found {index}")
+
+def read_ascii_extent(path):
+    """Return (north, west, cell_deg, rows, cols) from an ESRI ASCII grid header."""
+    with open(path) as f:
+        header = _read_ascii_header(f)
+    cell_deg = header["cellsize"]
+    rows = int(header["nrows"])
+    cols = int(header["ncols"])
+    if "xllcenter" in header:
+        west = header["xllcenter"] - cell_deg / 2
+        south = header["yllcenter"] - cell_deg / 2
+    else:
+        west = header["xllcorner"]
+        south = header["yllcorner"]
+    return south + rows * cell_deg, west, cell_deg, rows, cols
+
+def import_ascii_grids(dem_path, water_path=None, directory=TERRAIN_DIR):
+    """Build a terrain store from an ESRI ASCII DEM and an optional land/water mask.
+
+    The mask must be on the same grid as the DEM, with non-zero cells marking
+    water. Without a mask, cells at or below sea level are treated as water.
+    The header is written last so new readers never see a half-imported store.
+    """
+    north, west, cell_deg, rows, cols = read_ascii_extent(dem_path)
+    if water_path and read_ascii_extent(water_path) != (north, west, cell_deg, rows, cols):
+        raise ValueError("Water mask grid does not match the DEM grid")
+
+    os.makedirs(directory, exist_ok=True)
+    header_path = os.path.join(directory, HEADER_FILE)
+    elevation_path = os.path.join(directory, ELEVATION_FILE)
+    water_path_out = os.path.join(directory, WATER_FILE)
+
+    # Grids are written to temporary files and moved into place, so workers
+    # that already mapped the old files keep reading them undisturbed.
+    shape = (rows, cols)
+    elevation = np.memmap(elevation_path + ".tmp", dtype=np.int16, mode="w+", shape=shape)
+
+    def to_elevation(values, nodata):
+        converted = np.clip(np.rint(values), NODATA + 1, np.iinfo(np.int16).max)
+        if nodata is not None:
+            converted[values == nodata] = NODATA
+        return converted
+
+    _read_ascii_grid(dem_path, elevation, np.int16, to_elevation)
+    elevation.flush()
+
+    water = np.memmap(water_path_out + ".tmp", dtype=np.uint8, mode="w+", shape=shape)
+    if water_path:
+        def to_water(values, nodata):
+            return (values != 0) & (values != nodata) if nodata is not None else values != 0
+
+        _read_ascii_grid(water_path, water, np.uint8, to_water)
+    else:
+        for start in range(0, rows, 1024):
+            block = elevation[start:start + 1024]
+            water[start:start + 1024] = (block <= 0) & (block != NODATA)
+    water.flush()
+    del elevation, water
+
+    if os.path.exists(header_path):
+        os.remove(header_path)
+    os.replace(elevation_path + ".tmp", elevation_path)
+    os.replace(water_path_out + ".tmp", water_path_out)
+
+    tmp_path = header_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"north": north, "west": west, "cell_deg": cell_deg, "rows": rows, "cols": cols}, f)
+    os.replace(tmp_path, header_path)
+    logger.info(f"Terrain store written to {directory}: {rows}x{cols} cells")
+    return TerrainStore(directory)
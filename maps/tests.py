@@ -1,3 +1,706 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import tempfile
+import time
+import warnings
+from datetime import date, timedelta
+from multiprocessing.pool import ThreadPool
+from unittest import mock
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from users.models import GovernmentProfile, UserType
+from django.utils import timezone
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from . import batch, crop_cells, export, forest, geo, jurisdictions, pagination, refresh, sync, tiles, views
+from .models import FARM_CELL_DEG, CropCell, ExportJob, Farm, FarmQuerySet, FarmTombstone
 
-# Create your tests here.
+
+def make_farms(farmer, count, **fields):
+    return Farm.objects.bulk_create([
+        Farm(farmer=farmer, latitude=10 + i * 0.001, longitude=76, soil_type="loamy", climate="humid", **fields)
+        for i in range(count)
+    ])
+
+def streamed_json(response):
+    return json.loads(b"".join(response.streaming_content))
+
+
+class ArrayForestTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        X, y = make_classification(n_samples=400, n_features=8, n_informative=5, n_classes=3, random_state=0)
+        labels = np.array(["rice", "wheat", "maize"])[y]
+        cls.model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X, labels)
+        cls.X = np.random.default_rng(1).normal(size=(250, 8))
+
+    def test_predict_proba_matches_sklearn(self):
+        exported = forest.export_forest(self.model)
+        np.testing.assert_allclose(exported.predict_proba(self.X), self.model.predict_proba(self.X), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(exported.predict(self.X), self.model.predict(self.X))
+        np.testing.assert_array_equal(exported.classes_, self.model.classes_)
+
+    def test_float32_leaves_match_sklearn(self):
+        exported = forest.export_forest(self.model, leaf_dtype=np.float32)
+        self.assertEqual(exported.value.dtype, np.float32)
+        np.testing.assert_allclose(exported.predict_proba(self.X), self.model.predict_proba(self.X), rtol=0, atol=1e-6)
+        np.testing.assert_array_equal(exported.apply(self.X), self.model.apply(self.X) + exported.roots)
+
+    def test_saved_forest_loads_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            forest.export_forest(self.model).save(directory)
+            loaded = forest.load(directory, mmap_mode="r")
+            np.testing.assert_allclose(loaded.predict_proba(self.X), self.model.predict_proba(self.X), rtol=0, atol=1e-12)
+
+
+class FarmDataTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="farmer", password="pass")
+        self.client.force_login(self.user)
+
+    def test_streams_every_farm_as_geojson(self):
+        make_farms(self.user, 5, area=2.5)
+        response = self.client.get(reverse("maps:get-farm-data"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        data = streamed_json(response)
+        self.assertEqual(data["type"], "FeatureCollection")
+        self.assertEqual([f["properties"]["id"] for f in data["features"]], list(Farm.objects.order_by("id").values_list("id", flat=True)))
+        feature = data["features"][0]
+        self.assertEqual(feature["geometry"]["coordinates"], [76.0, 10.0])
+        self.assertEqual(feature["properties"]["farmer"], "farmer")
+        self.assertEqual(feature["properties"]["area"], 2.5)
+
+    def test_query_count_does_not_grow_with_farms(self):
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                streamed_json(self.client.get(reverse("maps:get-farm-data")))
+            return len(captured)
+
+        make_farms(self.user, 3)
+        few = queries()
+        make_farms(self.user, 30)
+        self.assertEqual(queries(), few)
+
+    def test_features_are_written_in_chunks(self):
+        make_farms(self.user, 5)
+        with mock.patch.object(views, "GEOJSON_CHUNK_SIZE", 2):
+            pieces = list(self.client.get(reverse("maps:get-farm-data")).streaming_content)
+        # Header, three chunks of at most two features, closing brackets
+        self.assertEqual(len(pieces), 5)
+        self.assertEqual(len(json.loads(b"".join(pieces))["features"]), 5)
+
+    async def test_streams_piece_by_piece_under_asgi(self):
+        await sync_to_async(make_farms)(self.user, 5)
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(views, "GEOJSON_CHUNK_SIZE", 2), warnings.catch_warnings():
+            warnings.simplefilter("error")
+            response = await self.async_client.get(reverse("maps:get-farm-data"))
+            self.assertTrue(response.is_async)
+            pieces = [piece async for piece in response.streaming_content]
+        self.assertEqual(len(pieces), 5)
+        self.assertEqual(len(json.loads(b"".join(pieces))["features"]), 5)
+
+    def test_empty_collection_is_valid_json(self):
+        data = streamed_json(self.client.get(reverse("maps:get-farm-data")))
+        self.assertEqual(data["features"], [])
+
+
+class SpatialQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="farmer")
+        rng = np.random.default_rng(2)
+        points = np.column_stack([10 + rng.uniform(-0.3, 0.3, 600), 76 + rng.uniform(-0.3, 0.3, 600)])
+        Farm.objects.bulk_create([
+            Farm(farmer=cls.user, latitude=lat, longitude=lon, soil_type="loamy", climate="humid") for lat, lon in points.tolist()
+        ])
+        cls.rows = list(Farm.objects.values_list("id", "latitude", "longitude"))
+
+    def brute_force_km(self, lat, lon, radius_km):
+        ids = np.array([row[0] for row in self.rows])
+        distances = geo.haversine_km(lat, lon, [row[1] for row in self.rows], [row[2] for row in self.rows])
+        order = np.argsort(distances, kind="stable")
+        return [int(ids[i]) for i in order if distances[i] <= radius_km]
+
+    def test_save_and_bulk_create_set_the_cell(self):
+        for farm_id, lat, lon in Farm.objects.values_list("id", "latitude", "longitude")[:50]:
+            self.assertEqual(
+                Farm.objects.values_list("cell_row", "cell_col").get(pk=farm_id),
+                geo.grid_cell(lat, lon, FARM_CELL_DEG),
+            )
+        farm = Farm.objects.create(farmer=self.user, latitude=12.345, longitude=77.001, soil_type="loamy", climate="humid")
+        self.assertEqual((farm.cell_row, farm.cell_col), geo.grid_cell(12.345, 77.001, FARM_CELL_DEG))
+        farm.latitude = 13.5
+        farm.save(update_fields=["latitude"])
+        self.assertEqual(Farm.objects.values_list("cell_row", "cell_col").get(pk=farm.pk), geo.grid_cell(13.5, 77.001, FARM_CELL_DEG))
+
+    def test_bbox_includes_its_edges(self):
+        box = (9.9, 75.95, 10.1, 76.2)
+        edges = Farm.objects.bulk_create([
+            Farm(farmer=self.user, latitude=lat, longitude=lon, soil_type="loamy", climate="humid")
+            for lat, lon in [(9.9, 76), (10.1, 76), (10, 75.95), (10, 76.2), (9.9, 75.95), (10.1, 76.2)]
+        ])
+        outside = Farm.objects.bulk_create([
+            Farm(farmer=self.user, latitude=lat, longitude=lon, soil_type="loamy", climate="humid")
+            for lat, lon in [(9.8999, 76), (10.1001, 76), (10, 75.9499), (10, 76.2001)]
+        ])
+        found = set(Farm.objects.in_bbox(*box).values_list("id", flat=True))
+        self.assertTrue({farm.pk for farm in edges} <= found)
+        self.assertFalse({farm.pk for farm in outside} & found)
+        expected = {
+            farm_id for farm_id, lat, lon in Farm.objects.values_list("id", "latitude", "longitude")
+            if box[0] <= lat <= box[2] and box[1] <= lon <= box[3]
+        }
+        self.assertEqual(found, expected)
+
+    def test_within_km_matches_brute_force(self):
+        for lat, lon, radius in [(10, 76, 5), (10.1, 75.8, 12), (9.71, 76.29, 3), (10, 76, 0.5), (10, 76, 60)]:
+            with self.subTest(lat=lat, lon=lon, radius=radius):
+                farms = Farm.objects.within_km(lat, lon, radius)
+                self.assertEqual([farm.pk for farm in farms], self.brute_force_km(lat, lon, radius))
+                for farm in farms:
+                    self.assertAlmostEqual(farm.distance_km, float(geo.haversine_km(lat, lon, farm.latitude, farm.longitude)))
+
+    def test_nearest_grows_rings_up_to_the_limit(self):
+        lone = Farm.objects.create(farmer=self.user, latitude=20 + 30 / geo.KM_PER_DEG_LAT, longitude=80, soil_type="loamy", climate="humid")
+        radii = []
+        within_km = FarmQuerySet.within_km
+
+        def record(queryset, lat, lon, radius_km):
+            radii.append(radius_km)
+            return within_km(queryset, lat, lon, radius_km)
+
+        with mock.patch.object(FarmQuerySet, "within_km", autospec=True, side_effect=record):
+            self.assertEqual([farm.pk for farm in Farm.objects.nearest(20, 80)], [lone.pk])
+        self.assertEqual(radii, [2, 4, 8, 16, 32])
+        radii.clear()
+        with mock.patch.object(FarmQuerySet, "within_km", autospec=True, side_effect=record):
+            self.assertEqual(Farm.objects.nearest(20, 80, max_radius_km=20), [])
+        self.assertEqual(radii, [2, 4, 8, 16, 20])
+        self.assertEqual([farm.pk for farm in Farm.objects.nearest(10.05, 76.05, k=5)], self.brute_force_km(10.05, 76.05, 100)[:5])
+
+
+class FarmLookupTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="farmer", password="pass")
+        self.client.force_login(self.user)
+
+    def lookup(self, lat, lon):
+        response = self.client.post(
+            reverse("maps:get-farm-by-coords"), json.dumps({"latitude": lat, "longitude": lon}), content_type="application/json",
+        )
+        return response.json().get("id")
+
+    def test_new_farms_are_found_at_once_from_the_database(self):
+        self.assertIsNone(self.lookup(10, 76))
+        farm = Farm.objects.create(farmer=self.user, latitude=10, longitude=76, soil_type="loamy", climate="humid")
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.lookup(10.00009, 75.99991), farm.pk)
+        self.assertEqual(len([q for q in captured if "maps_farm" in q["sql"]]), 1)
+        self.assertIsNone(self.lookup(10.0002, 76))
+
+
+class FarmSaveTests(TestCase):
+    def test_stored_row_is_read_once_per_save(self):
+        farm = make_farms(get_user_model().objects.create_user(username="farmer"), 1)[0]
+        farm = Farm.objects.get(pk=farm.pk)
+        farm.latitude, farm.recommended_crop = 10.5, "wheat"
+        with CaptureQueriesContext(connection) as captured:
+            farm.save()
+        reads = [q["sql"] for q in captured if q["sql"].startswith('SELECT "maps_farm"."latitude"')]
+        self.assertEqual(len(reads), 1)
+        self.assertNotIn("_previous_values", farm.__dict__)
+
+
+class CropCellTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="farmer")
+
+    def cells(self):
+        return sorted(
+            (row, col, crop, farms, area_farms, round(area_sum, 6))
+            for row, col, crop, farms, area_farms, area_sum in CropCell.objects.filter(farms__gt=0).values_list(
+                "row", "col", "crop", "farms", "area_farms", "area_sum",
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        maintained = self.cells()
+        crop_cells.rebuild()
+        self.assertEqual(maintained, self.cells())
+
+    def test_signals_match_rebuild(self):
+        farms = [
+            Farm.objects.create(farmer=self.user, latitude=10 + i * 0.05, longitude=76, area=i or None,
+                                soil_type="loamy", climate="humid", recommended_crop="rice")
+            for i in range(4)
+        ]
+        self.assertMatchesRebuild()
+        farms[0].latitude = 11
+        farms[0].save()
+        self.assertMatchesRebuild()
+        farms[1].recommended_crop, farms[1].area = "wheat", 7
+        farms[1].save()
+        self.assertMatchesRebuild()
+        farms[2].delete()
+        self.assertMatchesRebuild()
+
+    def test_stale_instances_and_update_fields_match_rebuild(self):
+        farm = Farm.objects.create(farmer=self.user, latitude=10, longitude=76, area=2,
+                                   soil_type="loamy", climate="humid", recommended_crop="rice")
+        stale = Farm.objects.get(pk=farm.pk)
+        farm.latitude = 12
+        farm.save()
+        # Only the crop is written; the moved latitude stays in memory
+        stale.latitude, stale.recommended_crop = 14, "wheat"
+        stale.save(update_fields=["recommended_crop"])
+        self.assertMatchesRebuild()
+        stale.delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(self.cells(), [])
+
+
+class FarmTileTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="farmer", password="pass")
+        self.client.force_login(self.user)
+        self.farm = make_farms(self.user, 1)[0]
+        self.tile = (12, *tiles.tile_of(10, 76, 12))
+
+    def farm_ids(self):
+        data = json.loads(self.client.get(reverse("maps:farm-tile", args=self.tile)).content)
+        return [f["properties"]["id"] for f in data["features"]]
+
+    def test_tile_cache_is_shared_by_worker_processes(self):
+        self.assertNotIsInstance(cache, LocMemCache)
+
+    def test_saves_and_deletes_drop_cached_tiles(self):
+        self.assertEqual(self.farm_ids(), [self.farm.pk])
+        added = make_farms(self.user, 1)[0]
+        self.assertEqual(self.farm_ids(), [self.farm.pk])  # bulk_create bypasses the signals
+        moved = Farm.objects.get(pk=self.farm.pk)
+        moved.latitude = 20
+        moved.save()
+        self.assertEqual(self.farm_ids(), [added.pk])
+        added.delete()
+        self.assertEqual(self.farm_ids(), [])
+
+    def test_farm_on_a_tile_edge_is_in_one_tile(self):
+        north = tiles.tile_bounds(3, 5, 3)[2]
+        edges = make_farms(self.user, 2)
+        edges[0].latitude, edges[0].longitude = 20, 90.0
+        edges[1].latitude, edges[1].longitude = north, 80
+        for farm in edges:
+            farm.save()
+            home = tiles.tile_of(farm.latitude, farm.longitude, 3)
+            holders = [(x, y) for x in range(8) for y in range(8) if tiles.tile_farms(3, x, y).filter(pk=farm.pk).exists()]
+            self.assertEqual(holders, [home])
+
+    def test_clusters_stay_inside_the_grid(self):
+        self.farm.longitude, self.farm.latitude = 90.0, tiles.tile_bounds(3, 5, 3)[2]
+        self.farm.save()
+        make_farms(self.user, 3, status="red", recommended_crop="rice")
+        for x, y in [(5, 3), (6, 3)]:
+            south, west, north, east = tiles.tile_bounds(3, x, y)
+            features = tiles.clusters(tiles.tile_farms(3, x, y), (south, west, north, east))
+            for feature in features:
+                lon, lat = feature["geometry"]["coordinates"]
+                self.assertTrue(west <= lon <= east and south <= lat <= north)
+        data = json.loads(tiles.render_tile(3, *tiles.tile_of(10, 76, 3)))
+        self.assertEqual(len(data["features"]), 1)
+        self.assertEqual(data["features"][0]["properties"]["count"], 3)
+        self.assertEqual(data["features"][0]["properties"]["status"], {"red": 3})
+        self.assertEqual(data["features"][0]["properties"]["crops"], {"rice": 3})
+        self.assertEqual(sum(
+            f["properties"]["count"] for x in range(8) for y in range(8)
+            for f in json.loads(tiles.render_tile(3, x, y))["features"]
+        ), 4)
+
+    def test_invalidate_all_drops_every_tile(self):
+        self.assertEqual(self.farm_ids(), [self.farm.pk])
+        Farm.objects.update(latitude=20)
+        tiles.invalidate_all()
+        self.assertEqual(self.farm_ids(), [])
+
+
+class FarmSyncTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="farmer", password="pass")
+        self.client.force_login(self.user)
+        self.farms = make_farms(self.user, 3)
+        self.url = reverse("maps:get-farm-data")
+
+    def sync(self, since=None, **headers):
+        return self.client.get(self.url, {"since": since} if since else {}, headers=headers)
+
+    def age(self, farm, by):
+        Farm.objects.filter(pk=farm.pk).update(updated_at=timezone.now() - by)
+
+    def test_unchanged_data_answers_304(self):
+        response = self.sync()
+        self.assertEqual(self.sync(if_none_match=response["ETag"]).status_code, 304)
+        self.farms[0].status = "red"
+        self.farms[0].save()
+        self.assertEqual(self.sync(if_none_match=response["ETag"]).status_code, 200)
+
+    def test_late_commit_changes_etag(self):
+        etag = self.sync()["ETag"]
+        latest = sync.latest_change(*sync.scope())
+        # Stamped before the latest change by a transaction that only commits now
+        with mock.patch("django.utils.timezone.now", return_value=latest - timedelta(seconds=5)):
+            self.farms[0].status = "red"
+            self.farms[0].save()
+        self.assertEqual(sync.latest_change(*sync.scope()), latest)
+        self.assertEqual(self.sync(if_none_match=etag).status_code, 200)
+
+    def test_delete_changes_etag(self):
+        etag = self.sync()["ETag"]
+        self.farms[1].delete()
+        self.assertNotEqual(self.sync()["ETag"], etag)
+
+    def test_delta_has_changed_farms_and_removed_ids(self):
+        for farm in self.farms:
+            self.age(farm, timedelta(days=1))
+        cursor = sync.make_cursor(timezone.now() - timedelta(hours=1))
+        changed, deleted_id = self.farms[0], self.farms[1].pk
+        changed.status = "red"
+        changed.save()
+        self.farms[1].delete()
+        data = streamed_json(self.sync(cursor))
+        self.assertEqual([f["properties"]["id"] for f in data["features"]], [changed.pk])
+        self.assertEqual(data["features"][0]["properties"]["status"], "red")
+        self.assertEqual(data["removed"], [deleted_id])
+        self.assertGreater(data["cursor"], cursor)
+
+    def test_delta_overlaps_cursor_for_late_commits(self):
+        for farm in self.farms:
+            self.age(farm, timedelta(days=1))
+        moment = timezone.now() - timedelta(hours=1)
+        # Committed after the cursor was issued, stamped before it; the other farm is older than the overlap
+        Farm.objects.filter(pk=self.farms[2].pk).update(updated_at=moment - sync.OVERLAP / 2)
+        Farm.objects.filter(pk=self.farms[1].pk).update(updated_at=moment - sync.OVERLAP * 2)
+        data = streamed_json(self.sync(sync.make_cursor(moment)))
+        self.assertEqual([f["properties"]["id"] for f in data["features"]], [self.farms[2].pk])
+
+    def test_bad_and_expired_cursors(self):
+        self.assertEqual(self.sync("yesterday").status_code, 400)
+        self.assertEqual(self.sync("2025-01-01T00:00:00").status_code, 400)
+        expired = sync.make_cursor(timezone.now() - timedelta(days=sync.TOMBSTONE_DAYS + 1))
+        self.assertEqual(self.sync(expired).status_code, 410)
+
+    def test_my_farms_delta_is_limited_to_the_user(self):
+        other = get_user_model().objects.create_user(username="other")
+        cursor = sync.make_cursor(timezone.now() - timedelta(hours=1))
+        make_farms(other, 1)[0].delete()
+        data = streamed_json(self.client.get(reverse("maps:my-farms"), {"since": cursor}))
+        self.assertEqual(len(data["features"]), 3)
+        self.assertEqual(data["removed"], [])
+
+    def test_prune_drops_old_tombstones(self):
+        kept_id = self.farms[1].pk
+        self.farms[0].delete()
+        FarmTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=sync.TOMBSTONE_DAYS + 1))
+        self.farms[1].delete()
+        self.assertEqual(sync.prune(), 1)
+        self.assertEqual(list(FarmTombstone.objects.values_list("farm_id", flat=True)), [kept_id])
+
+
+class MyFarmsPaginationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="farmer", password="pass")
+        self.client.force_login(self.user)
+        farms = make_farms(self.user, 23)
+        planted = [date(2024, 1, 1) + timedelta(days=i % 4) if i % 5 else None for i in range(len(farms))]
+        for farm, day in zip(farms, planted):
+            farm.planting_date = day
+        Farm.objects.bulk_update(farms, ["planting_date"])
+        make_farms(get_user_model().objects.create_user(username="other"), 4)
+        self.url = reverse("maps:my-farms-json")
+
+    def expected(self, order):
+        farms = Farm.objects.filter(farmer=self.user)
+        if order == "planting_date":
+            rows = sorted(farms.values_list("planting_date", "id"), key=lambda row: (row[0] is None, row[0] or date.min, row[1]))
+            return [farm_id for _, farm_id in rows]
+        return list(farms.order_by("id").values_list("id", flat=True))
+
+    def walk(self, order, page_size=5):
+        pages, params = [], {"order": order, "page_size": page_size}
+        while True:
+            data = self.client.get(self.url, params).json()
+            pages.append(data)
+            if not data["next"]:
+                return pages
+            params = {"order": order, "page_size": page_size, "after": data["next"]}
+
+    def ids(self, page):
+        return [f["properties"]["id"] for f in page["features"]]
+
+    def test_pages_cover_every_farm_once_in_order(self):
+        for order in pagination.ORDERINGS:
+            with self.subTest(order=order):
+                pages = self.walk(order)
+                self.assertEqual(len(pages), 5)
+                self.assertEqual([i for page in pages for i in self.ids(page)], self.expected(order))
+                self.assertEqual({page["total"] for page in pages}, {23})
+                self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_cursors_walk_back(self):
+        for order in pagination.ORDERINGS:
+            with self.subTest(order=order):
+                pages = self.walk(order)
+                page = pages[-1]
+                for expected in reversed(pages[:-1]):
+                    page = self.client.get(self.url, {"order": order, "page_size": 5, "before": page["previous"]}).json()
+                    self.assertEqual(self.ids(page), self.ids(expected))
+                self.assertIsNone(page["previous"])
+
+    def test_page_query_has_no_count_or_offset(self):
+        self.client.get(self.url)  # caches the total
+        cursor = self.walk("id")[1]["next"]
+        with CaptureQueriesContext(connection) as captured:
+            data = self.client.get(self.url, {"after": cursor, "page_size": 5}).json()
+        self.assertEqual(self.ids(data), self.expected("id")[10:15])
+        sql = " ".join(q["sql"] for q in captured)
+        self.assertNotIn("COUNT(", sql)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_count_is_recomputed_after_changes_and_optional(self):
+        self.assertEqual(self.client.get(self.url).json()["total"], 23)
+        Farm.objects.filter(farmer=self.user).first().delete()
+        self.assertEqual(self.client.get(self.url).json()["total"], 22)
+        self.assertIsNone(self.client.get(self.url, {"count": "0"}).json()["total"])
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get(self.url, {"after": "not-a-cursor"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"order": "area"}).status_code, 400)
+        for key in ([123, 1], ["2024-13-01", 1], ["2024-01-01", "1"]):
+            cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+            response = self.client.get(self.url, {"order": "planting_date", "after": cursor})
+            self.assertEqual(response.status_code, 400, key)
+        response = self.client.get(reverse("maps:my-farms"), {"after": "not-a-cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.context["farm_data_json"])["features"]), 10)
+
+    def test_html_page_links_to_next_cursor(self):
+        response = self.client.get(reverse("maps:my-farms"), {"order": "planting_date"})
+        page = response.context["page"]
+        self.assertTrue(page.has_next)
+        self.assertContains(response, f"after={page.next_cursor}")
+        self.assertContains(response, "23 farms")
+
+    def test_html_page_without_count(self):
+        response = self.client.get(reverse("maps:my-farms"), {"count": "0"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["page"].has_next)
+        self.assertNotContains(response, "23 farms")
+
+
+class RefreshTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="farmer")
+        self.farms = make_farms(self.user, 10)
+        Farm.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = f"{directory.name}/refresh.json"
+
+    def refresh(self, *args):
+        call_command(
+            "refresh_recommendations", "--workers", "0", "--chunk-size", "4", "--checkpoint", self.checkpoint, *args,
+            stdout=io.StringIO(),
+        )
+
+    def test_chunks_are_read_by_id_range(self):
+        ids = [farm.pk for farm in self.farms]
+        with CaptureQueriesContext(connection) as captured:
+            chunks = list(refresh.iter_chunks(Farm.objects.all(), 4, after_id=ids[1]))
+        self.assertEqual([[row[0] for row in chunk] for chunk in chunks], [ids[2:6], ids[6:10]])
+        self.assertNotIn("OFFSET", " ".join(q["sql"] for q in captured))
+
+    def test_imap_bounded_keeps_order_and_reads_ahead_little(self):
+        pulled = []
+
+        def items():
+            for i in range(20):
+                pulled.append(i)
+                yield i
+
+        def slow(i):
+            time.sleep(0.001 * (i % 3))
+            return i * i
+
+        with ThreadPool(3) as pool:
+            results = refresh.imap_bounded(pool, slow, items(), 4)
+            self.assertEqual(next(results), 0)
+            self.assertEqual(len(pulled), 4)
+            self.assertEqual(list(results), [i * i for i in range(1, 20)])
+
+    def test_interrupted_run_resumes_after_the_last_written_chunk(self):
+        calls = []
+
+        def recommend_cells(cells, cell_deg):
+            calls.append(cells)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return None, [[{"crop": "wheat"}] for _ in cells]
+
+        with mock.patch.object(batch, "recommend_cells", side_effect=recommend_cells):
+            with self.assertRaisesMessage(CommandError, "rerun with --resume"):
+                self.refresh()
+            first = [farm.pk for farm in self.farms[:4]]
+            self.assertEqual(refresh.read_checkpoint(self.checkpoint)["last_id"], first[-1])
+            refreshed = Farm.objects.filter(updated_at__gt=timezone.now() - timedelta(hours=1))
+            self.assertEqual(sorted(refreshed.values_list("id", flat=True)), first)
+            self.assertEqual(set(refreshed.values_list("recommended_crop", flat=True)), {"wheat"})
+
+            self.refresh("--resume")
+        self.assertEqual(set(Farm.objects.values_list("recommended_crop", flat=True)), {"wheat"})
+        self.assertEqual(Farm.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=1)).count(), 0)
+        self.assertIsNone(refresh.read_checkpoint(self.checkpoint))
+
+    def test_resume_needs_the_same_region(self):
+        refresh.write_checkpoint({"bbox": None, "cell_deg": batch.CELL_DEG, "last_id": 0, "done": 0, "changed": 0}, self.checkpoint)
+        with self.assertRaisesMessage(CommandError, "pass the same options"):
+            self.refresh("--resume", "--bbox", "9", "75", "11", "77")
+        with self.assertRaisesMessage(CommandError, "pass the same options"):
+            self.refresh("--resume", "--cell-deg", "0.1")
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(username="analyst", password="pass", is_staff=True)
+        self.client.force_login(self.staff)
+        make_farms(self.staff, 7)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(export, "EXPORT_DIR", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def queue(self, **fields):
+        return ExportJob.objects.create(requested_by=self.staff, format="csv", **fields)
+
+    def test_background_export_waits_for_the_runner(self):
+        response = self.client.get(reverse("maps:export-farms"), {"background": "1"})
+        self.assertEqual(response.status_code, 202)
+        job = ExportJob.objects.get()
+        self.assertEqual(job.status, "pending")
+        self.assertEqual(export.run_pending(), 1)
+        status = self.client.get(response["Location"]).json()
+        self.assertEqual((status["status"], status["rows"]), ("done", 7))
+        download = self.client.get(status["download"])
+        self.assertEqual(b"".join(download.streaming_content).count(b"\n"), 8)
+
+    def test_stale_running_job_is_requeued_and_finished(self):
+        stale = timezone.now() - timedelta(seconds=export.STALE_SECONDS + 1)
+        job = self.queue(status="running", attempts=1, heartbeat_at=stale)
+        fresh = self.queue(status="running", attempts=1, heartbeat_at=timezone.now())
+        export.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows, job.attempts), ("done", 7, 2))
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, "running")
+
+    def test_job_failing_too_often_is_not_retried(self):
+        stale = timezone.now() - timedelta(seconds=export.STALE_SECONDS + 1)
+        job = self.queue(status="running", attempts=export.MAX_ATTEMPTS, heartbeat_at=stale)
+        self.assertEqual(export.run_pending(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+    def test_reclaimed_runner_stops_writing(self):
+        job = self.queue()
+
+        def reclaimed_midway(fmt, queryset, path, progress=None):
+            ExportJob.objects.filter(pk=job.pk).update(attempts=F("attempts") + 1)
+            progress(1)
+
+        with mock.patch.object(export, "write", reclaimed_midway):
+            export.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.path), ("running", 2, ""))
+
+
+class JurisdictionExportTests(TestCase):
+    # Kerala's and Tamil Nadu's boxes overlap around 76.2-77.5 E
+    BORDER = (11.0, 77.0)
+
+    def setUp(self):
+        farmer = get_user_model().objects.create_user(username="farmer")
+        self.kerala, self.border, self.tamil_nadu = (
+            Farm.objects.create(farmer=farmer, latitude=lat, longitude=lon, soil_type="loamy", climate="humid")
+            for lat, lon in [(10.0, 76.0), self.BORDER, (11.0, 79.0)]
+        )
+
+    def official(self, jurisdiction):
+        user = get_user_model().objects.create_user(username=jurisdiction, user_type=UserType.GOVERNMENT)
+        GovernmentProfile.objects.create(
+            user=user, organization_name="Agriculture", department="Statistics",
+            jurisdiction=jurisdiction, official_email=f"{jurisdiction.replace(' ', '')}@example.gov",
+        )
+        self.client.force_login(user)
+
+    def exported_ids(self, **params):
+        response = self.client.get(reverse("maps:export-farms"), params)
+        self.assertEqual(response.status_code, 200)
+        rows = csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode()))
+        return {int(row["id"]) for row in rows}
+
+    def test_border_farm_is_assigned_to_one_region(self):
+        inside = [
+            name for name, boxes in jurisdictions.REGIONS.items()
+            if any(box[0] <= self.BORDER[0] <= box[2] and box[1] <= self.BORDER[1] <= box[3] for box in boxes)
+        ]
+        self.assertEqual(inside, ["kerala", "tamil nadu"])
+        self.assertEqual(
+            [farm.jurisdiction for farm in (self.kerala, self.border, self.tamil_nadu)],
+            ["kerala", "kerala", "tamil nadu"],
+        )
+
+    def test_cross_border_bbox_is_clipped_to_assigned_farms(self):
+        everything = "8,74,14,81"
+        self.official("Kerala")
+        kerala = self.exported_ids(bbox=everything)
+        self.official("Tamil Nadu")
+        tamil_nadu = self.exported_ids(bbox=everything)
+        self.assertEqual(kerala | tamil_nadu, {self.kerala.pk, self.border.pk, self.tamil_nadu.pk})
+        self.assertFalse(kerala & tamil_nadu)
+        self.assertNotIn(self.tamil_nadu.pk, kerala)
+
+    def test_bbox_outside_jurisdiction_is_refused(self):
+        self.official("Kerala")
+        response = self.client.get(reverse("maps:export-farms"), {"bbox": "13,79,13.5,80"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_national_jurisdiction_exports_every_region(self):
+        self.official("India")
+        self.assertEqual(self.exported_ids(), {self.kerala.pk, self.border.pk, self.tamil_nadu.pk})
+
+    def test_moving_a_farm_reassigns_it(self):
+        self.kerala.latitude, self.kerala.longitude = 11.0, 79.0
+        self.kerala.save(update_fields=["latitude", "longitude"])
+        self.assertEqual(Farm.objects.get(pk=self.kerala.pk).jurisdiction, "tamil nadu")
+
+    def test_background_job_keeps_the_jurisdiction(self):
+        self.official("Tamil Nadu")
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(export, "EXPORT_DIR", directory):
+            response = self.client.get(reverse("maps:export-farms"), {"background": "1", "bbox": "8,74,14,81"})
+            self.assertEqual(response.json()["jurisdiction"], "tamil nadu")
+            export.run_pending()
+            job = ExportJob.objects.get()
+            with open(job.path) as f:
+                self.assertEqual({int(row["id"]) for row in csv.DictReader(f)}, {self.tamil_nadu.pk})
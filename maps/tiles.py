@@ -0,0 +1,167 @@
+import json
+import logging
+from math import atan, cos, degrees, floor, log, pi, radians, sinh, tan
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, IntegerField, Value
+from django.db.models.functions import Cast, Floor, Greatest, Least
+from django.http import HttpResponse, JsonResponse
+from .models import Farm
+from .views import FARM_FEATURE_FIELDS, farm_feature
+
+logger = logging.getLogger(__name__)
+
+MAX_ZOOM = 22
+# Web Mercator does not reach the poles
+MAX_LAT = 85.05112878
+# Tiles up to this zoom return clusters, deeper ones return the farms themselves
+CLUSTER_MAX_ZOOM = getattr(settings, "MAPS_TILE_CLUSTER_MAX_ZOOM", 11)
+# Each clustered tile is split into CLUSTER_GRID x CLUSTER_GRID bins (32 px at 256 px tiles)
+CLUSTER_GRID = getattr(settings, "MAPS_TILE_CLUSTER_GRID", 8)
+# Tiles up to this zoom are cached; deeper ones are cheap indexed lookups
+CACHE_MAX_ZOOM = getattr(settings, "MAPS_TILE_CACHE_MAX_ZOOM", 14)
+# Bounds staleness after changes that bypass the Farm signals (bulk updates)
+CACHE_TTL = getattr(settings, "MAPS_TILE_CACHE_TTL", 300)
+VERSION_KEY = "maps:tiles:version"
+
+def tile_bounds(z, x, y):
+    """Return (south, west, north, east) in degrees of a Web Mercator (slippy map) tile."""
+    n = 2 ** z
+    west = x / n * 360 - 180
+    east = (x + 1) / n * 360 - 180
+    north = degrees(atan(sinh(pi * (1 - 2 * y / n))))
+    south = degrees(atan(sinh(pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+def tile_of(lat, lon, z):
+    """Return the (x, y) of the tile containing (lat, lon) at zoom z."""
+    n = 2 ** z
+    lat = radians(max(min(lat, MAX_LAT), -MAX_LAT))
+    x = floor((lon + 180) / 360 * n)
+    y = floor((1 - log(tan(lat) + 1 / cos(lat)) / pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def _key(version, z, x, y):
+    return f"maps:tile:{version}:{z}:{x}:{y}"
+
+def _bin(value, low, high):
+    """Return the CLUSTER_GRID bin of a coordinate expression, clamped to the grid."""
+    index = Cast(Floor((value - low) * (CLUSTER_GRID / (high - low))), IntegerField())
+    return Least(Greatest(index, Value(0)), Value(CLUSTER_GRID - 1))
+
+def clusters(farms, bounds):
+    """Aggregate the farms of a tile into CLUSTER_GRID x CLUSTER_GRID bins, in the database.
+
+    Each non-empty bin becomes a Point feature at the mean position of its
+    farms, with the farm count and counts per status and recommended crop.
+    """
+    south, west, north, east = bounds
+    binned = farms.annotate(bin_x=_bin(F("longitude"), west, east), bin_y=_bin(F("latitude"), south, north))
+    bins = {}
+    # One grouped query, so the counts of a bin always come from the same snapshot
+    for row in binned.values("bin_x", "bin_y", "status", "recommended_crop").annotate(
+        farms=Count("id"), lat=Avg("latitude"), lon=Avg("longitude"),
+    ).order_by():
+        cluster = bins.setdefault((row["bin_x"], row["bin_y"]), {"count": 0, "lat": 0.0, "lon": 0.0, "status": {}, "crops": {}})
+        cluster["count"] += row["farms"]
+        # Weighted sums here, divided by the count below
+        cluster["lat"] += row["lat"] * row["farms"]
+        cluster["lon"] += row["lon"] * row["farms"]
+        cluster["status"][row["status"]] = cluster["status"].get(row["status"], 0) + row["farms"]
+        crop = row["recommended_crop"] or "none"
+        cluster["crops"][crop] = cluster["crops"].get(crop, 0) + row["farms"]
+
+    return [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [cluster["lon"] / cluster["count"], cluster["lat"] / cluster["count"]]},
+            "properties": {
+                "cluster": True,
+                "count": cluster["count"],
+                "status": cluster["status"],
+                "crops": dict(sorted(cluster["crops"].items(), key=lambda item: -item[1])),
+            },
+        }
+        for cluster in bins.values()
+    ]
+
+def tile_farms(z, x, y):
+    """Return the farms of a tile.
+
+    Like tile_of(), a tile holds its west and north edges but not its east
+    and south ones (except at the edges of the map), so a farm on a shared
+    edge belongs to exactly one tile.
+    """
+    south, west, north, east = tile_bounds(z, x, y)
+    farms = Farm.objects.in_bbox(south, west, north, east)
+    if x < 2 ** z - 1:
+        farms = farms.exclude(longitude=east)
+    if y < 2 ** z - 1:
+        farms = farms.exclude(latitude=south)
+    return farms
+
+def render_tile(z, x, y):
+    """Return the GeoJSON of a tile as a string: clusters up to CLUSTER_MAX_ZOOM, farms below."""
+    bounds = tile_bounds(z, x, y)
+    farms = tile_farms(z, x, y)
+    clustered = z <= CLUSTER_MAX_ZOOM
+    if clustered:
+        features = clusters(farms, bounds)
+    else:
+        features = [farm_feature(row) for row in farms.values(*FARM_FEATURE_FIELDS).order_by("id")]
+    return json.dumps({"type": "FeatureCollection", "clustered": clustered, "features": features})
+
+def get_tile(z, x, y):
+    """Return a tile's GeoJSON, from the cache where possible."""
+    if z > CACHE_MAX_ZOOM:
+        return render_tile(z, x, y)
+    key = _key(cache.get(VERSION_KEY, 0), z, x, y)
+    content = cache.get(key)
+    if content is None:
+        content = render_tile(z, x, y)
+        cache.set(key, content, CACHE_TTL)
+    return content
+
+def invalidate_point(lat, lon):
+    """Drop the cached tiles containing (lat, lon) at every cached zoom level."""
+    version = cache.get(VERSION_KEY, 0)
+    cache.delete_many([_key(version, z, *tile_of(lat, lon, z)) for z in range(CACHE_MAX_ZOOM + 1)])
+
+def invalidate_all():
+    """Drop every cached tile, e.g. after bulk updates that bypass the Farm signals."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+
+def farm_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Remember where a farm was stored, so the tiles it leaves are dropped too."""
+    instance._tile_previous = None
+    if update_fields is not None and not {"latitude", "longitude"} & set(update_fields):
+        return
+    # Shares the read of the stored row with the crop_cells receiver
+    previous = instance.previous_values()
+    if previous is not None:
+        instance._tile_previous = previous[:2]
+
+def farm_saved(sender, instance, **kwargs):
+    previous = getattr(instance, "_tile_previous", None)
+    if previous is not None and previous != (float(instance.latitude), float(instance.longitude)):
+        invalidate_point(*previous)
+    invalidate_point(float(instance.latitude), float(instance.longitude))
+
+def farm_pre_delete(sender, instance, **kwargs):
+    previous = instance.previous_values()
+    instance._tile_previous = previous[:2] if previous is not None else None
+
+def farm_deleted(sender, instance, **kwargs):
+    previous = getattr(instance, "_tile_previous", None)
+    invalidate_point(*(previous or (float(instance.latitude), float(instance.longitude))))
+
+@login_required
+def farm_tile(request, z, x, y):
+    """Return the farms of a map tile as GeoJSON, clustered at low zoom levels."""
+    if z > MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return JsonResponse({"error": f"No tile {z}/{x}/{y}"}, status=404)
+    return HttpResponse(get_tile(z, x, y), content_type="application/json")
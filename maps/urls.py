@@ -1,17 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, batch, export, tiles, views
 
 app_name = "maps"
 
+# Provider-bound endpoints have async versions for ASGI deployments
+if getattr(settings, "MAPS_ASYNC_VIEWS", False) and async_views.available:
+    provider_views = async_views
+else:
+    provider_views = views
+
 urlpatterns = [
     path("farm-map/", views.farm_map, name="farm-map"),
-    path("save-location/", views.save_location, name="save-location"),
-    path("get-location-details/", views.get_location_details, name="get-location-details"),
+    path("save-location/", provider_views.save_location, name="save-location"),
+    path("get-location-details/", provider_views.get_location_details, name="get-location-details"),
     path("get-farm-by-coords/", views.get_farm_by_coords, name="get-farm-by-coords"),
-    path("add-farm/", views.add_farm, name="add-farm"),
+    path("add-farm/", provider_views.add_farm, name="add-farm"),
     path("get-farm-data/", views.get_farm_data, name="get-farm-data"),
+    path("tiles/<int:z>/<int:x>/<int:y>/", tiles.farm_tile, name="farm-tile"),
     path("delete-farm/<int:farm_id>/", views.delete_farm, name="delete-farm"),
     path("my-farms/", views.my_farms, name="my-farms"),
-    path("get-price-prediction/", views.get_price_prediction, name="get-price-prediction"),
+    path("my-farms/json/", views.my_farms_json, name="my-farms-json"),
+    path("export/", export.export_farms, name="export-farms"),
+    path("export/<int:job_id>/", export.export_job, name="export-job"),
+    path("export/<int:job_id>/download/", export.export_download, name="export-download"),
+    path("get-price-prediction/", provider_views.get_price_prediction, name="get-price-prediction"),
+    path("batch-recommendations/", batch.batch_recommendations, name="batch-recommendations"),
+    path("provider-stats/", views.provider_stats, name="provider-stats"),
     # path("test-logging/", views.test_logging, name="test-logging"),
-]
\ No newline at end of file
+]
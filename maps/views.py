@@ -1,147 +1,27 @@
 import json
-import requests
 import pandas as pd
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.core.paginator import Paginator
+from django.views.decorators.http import condition
 from .models import Farm
-import joblib
+from .environment import fetch_environment
+from . import crop_rules, model_loader, pagination, price_table, provider_client, recommendation_cache, soil_cache, sync
 import logging
 from datetime import datetime
 import numpy as np
 import os
-from math import radians, sin, cos, sqrt, atan2
 
 logger = logging.getLogger(__name__)
 
-try:
-    crop_model = joblib.load("maps/crop_recommendation_model.pkl")
-    logger.info("ML model loaded successfully")
-except Exception as e:
-    logger.error(f"Error loading model: {e}")
-    crop_model = None
-
-def check_water_location(lat, lon):
-    """Check if the given coordinates are over water using Nominatim API with fallback."""
-    url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=10"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        location_type = data.get('type', '')
-        display_name = data.get('display_name', '')
-        water_keywords = ['sea', 'ocean', 'waterbody', 'lake', 'river', 'bay', 'gulf']
-        is_water = any(keyword in location_type.lower() or keyword in display_name.lower() for keyword in water_keywords)
-        
-        # Fallback: Check elevation (sea typically has elevation <= 0)
-        if not is_water:
-            elevation = get_elevation(lat, lon)
-            if elevation <= 0:
-                logger.warning(f"Location ({lat}, {lon}) has elevation {elevation}, likely water")
-                is_water = True
-        
-        if is_water:
-            logger.info(f"Water location detected at ({lat}, {lon}): {display_name}")
-        return is_water
-    except requests.RequestException as e:
-        logger.error(f"Error checking location at ({lat}, {lon}): {e}")
-        # Fallback: Assume water if API fails and elevation is low
-        elevation = get_elevation(lat, lon)
-        if elevation <= 0:
-            logger.warning(f"API failed, elevation {elevation} at ({lat}, {lon}), assuming water")
-            return True
-        return False
-
-def get_weather_data(lat, lon):
-    """Fetch weather data from Open-Meteo API."""
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=temperature_2m,relative_humidity_2m,precipitation,windspeed_10m&forecast_days=1"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()["hourly"]
-        return {
-            "temperature": data["temperature_2m"][0],
-            "humidity": data["relative_humidity_2m"][0],
-            "rainfall": data["precipitation"][0],
-            "wind_speed": data["windspeed_10m"][0],
-        }
-    except requests.RequestException as e:
-        logger.error(f"Error fetching weather at ({lat}, {lon}): {e}")
-        return {"temperature": 25, "humidity": 70, "rainfall": 0, "wind_speed": 2.5}
-
-def get_soil_data(lat, lon):
-    """Fetch soil data from SoilGrids API."""
-    url = f"https://rest.isric.org/soilgrids/v2.0/properties/query?lat={lat}&lon={lon}&property=nitrogen&property=phh2o&property=clay&property=sand&property=silt&property=cec&depth=0-5cm&value=mean"
-    try:
-        response = requests.get(url, timeout=14)
-        response.raise_for_status()
-        data = response.json()["properties"]["layers"]
-        soil_properties = {}
-        for layer in data:
-            for depth in layer["depths"]:
-                if depth["range"]["top_depth"] == 0 and depth["range"]["bottom_depth"] == 5:
-                    soil_properties[layer["name"]] = depth["values"]["mean"]
-
-        required = ["nitrogen", "phh2o", "clay", "sand", "silt"]
-        if not all(k in soil_properties for k in required):
-            raise KeyError("Incomplete SoilGrids data")
-
-        N = soil_properties["nitrogen"] / 100
-        ph = soil_properties["phh2o"] / 10
-        clay = soil_properties["clay"] / 10
-        sand = soil_properties["sand"] / 10
-        silt = soil_properties["silt"] / 10
-        soil_type = "sandy" if sand > 85 else "clay" if clay > 40 and silt < 40 else "silt" if silt > 40 and clay < 20 else "loamy"
-        K = (soil_properties.get("cec", 100) / 10)
-        P = 35 + (N * 7) if soil_type == "loamy" else 50 + (N * 10) if soil_type == "clay" else 20 + (N * 5) if soil_type == "sandy" else 40 + (N * 8)
-        P = min(max(P, 10), 100)
-        K = min(max(K, 20), 150)
-        return {"N": N, "P": P, "K": K, "ph": ph, "soil_type": soil_type, "elevation": get_elevation(lat, lon)}
-    except (requests.RequestException, KeyError) as e:
-        logger.error(f"Error fetching soil data at ({lat}, {lon}): {e}")
-        return {"N": 0.8, "P": 40, "K": 50, "ph": 6.5, "soil_type": "loamy", "elevation": 28}
-
-def get_climate_data(lat, lon):
-    """Fetch climate data from Open-Meteo API."""
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&daily=temperature_2m_mean,precipitation_sum&past_days=30"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()["daily"]
-        temp_avg = sum(data["temperature_2m_mean"]) / len(data["temperature_2m_mean"])
-        rainfall_avg = sum(data["precipitation_sum"]) / 30 * 365
-        return {"avg_temp": temp_avg, "avg_rainfall": rainfall_avg}
-    except requests.RequestException as e:
-        logger.error(f"Error fetching climate at ({lat}, {lon}): {e}")
-        return {"avg_temp": 24, "avg_rainfall": 1200}
-
-def get_sunlight_hours(lat, lon):
-    """Fetch sunlight hours from Sunrise-Sunset API."""
-    url = f"https://api.sunrise-sunset.org/json?lat={lat}&lng={lon}&formatted=0"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()["results"]
-        sunrise = datetime.fromisoformat(data["sunrise"])
-        sunset = datetime.fromisoformat(data["sunset"])
-        return round((sunset - sunrise).total_seconds() / 3600, 1)
-    except Exception as e:
-        logger.error(f"Error fetching sunlight hours at ({lat}, {lon}): {e}")
-        return 6.5
-
-def get_soil_moisture(lat, lon):
-    """Fetch soil moisture from Open-Meteo API."""
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=soil_moisture_0_1cm&forecast_days=1"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        return response.json()["hourly"]["soil_moisture_0_1cm"][0] * 100
-    except requests.RequestException as e:
-        logger.error(f"Error fetching soil moisture at ({lat}, {lon}): {e}")
-        return 30.0
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+VALID_CROPS = {
+    "coconut", "rice", "banana", "cardamom", "cotton", "gram", "groundnut",
+    "maize", "mustard", "pepper", "rubber", "soybean", "tapioca", "turmeric", "wheat"
+}
 
 def estimate_pest_risk(weather, crop=None):
     """Estimate pest risk based on weather."""
@@ -156,39 +36,11 @@ def estimate_water_availability(climate, soil_type):
     water = rainfall * 10_000 * retention.get(soil_type, 0.7)
     return round(water / 1000, 0)
 
-def get_elevation(lat, lon):
-    """Fetch elevation from Open-Elevation API."""
-    url = f"https://api.open-elevation.com/api/v1/lookup?locations={lat},{lon}"
+def get_price_data(crop, lat, lon, date='2024-12-31', market=None):
+    """Look up the predicted price of a crop at the nearest market."""
     try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        return response.json()["results"][0]["elevation"]
-    except Exception as e:
-        logger.error(f"Error fetching elevation at ({lat}, {lon}): {e}")
-        return 10
-
-def get_price_data(crop, lat, lon, date='2024-12-31'):
-    """Fetch predicted price from CSV."""
-    try:
-        markets = {
-            'Kochi': (9.9312, 76.2673),
-            'Chennai': (13.0827, 80.2707),
-            'Delhi': (28.7041, 77.1025),
-            'Ludhiana': (30.9009, 75.8573)
-        }
-        def haversine(lat1, lon1, lat2, lon2):
-            R = 6371
-            dlat = radians(lat2 - lat1)
-            dlon = radians(lon2 - lon1)
-            a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            return R * c
-        market = min(markets, key=lambda m: haversine(lat, lon, markets[m][0], markets[m][1]))
-        df = pd.read_csv('data/price_predictions.csv')
-        key = f"{crop}_{market}"
-        row = df[(df['crop'] == key) & (df['date'] == date)]
-        return row['predicted_price'].iloc[0] if not row.empty else 1000
-    except Exception as e:
+        return price_table.get_price(crop, market or price_table.nearest_market(lat, lon), date, default=1000)
+    except ValueError as e:
         logger.error(f"Error fetching price for {crop}: {e}")
         return 1000
 
@@ -270,6 +122,25 @@ def calculate_market_status(crop, market, harvest_date, combined_csv):
         logger.error(f"Error calculating market status for {crop}_{market}: {e}")
         return {"oversupply_status": False, "low_demand_status": False}
 
+def location_details_response(env, recommended_crops, more_details):
+    """Build the get_location_details payload from fetched environment data."""
+    weather, soil, climate = env["weather"], env["soil"], env["climate"]
+    response = {
+        "weather": weather,
+        "soil": soil,
+        "climate": climate,
+        "recommended_crops": recommended_crops
+    }
+    if more_details:
+        response.update({
+            "soil": {**soil, "moisture": env["moisture"]},
+            "climate": {**climate, "sunlight_hours": env["sunlight_hours"]},
+            "pest_risk": estimate_pest_risk(weather),
+            "water_availability": estimate_water_availability(climate, soil["soil_type"]),
+            "elevation": soil["elevation"],
+        })
+    return response
+
 @login_required
 def farm_map(request):
     """Render the farm map template."""
@@ -289,13 +160,12 @@ def save_location(request):
             if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
                 return JsonResponse({"error": "Invalid coordinates"}, status=400)
 
+            env = fetch_environment(latitude, longitude)
             # Check if location is water
-            if check_water_location(latitude, longitude):
+            if env["is_water"]:
                 return JsonResponse({"error": "Cannot process request for water location"}, status=400)
 
-            soil = get_soil_data(latitude, longitude)
-            climate = get_climate_data(latitude, longitude)
-            weather = get_weather_data(latitude, longitude)
+            soil, climate, weather = env["soil"], env["climate"], env["weather"]
             recommended_crops = get_crop_recommendations(soil, weather, climate, latitude, longitude)
 
             farm = Farm.objects.create(
@@ -327,30 +197,16 @@ def get_location_details(request):
                 logger.error(f"Invalid coordinates: ({lat}, {lon})")
                 return JsonResponse({"error": "Invalid coordinates"}, status=400)
 
+            env = fetch_environment(lat, lon, more_details=more_details)
             # Check if location is water
-            if check_water_location(lat, lon):
+            if env["is_water"]:
                 logger.info(f"Blocked water location details request for ({lat}, {lon})")
                 return JsonResponse({"error": "Cannot process request for water location"}, status=400)
 
-            weather = get_weather_data(lat, lon)
-            soil = get_soil_data(lat, lon)
-            climate = get_climate_data(lat, lon)
+            weather, soil, climate = env["weather"], env["soil"], env["climate"]
             recommended_crops = get_crop_recommendations(soil, weather, climate, lat, lon)
 
-            response = {
-                "weather": weather,
-                "soil": soil,
-                "climate": climate,
-                "recommended_crops": recommended_crops
-            }
-            if more_details:
-                response.update({
-                    "soil": {**soil, "moisture": get_soil_moisture(lat, lon)},
-                    "climate": {**climate, "sunlight_hours": get_sunlight_hours(lat, lon)},
-                    "pest_risk": estimate_pest_risk(weather),
-                    "water_availability": estimate_water_availability(climate, soil["soil_type"]),
-                    "elevation": soil["elevation"],
-                })
+            response = location_details_response(env, recommended_crops, more_details)
             logger.info(f"Successfully fetched location details for ({lat}, {lon})")
             return JsonResponse(response)
         except (json.JSONDecodeError, ValueError) as e:
@@ -367,12 +223,11 @@ def get_farm_by_coords(request):
             data = json.loads(request.body)
             latitude = float(data.get("latitude"))
             longitude = float(data.get("longitude"))
-            farms = Farm.objects.filter(
-                Q(latitude__range=(latitude - 0.0001, latitude + 0.0001)) &
-                Q(longitude__range=(longitude - 0.0001, longitude + 0.0001))
-            )
-            if farms.exists():
-                farm = farms.first()
+            farms = Farm.objects.in_bbox(
+                latitude - 0.0001, longitude - 0.0001, latitude + 0.0001, longitude + 0.0001
+            ).select_related("farmer").order_by("id")
+            farm = farms.first()
+            if farm is not None:
                 return JsonResponse({
                     "id": farm.id,
                     "farmer": farm.farmer.username,
@@ -414,13 +269,12 @@ def add_farm(request):
             if user_crop and user_crop not in dict(Farm.CROP_CHOICES):
                 return JsonResponse({"error": f"Invalid crop: {user_crop}"}, status=400)
 
+            env = fetch_environment(lat, lon)
             # Check if location is water
-            if check_water_location(lat, lon):
+            if env["is_water"]:
                 return JsonResponse({"error": "Cannot process request for water location"}, status=400)
 
-            weather = get_weather_data(lat, lon)
-            soil = get_soil_data(lat, lon)
-            climate = get_climate_data(lat, lon)
+            weather, soil, climate = env["weather"], env["soil"], env["climate"]
             recommended_crops = get_crop_recommendations(soil, weather, climate, lat, lon)
 
             farm = Farm.objects.create(
@@ -447,71 +301,224 @@ def add_farm(request):
             return JsonResponse({"error": str(e)}, status=400)
     return JsonResponse({"error": "Invalid method"}, status=405)
 
+# Columns read for each farm feature; farmer__username is joined in the same query
+FARM_FEATURE_FIELDS = (
+    "id", "latitude", "longitude", "farmer__username", "status", "area", "soil_type", "climate",
+    "recommended_crop", "user_crop_preferences", "planting_date", "yield_per_acre", "oversupply_risk",
+)
+# Rows fetched from the database, and features written to the response, at a time
+GEOJSON_CHUNK_SIZE = 2000
+
+def farm_feature(row):
+    """Build the GeoJSON Feature of a farm from a FARM_FEATURE_FIELDS values() row."""
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [float(row["longitude"]), float(row["latitude"])]},
+        "properties": {
+            "id": row["id"],
+            "farmer": row["farmer__username"],
+            "status": row["status"],
+            "area": float(row["area"]) if row["area"] else None,
+            "soil_type": row["soil_type"],
+            "climate": row["climate"],
+            "recommended_crop": row["recommended_crop"],
+            "user_crop_preferences": row["user_crop_preferences"],
+            "planting_date": row["planting_date"].strftime('%Y-%m-%d') if row["planting_date"] else None,
+            "yield_per_acre": float(row["yield_per_acre"]) if row["yield_per_acre"] else None,
+            "oversupply_risk": row["oversupply_risk"]
+        }
+    }
+
+def iter_feature_collection(rows, feature=farm_feature, **members):
+    """Yield a GeoJSON FeatureCollection of farm rows piece by piece, GEOJSON_CHUNK_SIZE features at a time.
+
+    Extra top-level members (e.g. the sync cursor) are written before the features.
+    """
+    header = {"type": "FeatureCollection", **members}
+    yield json.dumps(header)[:-1] + ', "features": ['
+    separator = ""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(feature(row)))
+        if len(chunk) == GEOJSON_CHUNK_SIZE:
+            yield separator + ", ".join(chunk)
+            separator, chunk = ", ", []
+    if chunk:
+        yield separator + ", ".join(chunk)
+    yield "]}"
+
+async def iterate_in_thread(iterator):
+    """Yield the pieces of a sync iterator to async code one at a time, each produced in the request's thread."""
+    iterator = iter(iterator)
+    done = object()
+    while True:
+        piece = await sync_to_async(next, thread_sensitive=True)(iterator, done)
+        if piece is done:
+            return
+        yield piece
+
+def streamed(request, response):
+    """Keep a streaming response streaming when served under ASGI.
+
+    Django's ASGI handler reads the whole of a sync iterator with
+    sync_to_async(list) before sending the first byte; an async iterator
+    is sent piece by piece instead. WSGI keeps the sync iterator.
+    """
+    if isinstance(request, ASGIRequest):
+        response.streaming_content = iterate_in_thread(response.streaming_content)
+    return response
+
+def farm_sync_response(request, farms, tombstones, fields, feature):
+    """Stream farms as GeoJSON with a sync cursor; with ?since=<cursor> only what changed after it.
+
+    Delta responses list the changed farms as features and the ids of
+    deleted farms under "removed"; deltas overlap the cursor a little
+    (sync.OVERLAP), so clients apply them by farm id. Clients pass the
+    returned "cursor" as ?since= on their next request.
+    """
+    latest = getattr(request, "farm_sync_latest", None)
+    if latest is None:
+        latest = sync.latest_change(farms, tombstones)
+    members = {"cursor": sync.make_cursor(latest)}
+    since = request.GET.get("since")
+    if since:
+        try:
+            farms, members["removed"] = sync.changes(farms, tombstones, sync.parse_cursor(since))
+        except sync.CursorExpired as e:
+            return JsonResponse({"error": str(e)}, status=410)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+    rows = farms.values(*fields).order_by("id").iterator(chunk_size=GEOJSON_CHUNK_SIZE)
+    return streamed(request, StreamingHttpResponse(iter_feature_collection(rows, feature, **members), content_type="application/json"))
+
+def farm_data_etag(request):
+    return sync.etag(request, *sync.scope(), request.GET.get("since"))
+
 @login_required
+@condition(etag_func=farm_data_etag)
 def get_farm_data(request):
-    """Retrieve all farms as GeoJSON."""
-    farms = Farm.objects.all()
-    features = [
-        {
-            "type": "Feature",
-            "geometry": {"type": "Point", "coordinates": [float(farm.longitude), float(farm.latitude)]},
-            "properties": {
-                "id": farm.id,
-                "farmer": farm.farmer.username,
-                "status": farm.status,
-                "area": float(farm.area) if farm.area else None,
-                "soil_type": farm.soil_type,
-                "climate": farm.climate,
-                "recommended_crop": farm.recommended_crop,
-                "user_crop_preferences": farm.user_crop_preferences,
-                "planting_date": farm.planting_date.strftime('%Y-%m-%d') if farm.planting_date else None,
-                "yield_per_acre": float(farm.yield_per_acre) if farm.yield_per_acre else None,
-                "oversupply_risk": farm.oversupply_risk
-            }
-        } for farm in farms
-    ]
-    return JsonResponse({"type": "FeatureCollection", "features": features})
+    """Retrieve all farms as GeoJSON, streamed so memory use does not grow with the farm count.
+
+    Supports If-None-Match and delta sync with ?since=<cursor>.
+    """
+    farms, tombstones = sync.scope()
+    return farm_sync_response(request, farms, tombstones, FARM_FEATURE_FIELDS, farm_feature)
+
+MY_FARM_FIELDS = (
+    "id", "latitude", "longitude", "farmer__username", "status", "area", "soil_type", "climate",
+    "user_crop_preferences", "recommended_crop", "oversupply_risk", "planting_date", "yield_per_acre",
+)
+
+def my_farm_feature(row):
+    """Build the GeoJSON Feature my_farms shows for a MY_FARM_FIELDS values() row."""
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [float(row["longitude"]), float(row["latitude"])]},
+        "properties": {
+            "id": row["id"],
+            "farmer_name": row["farmer__username"],
+            "status": row["status"] or "green",
+            "area": float(row["area"]) if row["area"] else None,
+            "soil_type": row["soil_type"] or "unknown",
+            "climate": row["climate"] or "unknown",
+            "user_crop_preferences": row["user_crop_preferences"] or "",
+            "recommended_crop": row["recommended_crop"] or "",
+            "oversupply_risk": bool(row["oversupply_risk"]),
+            "planting_date": row["planting_date"].strftime('%Y-%m-%d') if row["planting_date"] else None,
+            "yield_per_acre": float(row["yield_per_acre"]) if row["yield_per_acre"] else None
+        }
+    }
+
+def my_farms_etag(request):
+    # The page embeds the CSRF token and translated text, so both are part of the tag
+    return sync.etag(
+        request, *sync.scope(request.user), request.user.pk, request.GET.urlencode(),
+        request.META.get("CSRF_COOKIE"), getattr(request, "LANGUAGE_CODE", ""),
+    )
+
+def my_farms_page(request, params=None):
+    """Return (page, total) of the user's farms for ?order=, ?after= / ?before= and ?page_size=.
+
+    Shared by the HTML and JSON views; raises ValueError for a bad ordering or
+    cursor. The total is cached until the user's farms change; ?count=0 skips it.
+    """
+    params = request.GET if params is None else params
+    farms = Farm.objects.filter(farmer=request.user)
+    page = pagination.keyset_page(
+        farms.values(*MY_FARM_FIELDS),
+        order=params.get("order", "id"),
+        after=params.get("after"),
+        before=params.get("before"),
+        page_size=pagination.page_size(params.get("page_size")),
+    )
+    total = None
+    if params.get("count", "1") != "0":
+        latest = getattr(request, "farm_sync_latest", None)
+        version = getattr(request, "farm_sync_version", None)
+        total = pagination.cached_count(farms, f"farms:{request.user.pk}", f"{sync.make_cursor(latest)}:{version}")
+    return page, total
 
 @login_required
+@condition(etag_func=my_farms_etag)
+def my_farms_json(request):
+    """Return one page of the user's farms as GeoJSON with next/previous cursors."""
+    try:
+        page, total = my_farms_page(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({
+        "type": "FeatureCollection",
+        "cursor": sync.make_cursor(getattr(request, "farm_sync_latest", None)),
+        "order": page.order,
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+        "total": total,
+        "features": [my_farm_feature(row) for row in page],
+    })
+
+@login_required
+@condition(etag_func=my_farms_etag)
 def my_farms(request):
-    """Render user's farms with pagination."""
+    """Render user's farms a page at a time; ?since=<cursor> returns the JSON delta instead."""
+    if "since" in request.GET:
+        farms, tombstones = sync.scope(request.user)
+        return farm_sync_response(request, farms, tombstones, MY_FARM_FIELDS, my_farm_feature)
     try:
-        farms = Farm.objects.filter(farmer=request.user)
-        paginator = Paginator(farms, 10)
-        page_number = request.GET.get("page", 1)
-        page_obj = paginator.get_page(page_number)
+        try:
+            page, total = my_farms_page(request)
+        except ValueError as e:
+            # Stale or edited links fall back to the first page, as Paginator.get_page did
+            logger.warning(f"Bad my_farms page request: {e}")
+            page, total = my_farms_page(request, {})
         farm_data = {
             "type": "FeatureCollection",
-            "features": [
-                {
-                    "type": "Feature",
-                    "geometry": {"type": "Point", "coordinates": [float(farm.longitude), float(farm.latitude)]},
-                    "properties": {
-                        "id": farm.id,
-                        "farmer_name": farm.farmer.username,
-                        "status": farm.status or "green",
-                        "area": float(farm.area) if farm.area else None,
-                        "soil_type": farm.soil_type or "unknown",
-                        "climate": farm.climate or "unknown",
-                        "user_crop_preferences": farm.user_crop_preferences or "",
-                        "recommended_crop": farm.recommended_crop or "",
-                        "oversupply_risk": bool(farm.oversupply_risk),
-                        "planting_date": farm.planting_date.strftime('%Y-%m-%d') if farm.planting_date else None,
-                        "yield_per_acre": float(farm.yield_per_acre) if farm.yield_per_acre else None
-                    }
-                } for farm in page_obj
-            ]
+            "cursor": sync.make_cursor(getattr(request, "farm_sync_latest", None)),
+            "features": [my_farm_feature(row) for row in page]
         }
         logger.info(f"Loaded {len(farm_data['features'])} farms for user {request.user.username}")
     except Exception as e:
         logger.error(f"Error fetching farms: {e}")
         farm_data = {"type": "FeatureCollection", "features": []}
-        page_obj = None
+        page, total = None, 0
     return render(request, "maps/my_farms.html", {
         "farm_data_json": json.dumps(farm_data, allow_nan=False),
         "has_farms": len(farm_data["features"]) > 0,
-        "page_obj": page_obj,
-        "total_farms": farms.count() if farms else 0
+        "page": page,
+        "order": page.order if page else "id",
+        "total_farms": total
+    })
+
+@login_required
+def provider_stats(request):
+    """Report provider counters, cache hit rates and loaded models for this worker."""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Forbidden"}, status=403)
+    return JsonResponse({
+        "pid": os.getpid(),
+        "providers": provider_client.stats(),
+        "soil_cache": soil_cache.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+        "models": model_loader.stats(),
     })
 
 @csrf_exempt
@@ -528,10 +535,11 @@ def delete_farm(request, farm_id):
             return JsonResponse({"error": "Farm not found"}, status=404)
     return JsonResponse({"error": "Invalid method"}, status=405)
 
-def get_crop_recommendations(soil, weather, climate, lat, lon):
-    """Generate accurate crop recommendations."""
-    feature_names = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
-    features = pd.DataFrame([[
+MODEL_FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+def model_features(soil, weather, climate):
+    """Return the ML model's input features for one location, in MODEL_FEATURES order."""
+    return [
         soil["N"],
         soil["P"],
         soil["K"],
@@ -539,232 +547,87 @@ def get_crop_recommendations(soil, weather, climate, lat, lon):
         weather["humidity"],
         soil["ph"],
         climate["avg_rainfall"]
-    ]], columns=feature_names)
-    
-    recommendations = []
-    valid_crops = {
-        "coconut", "rice", "banana", "cardamom", "cotton", "gram", "groundnut",
-        "maize", "mustard", "pepper", "rubber", "soybean", "tapioca", "turmeric", "wheat"
-    }
+    ]
+
+def get_crop_recommendations(soil, weather, climate, lat, lon):
+    """Generate accurate crop recommendations."""
+    return recommend_crops_batch([(soil, weather, climate, lat, lon)])[0]
+
+def recommend_crops_batch(locations):
+    """Recommend crops for many locations with one model call and one rule-engine pass.
+
+    `locations` is a list of (soil, weather, climate, lat, lon) tuples; returns
+    one recommendation list per location, as get_crop_recommendations does.
+    Locations with near-identical inputs are served from the recommendation cache.
+    """
+    markets = price_table.nearest_markets([loc[3] for loc in locations], [loc[4] for loc in locations])
+    keys = [
+        recommendation_cache.key(soil, weather, climate, market)
+        for (soil, weather, climate, _, _), market in zip(locations, markets)
+    ]
+    results = [recommendation_cache.lookup(key) for key in keys]
+    missing = [i for i, cached in enumerate(results) if cached is None]
+    if missing:
+        scored, cacheable = score_locations([locations[i] for i in missing], [markets[i] for i in missing])
+        for i, recommendations in zip(missing, scored):
+            results[i] = recommendations
+            if cacheable:
+                recommendation_cache.store(keys[i], recommendations)
+    # Callers may add to the entries, so they never get the cached dicts
+    return [[dict(r) for r in recommendations] for recommendations in results]
+
+def score_locations(locations, markets):
+    """Score locations with the ML model and the rule engine.
+
+    Returns (recommendations, cacheable); results are not cacheable when the
+    ML model was unavailable and only rule scores could be used.
+    """
+    ml_recommendations = [[] for _ in locations]
+    cacheable = False
 
     # ML model prediction
+    crop_model = model_loader.get_crop_model()
     if crop_model and hasattr(crop_model, 'predict_proba'):
         try:
-            probs = crop_model.predict_proba(features)[0]
-            model_crops = crop_model.classes_
-            for crop, prob in zip(model_crops, probs):
-                if crop in valid_crops:
-                    score = float(prob * 100)
+            features = pd.DataFrame(
+                [model_features(soil, weather, climate) for soil, weather, climate, _, _ in locations],
+                columns=MODEL_FEATURES,
+            )
+            probs = crop_model.predict_proba(features)
+            model_crops = [(i, crop) for i, crop in enumerate(crop_model.classes_) if crop in VALID_CROPS]
+            for row, recommendations in zip(probs, ml_recommendations):
+                for i, crop in model_crops:
+                    score = float(row[i] * 100)
                     if score >= 35:
                         recommendations.append({"crop": crop, "suitability": score})
+            cacheable = True
         except Exception as e:
             logger.error(f"Error predicting crops: {e}")
 
-    # Rule-based scoring
-    crop_rules = {
-        'coconut': [
-            ('ph', 5.5, 8.0, soil['ph'], 0.15),
-            ('N', 0.5, 1.5, soil['N'], 0.1),
-            ('P', 0.3, 1.0, soil['P'], 0.1),
-            ('K', 0.5, 1.5, soil['K'], 0.1),
-            ('avg_temp', 25, 35, climate['avg_temp'], 0.25),
-            ('humidity', 60, 90, weather['humidity'], 0.1),
-            ('avg_rainfall', 1500, 3000, climate['avg_rainfall'], 0.25),
-            ('soil_type', 'sandy', None, soil['soil_type'], 0.15),
-            ('elevation', 0, 600, soil['elevation'], 0.05)
-        ],
-        'rice': [
-            ('ph', 5.0, 7.0, soil['ph'], 0.15),
-            ('N', 0.5, 1.5, soil['N'], 0.15),
-            ('P', 30, 70, soil['P'], 0.1),
-            ('K', 30, 50, soil['K'], 0.1),
-            ('avg_temp', 20, 35, climate['avg_temp'], 0.2),
-            ('humidity', 70, 100, weather['humidity'], 0.15),
-            ('avg_rainfall', 1000, 2000, climate['avg_rainfall'], 0.3),
-            ('soil_type', 'clay', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1500, soil['elevation'], 0.05)
-        ],
-        'banana': [
-            ('ph', 5.5, 7.5, soil['ph'], 0.15),
-            ('N', 0.7, 1.8, soil['N'], 0.15),
-            ('P', 40, 80, soil['P'], 0.1),
-            ('K', 50, 90, soil['K'], 0.15),
-            ('avg_temp', 20, 35, climate['avg_temp'], 0.2),
-            ('humidity', 70, 95, weather['humidity'], 0.15),
-            ('avg_rainfall', 1000, 2500, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1200, soil['elevation'], 0.05)
-        ],
-        'cardamom': [
-            ('ph', 4.5, 6.5, soil['ph'], 0.15),
-            ('N', 0.5, 1.2, soil['N'], 0.1),
-            ('P', 20, 50, soil['P'], 0.1),
-            ('K', 30, 60, soil['K'], 0.1),
-            ('avg_temp', 15, 30, climate['avg_temp'], 0.2),
-            ('humidity', 70, 95, weather['humidity'], 0.2),
-            ('avg_rainfall', 1500, 4000, climate['avg_rainfall'], 0.25),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 600, 1500, soil['elevation'], 0.1)
-        ],
-        'cotton': [
-            ('ph', 5.5, 7.5, soil['ph'], 0.15),
-            ('N', 0.8, 1.8, soil['N'], 0.15),
-            ('P', 30, 60, soil['P'], 0.1),
-            ('K', 20, 50, soil['K'], 0.1),
-            ('avg_temp', 20, 35, climate['avg_temp'], 0.25),
-            ('humidity', 50, 80, weather['humidity'], 0.1),
-            ('avg_rainfall', 600, 1200, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1000, soil['elevation'], 0.05)
-        ],
-        'gram': [
-            ('ph', 6.0, 7.5, soil['ph'], 0.15),
-            ('N', 0.2, 0.8, soil['N'], 0.1),
-            ('P', 20, 50, soil['P'], 0.15),
-            ('K', 15, 40, soil['K'], 0.1),
-            ('avg_temp', 15, 30, climate['avg_temp'], 0.2),
-            ('humidity', 40, 70, weather['humidity'], 0.1),
-            ('avg_rainfall', 400, 800, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1000, soil['elevation'], 0.05)
-        ],
-        'groundnut': [
-            ('ph', 6.0, 7.5, soil['ph'], 0.15),
-            ('N', 0.3, 1.0, soil['N'], 0.1),
-            ('P', 20, 50, soil['P'], 0.15),
-            ('K', 20, 50, soil['K'], 0.1),
-            ('avg_temp', 20, 35, climate['avg_temp'], 0.2),
-            ('humidity', 50, 80, weather['humidity'], 0.1),
-            ('avg_rainfall', 500, 1000, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'sandy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1000, soil['elevation'], 0.05)
-        ],
-        'maize': [
-            ('ph', 5.5, 7.5, soil['ph'], 0.15),
-            ('N', 0.8, 1.8, soil['N'], 0.15),
-            ('P', 40, 80, soil['P'], 0.1),
-            ('K', 30, 60, soil['K'], 0.1),
-            ('avg_temp', 18, 35, climate['avg_temp'], 0.2),
-            ('humidity', 50, 80, weather['humidity'], 0.1),
-            ('avg_rainfall', 500, 1500, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 2500, soil['elevation'], 0.05)
-        ],
-        'mustard': [
-            ('ph', 6.0, 7.5, soil['ph'], 0.15),
-            ('N', 0.5, 1.5, soil['N'], 0.1),
-            ('P', 20, 50, soil['P'], 0.1),
-            ('K', 20, 50, soil['K'], 0.1),
-            ('avg_temp', 10, 25, climate['avg_temp'], 0.25),
-            ('humidity', 40, 70, weather['humidity'], 0.1),
-            ('avg_rainfall', 300, 700, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1500, soil['elevation'], 0.05)
-        ],
-        'pepper': [
-            ('ph', 4.5, 6.5, soil['ph'], 0.15),
-            ('N', 0.5, 1.5, soil['N'], 0.1),
-            ('P', 20, 50, soil['P'], 0.1),
-            ('K', 30, 60, soil['K'], 0.1),
-            ('avg_temp', 20, 35, climate['avg_temp'], 0.2),
-            ('humidity', 70, 95, weather['humidity'], 0.2),
-            ('avg_rainfall', 1500, 3000, climate['avg_rainfall'], 0.25),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1500, soil['elevation'], 0.05)
-        ],
-        'rubber': [
-            ('ph', 4.5, 6.0, soil['ph'], 0.15),
-            ('N', 0.5, 1.5, soil['N'], 0.1),
-            ('P', 20, 50, soil['P'], 0.1),
-            ('K', 20, 50, soil['K'], 0.1),
-            ('avg_temp', 25, 35, climate['avg_temp'], 0.25),
-            ('humidity', 70, 95, weather['humidity'], 0.15),
-            ('avg_rainfall', 2000, 4000, climate['avg_rainfall'], 0.25),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 700, soil['elevation'], 0.05)
-        ],
-        'soybean': [
-            ('ph', 6.0, 7.5, soil['ph'], 0.15),
-            ('N', 0.5, 1.5, soil['N'], 0.1),
-            ('P', 30, 60, soil['P'], 0.15),
-            ('K', 20, 50, soil['K'], 0.1),
-            ('avg_temp', 20, 30, climate['avg_temp'], 0.2),
-            ('humidity', 50, 80, weather['humidity'], 0.1),
-            ('avg_rainfall', 600, 1200, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1500, soil['elevation'], 0.05)
-        ],
-        'tapioca': [
-            ('ph', 5.0, 7.0, soil['ph'], 0.15),
-            ('N', 0.5, 1.5, soil['N'], 0.1),
-            ('P', 20, 50, soil['P'], 0.1),
-            ('K', 30, 70, soil['K'], 0.15),
-            ('avg_temp', 20, 35, climate['avg_temp'], 0.2),
-            ('humidity', 60, 90, weather['humidity'], 0.1),
-            ('avg_rainfall', 1000, 2000, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1000, soil['elevation'], 0.05)
-        ],
-        'turmeric': [
-            ('ph', 5.5, 7.5, soil['ph'], 0.15),
-            ('N', 0.8, 1.8, soil['N'], 0.15),
-            ('P', 20, 50, soil['P'], 0.1),
-            ('K', 30, 60, soil['K'], 0.1),
-            ('avg_temp', 20, 35, climate['avg_temp'], 0.2),
-            ('humidity', 60, 90, weather['humidity'], 0.1),
-            ('avg_rainfall', 1000, 2000, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 1500, soil['elevation'], 0.05)
-        ],
-        'wheat': [
-            ('ph', 6.0, 7.5, soil['ph'], 0.15),
-            ('N', 0.8, 1.8, soil['N'], 0.15),
-            ('P', 30, 60, soil['P'], 0.1),
-            ('K', 20, 50, soil['K'], 0.1),
-            ('avg_temp', 10, 25, climate['avg_temp'], 0.25),
-            ('humidity', 50, 80, weather['humidity'], 0.1),
-            ('avg_rainfall', 500, 1000, climate['avg_rainfall'], 0.2),
-            ('soil_type', 'loamy', None, soil['soil_type'], 0.1),
-            ('elevation', 0, 2000, soil['elevation'], 0.05)
-        ]
-    }
+    # Rule-based scoring; prices only depend on the nearest market
+    market_prices = {}
+    prices = []
+    for (_, _, _, lat, lon), market in zip(locations, markets):
+        if market not in market_prices:
+            market_prices[market] = [get_price_data(crop, lat, lon, market=market) for crop in crop_rules.CROPS]
+        prices.append(market_prices[market])
+    rule_features = [crop_rules.feature_row(soil, weather, climate) for soil, weather, climate, _, _ in locations]
+    soil_types = [soil["soil_type"] for soil, _, _, _, _ in locations]
+    scores = crop_rules.rule_scores(rule_features, soil_types, prices).tolist()
+    recommendations = [
+        blend_recommendations(recommendations, dict(zip(crop_rules.CROPS, row)))
+        for recommendations, row in zip(ml_recommendations, scores)
+    ]
+    return recommendations, cacheable
 
-    def calculate_suitability(conditions, price, max_price):
-        if not conditions:
-            return 60.0
-        score = 0
-        total_weight = sum(weight for _, _, _, _, weight in conditions)
-        for param, min_val, max_val, actual, weight in conditions:
-            if param == "soil_type" and isinstance(min_val, str):
-                score += (1 if actual == min_val else 0.6) * weight
-            else:
-                if actual is None:
-                    score += 0.6 * weight
-                elif actual < min_val:
-                    normalized = max(0, 1 - (min_val - actual) / (max_val - min_val))
-                elif actual > max_val:
-                    normalized = max(0, 1 - (actual - max_val) / (max_val - min_val))
-                else:
-                    normalized = 1 - abs(actual - (min_val + max_val) / 2) / ((max_val - min_val) / 2)
-                score += normalized * weight
-        env_score = (score / total_weight) if total_weight > 0 else 0.6
-        price_score = price / max_price if max_price > 0 else 1
-        return round((0.7 * env_score + 0.3 * price_score) * 100, 1)
-
-    # Combine ML and rule-based scores
-    rule_scores = {}
-    prices = {crop: get_price_data(crop, lat, lon) for crop in valid_crops}
-    max_price = max(prices.values(), default=1000)
-    
-    for crop in valid_crops:
-        suitability = calculate_suitability(crop_rules.get(crop, []), prices[crop], max_price)
-        rule_scores[crop] = suitability
-
-    for crop in valid_crops:
-        ml_score = next((r["suitability"] for r in recommendations if r["crop"] == crop), 60.0)
+def blend_recommendations(recommendations, rule_scores):
+    """Combine ML suggestions with rule-based scores into the top five crops."""
+    ml_scores = {r["crop"]: r["suitability"] for r in recommendations}
+    recommendations = list(recommendations)
+    for crop in VALID_CROPS:
         rule_score = rule_scores.get(crop, 60.0)
         # Blend scores: 60% ML, 40% rule-based if ML available, else 100% rule-based
-        final_score = (0.6 * ml_score + 0.4 * rule_score) if crop in [r["crop"] for r in recommendations] else rule_score
+        final_score = (0.6 * ml_scores[crop] + 0.4 * rule_score) if crop in ml_scores else rule_score
         if final_score >= 35:
             recommendations.append({"crop": crop, "suitability": final_score})
 
@@ -772,24 +635,121 @@ def get_crop_recommendations(soil, weather, climate, lat, lon):
     recommendations.sort(key=lambda x: x["suitability"], reverse=True)
     return recommendations[:5] or [{"crop": "rice", "suitability": 60.0}]
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate distance between two lat/lon points."""
-    R = 6371
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
-
 def get_nearest_market(lat, lon):
     """Map lat/lon to nearest market."""
-    markets = {
-        'Kochi': (9.9312, 76.2673),
-        'Chennai': (13.0827, 80.2707),
-        'Delhi': (28.7041, 77.1025),
-        'Ludhiana': (30.9009, 75.8573)
+    return price_table.nearest_market(lat, lon)
+
+def estimate_crop_price(crop, harvest_date, lat, lon):
+    """Estimate a crop's price at harvest from predictions, history and seasonality.
+
+    Returns (response, final_price, market); blocking file I/O only, no ORM.
+    """
+    # Get market
+    market = get_nearest_market(lat, lon)
+    crop_key = f"{crop}_{market}"
+    logger.info(f"Predicting price for {crop_key} on {harvest_date}")
+
+    # Load CSVs
+    combined_csv = os.path.join(DATA_DIR, "combined_data.csv")
+    response = {"crop": crop, "date": harvest_date}
+
+    # Initialize variables
+    predicted_price = None
+    historical_avg = None
+    seasonal_factor = 1.0
+
+    # 1. Try price_predictions.csv
+    try:
+        target_date = pd.to_datetime(harvest_date, errors='coerce')
+        if target_date is pd.NaT:
+            raise ValueError("Invalid harvest date")
+
+        # Find closest prediction
+        predicted_price = price_table.latest_price(crop, market, target_date)
+        if predicted_price is not None:
+            logger.info(f"Found prediction: {predicted_price} for {crop_key}")
+        else:
+            logger.warning(f"No prediction for {crop_key} on or before {harvest_date}")
+    except Exception as e:
+        logger.error(f"Error reading price_predictions.csv: {e}")
+
+    # 2. Use combined_data.csv for historical context
+    try:
+        if os.path.exists(combined_csv):
+            df = pd.read_csv(combined_csv)
+            df["date"] = pd.to_datetime(df["date"], errors='coerce')
+            if crop_key in df.columns:
+                # Historical average
+                historical_avg = df[crop_key].replace(0, pd.NA).mean()
+                if pd.isna(historical_avg):
+                    logger.warning(f"No valid historical prices for {crop_key}")
+                else:
+                    logger.info(f"Historical avg for {crop_key}: {historical_avg}")
+
+                # Seasonality: Adjust based on month
+                target_month = pd.to_datetime(harvest_date).month
+                monthly_avg = df[df["date"].dt.month == target_month][crop_key].replace(0, pd.NA).mean()
+                yearly_avg = df[crop_key].replace(0, pd.NA).mean()
+                if not pd.isna(monthly_avg) and not pd.isna(yearly_avg) and yearly_avg != 0:
+                    seasonal_factor = monthly_avg / yearly_avg
+                    seasonal_factor = min(max(seasonal_factor, 0.8), 1.2)  # Cap at ±20%
+                    logger.info(f"Seasonal factor for {crop_key}, month {target_month}: {seasonal_factor}")
+            else:
+                logger.warning(f"Crop {crop_key} not in combined_data.csv")
+    except Exception as e:
+        logger.error(f"Error reading combined_data.csv: {e}")
+
+    # 3. Compute final price
+    # Crop volatility (high for spices, low for staples)
+    volatility = {
+        "cardamom": 0.3, "pepper": 0.25, "turmeric": 0.2, "rubber": 0.2,
+        "coconut": 0.15, "banana": 0.15, "rice": 0.1, "wheat": 0.1,
+        "maize": 0.1, "soybean": 0.1, "cotton": 0.1, "gram": 0.1,
+        "groundnut": 0.1, "mustard": 0.1, "tapioca": 0.1
     }
-    return min(markets, key=lambda m: haversine(lat, lon, markets[m][0], markets[m][1]))
+
+    if predicted_price is not None:
+        # Blend prediction with historical data if available
+        if historical_avg is not None:
+            weight_pred = 0.7 if target_date.year <= 2025 else 0.5  # Trust predictions less for future
+            final_price = (weight_pred * predicted_price + (1 - weight_pred) * historical_avg) * seasonal_factor
+        else:
+            final_price = predicted_price * seasonal_factor
+    elif historical_avg is not None:
+        # Use historical with volatility adjustment
+        final_price = historical_avg * seasonal_factor * (1 + volatility.get(crop, 0.1))
+    else:
+        # Fallback: Dynamic based on crop type
+        fallback_prices = {
+            "coconut": 3000.0, "rice": 2000.0, "banana": 2200.0, "cardamom": 80000.0,
+            "cotton": 5500.0, "gram": 4000.0, "groundnut": 3500.0, "maize": 2100.0,
+            "mustard": 3700.0, "pepper": 45000.0, "rubber": 14000.0, "soybean": 3300.0,
+            "tapioca": 1700.0, "turmeric": 6500.0, "wheat": 2200.0
+        }
+        final_price = fallback_prices.get(crop, 1000.0) * seasonal_factor
+        response["warning"] = "Using fallback price due to missing data"
+
+    # Adjust for market-specific trends (e.g., Kochi vs. Delhi)
+    market_adjust = {
+        "Kochi": 1.1, "Chennai": 1.05, "Delhi": 0.95, "Ludhiana": 0.9
+    }
+    final_price *= market_adjust.get(market, 1.0)
+
+    response["predicted_price"] = round(final_price, 2)
+    response["market"] = market
+    return response, final_price, market
+
+def add_market_status(response, crop, market, harvest_date):
+    """Add oversupply and low demand flags to a price prediction response."""
+    combined_csv = os.path.join(DATA_DIR, "combined_data.csv")
+    market_status = calculate_market_status(crop, market, harvest_date, combined_csv)
+    response.update({
+        "oversupply_status": market_status["oversupply_status"],
+        "low_demand_status": market_status["low_demand_status"]
+    })
+    if market_status["oversupply_status"]:
+        response["warning"] = response.get("warning", "") + f" High oversupply risk for {crop} in {market}"
+    return response
 
 @csrf_exempt
 @login_required
@@ -807,114 +767,12 @@ def get_price_prediction(request):
                 return JsonResponse({"error": "Crop and harvest date required"}, status=400)
 
             # Validate crop
-            valid_crops = {
-                "coconut", "rice", "banana", "cardamom", "cotton", "gram", "groundnut",
-                "maize", "mustard", "pepper", "rubber", "soybean", "tapioca", "turmeric", "wheat"
-            }
-            if crop not in valid_crops:
+            if crop not in VALID_CROPS:
                 logger.error(f"Invalid crop: {crop}")
                 return JsonResponse({"error": f"Invalid crop: {crop}"}, status=400)
 
-            # Get market
-            market = get_nearest_market(lat, lon)
+            response, final_price, market = estimate_crop_price(crop, harvest_date, lat, lon)
             crop_key = f"{crop}_{market}"
-            logger.info(f"Predicting price for {crop_key} on {harvest_date}")
-
-            # Load CSVs
-            price_csv = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "price_predictions.csv")
-            combined_csv = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "combined_data.csv")
-            response = {"crop": crop, "date": harvest_date}
-
-            # Initialize variables
-            predicted_price = None
-            historical_avg = None
-            seasonal_factor = 1.0
-
-            # 1. Try price_predictions.csv
-            try:
-                if not os.path.exists(price_csv):
-                    logger.warning(f"Price CSV missing at {price_csv}")
-                else:
-                    df = pd.read_csv(price_csv)
-                    df["date"] = pd.to_datetime(df["date"], errors='coerce')
-                    target_date = pd.to_datetime(harvest_date, errors='coerce')
-                    if target_date is pd.NaT:
-                        raise ValueError("Invalid harvest date")
-
-                    # Find closest prediction
-                    prediction = df[(df["crop"] == crop_key) & (df["date"] <= target_date)].sort_values("date", ascending=False)
-                    if not prediction.empty:
-                        predicted_price = float(prediction.iloc[0]["predicted_price"])
-                        logger.info(f"Found prediction: {predicted_price} for {crop_key}")
-                    else:
-                        logger.warning(f"No prediction for {crop_key} on or before {harvest_date}")
-            except Exception as e:
-                logger.error(f"Error reading price_predictions.csv: {e}")
-
-            # 2. Use combined_data.csv for historical context
-            try:
-                if os.path.exists(combined_csv):
-                    df = pd.read_csv(combined_csv)
-                    df["date"] = pd.to_datetime(df["date"], errors='coerce')
-                    if crop_key in df.columns:
-                        # Historical average
-                        historical_avg = df[crop_key].replace(0, pd.NA).mean()
-                        if pd.isna(historical_avg):
-                            logger.warning(f"No valid historical prices for {crop_key}")
-                        else:
-                            logger.info(f"Historical avg for {crop_key}: {historical_avg}")
-
-                        # Seasonality: Adjust based on month
-                        target_month = pd.to_datetime(harvest_date).month
-                        monthly_avg = df[df["date"].dt.month == target_month][crop_key].replace(0, pd.NA).mean()
-                        yearly_avg = df[crop_key].replace(0, pd.NA).mean()
-                        if not pd.isna(monthly_avg) and not pd.isna(yearly_avg) and yearly_avg != 0:
-                            seasonal_factor = monthly_avg / yearly_avg
-                            seasonal_factor = min(max(seasonal_factor, 0.8), 1.2)  # Cap at ±20%
-                            logger.info(f"Seasonal factor for {crop_key}, month {target_month}: {seasonal_factor}")
-                    else:
-                        logger.warning(f"Crop {crop_key} not in combined_data.csv")
-            except Exception as e:
-                logger.error(f"Error reading combined_data.csv: {e}")
-
-            # 3. Compute final price
-            # Crop volatility (high for spices, low for staples)
-            volatility = {
-                "cardamom": 0.3, "pepper": 0.25, "turmeric": 0.2, "rubber": 0.2,
-                "coconut": 0.15, "banana": 0.15, "rice": 0.1, "wheat": 0.1,
-                "maize": 0.1, "soybean": 0.1, "cotton": 0.1, "gram": 0.1,
-                "groundnut": 0.1, "mustard": 0.1, "tapioca": 0.1
-            }
-
-            if predicted_price is not None:
-                # Blend prediction with historical data if available
-                if historical_avg is not None:
-                    weight_pred = 0.7 if target_date.year <= 2025 else 0.5  # Trust predictions less for future
-                    final_price = (weight_pred * predicted_price + (1 - weight_pred) * historical_avg) * seasonal_factor
-                else:
-                    final_price = predicted_price * seasonal_factor
-            elif historical_avg is not None:
-                # Use historical with volatility adjustment
-                final_price = historical_avg * seasonal_factor * (1 + volatility.get(crop, 0.1))
-            else:
-                # Fallback: Dynamic based on crop type
-                fallback_prices = {
-                    "coconut": 3000.0, "rice": 2000.0, "banana": 2200.0, "cardamom": 80000.0,
-                    "cotton": 5500.0, "gram": 4000.0, "groundnut": 3500.0, "maize": 2100.0,
-                    "mustard": 3700.0, "pepper": 45000.0, "rubber": 14000.0, "soybean": 3300.0,
-                    "tapioca": 1700.0, "turmeric": 6500.0, "wheat": 2200.0
-                }
-                final_price = fallback_prices.get(crop, 1000.0) * seasonal_factor
-                response["warning"] = "Using fallback price due to missing data"
-
-            # Adjust for market-specific trends (e.g., Kochi vs. Delhi)
-            market_adjust = {
-                "Kochi": 1.1, "Chennai": 1.05, "Delhi": 0.95, "Ludhiana": 0.9
-            }
-            final_price *= market_adjust.get(market, 1.0)
-
-            response["predicted_price"] = round(final_price, 2)
-            response["market"] = market
 
             # 4. Add farm-specific calculations
             if farm_id:
@@ -928,13 +786,7 @@ def get_price_prediction(request):
                     response["warning"] = response.get("warning", "") + " Farm not found"
 
             # 5. Add market status (oversupply and low demand)
-            market_status = calculate_market_status(crop, market, harvest_date, combined_csv)
-            response.update({
-                "oversupply_status": market_status["oversupply_status"],
-                "low_demand_status": market_status["low_demand_status"]
-            })
-            if market_status["oversupply_status"]:
-                response["warning"] = response.get("warning", "") + f" High oversupply risk for {crop} in {market}"
+            add_market_status(response, crop, market, harvest_date)
 
             logger.info(f"Final price for {crop_key}: {response['predicted_price']}")
             return JsonResponse(response, status=200)
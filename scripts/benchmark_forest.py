@@ -0,0 +1,64 @@
+"""Check the array forest against scikit-learn and time both.
+
+Run from the project root:
+
+    python scripts/benchmark_forest.py --rows 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agrichain.settings")
+
+import django
+
+django.setup()
+
+import numpy as np
+import pandas as pd
+from maps import forest
+from maps.model_loader import CROP_MODEL_PATH, get_model
+from maps.views import MODEL_FEATURES
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--rows", type=int, default=5000, help="Random rows for the parity check")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+model = get_model(CROP_MODEL_PATH)
+if model is None:
+    sys.exit(f"Could not load {CROP_MODEL_PATH}")
+arrays = forest.export_forest(model)
+
+# Parity: random rows spanning the training ranges plus the training data itself
+rng = np.random.default_rng(args.seed)
+low = np.array([0, 5, 5, 8, 14, 3.5, 20])
+high = np.array([140, 145, 205, 44, 100, 10, 300])
+X = pd.DataFrame(low + rng.random((args.rows, len(MODEL_FEATURES))) * (high - low), columns=MODEL_FEATURES)
+if os.path.exists("data/crop_data.csv"):
+    X = pd.concat([X, pd.read_csv("data/crop_data.csv")[MODEL_FEATURES]], ignore_index=True)
+expected = model.predict_proba(X)
+actual = arrays.predict_proba(X)
+difference = np.abs(expected - actual).max()
+same_class = (expected.argmax(axis=1) == actual.argmax(axis=1)).mean()
+print(f"parity over {len(X)} rows: max |proba difference| {difference:.2e}, same top class {same_class:.2%}")
+
+def timed(predict, rows, repeat):
+    predict(rows)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predict(rows)
+    return (time.perf_counter() - start) / repeat * 1000
+
+print(f"{'rows':>6} {'sklearn ms':>11} {'array ms':>9} {'speed-up':>9}")
+for n in (1, 16, 64, 256, 1024):
+    rows = X.iloc[:n]
+    repeat = max(3, 400 // n)
+    sk = timed(model.predict_proba, rows, repeat)
+    arr = timed(arrays.predict_proba, rows, repeat)
+    print(f"{n:>6} {sk:>11.3f} {arr:>9.3f} {sk / arr:>8.1f}x")
+
+if difference > 1e-9:
+    sys.exit("Array forest does not match scikit-learn")
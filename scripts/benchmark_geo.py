@@ -0,0 +1,71 @@
+"""Time the vectorized maps.geo helpers against a scalar math.haversine loop.
+
+Run from the project root:
+
+    python scripts/benchmark_geo.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from maps import geo  # noqa: E402 (plain NumPy module, no Django setup needed)
+
+MARKETS = {
+    'Kochi': (9.9312, 76.2673),
+    'Chennai': (13.0827, 80.2707),
+    'Delhi': (28.7041, 77.1025),
+    'Ludhiana': (30.9009, 75.8573)
+}
+
+def scalar_haversine(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+parser.add_argument("--radius", type=float, default=10.0, help="Radius (km) of the within_km query")
+parser.add_argument("--scalar-limit", type=int, default=100000, help="Skip the scalar loop above this size")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+rng = np.random.default_rng(args.seed)
+sites = geo.Sites(MARKETS)
+origin = (10.0, 76.0)
+print(f"{'points':>9} {'scalar 1:n':>11} {'numpy 1:n':>10} {'within_km':>10} {'nearest site':>13} {'scalar site':>12} {'max err km':>11}")
+for n in args.sizes:
+    # Points spread over India, roughly where farms are registered
+    lats = rng.uniform(8, 32, n)
+    lons = rng.uniform(70, 88, n)
+    repeat = 5 if n <= 100000 else 2
+
+    numpy_ms, distances = timed(lambda: geo.haversine_km(*origin, lats, lons), repeat)
+    within_ms, _ = timed(lambda: geo.within_km(*origin, lats, lons, args.radius), repeat)
+    sites_ms, (nearest, _) = timed(lambda: sites.nearest(lats, lons), repeat)
+    if n <= args.scalar_limit:
+        pairs = list(zip(lats.tolist(), lons.tolist()))
+        scalar_ms, scalar = timed(lambda: [scalar_haversine(*origin, lat, lon) for lat, lon in pairs], 1)
+        site_coords = list(MARKETS.values())
+        site_ms, scalar_nearest = timed(lambda: [
+            min(range(len(site_coords)), key=lambda i: scalar_haversine(lat, lon, *site_coords[i]))
+            for lat, lon in pairs
+        ], 1)
+        error = float(np.abs(np.asarray(scalar) - distances).max())
+        assert list(nearest) == scalar_nearest, "nearest site differs from the scalar search"
+        print(f"{n:>9} {scalar_ms:>9.1f}ms {numpy_ms:>8.2f}ms {within_ms:>8.2f}ms {sites_ms:>11.2f}ms {site_ms:>10.1f}ms {error:>11.2e}")
+    else:
+        print(f"{n:>9} {'-':>11} {numpy_ms:>8.2f}ms {within_ms:>8.2f}ms {sites_ms:>11.2f}ms {'-':>12} {'-':>11}")
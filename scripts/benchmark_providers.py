@@ -0,0 +1,75 @@
+"""Measure fetch_environment latency against the local provider stub.
+
+The run uses a throwaway database, so the fixture soil and forecasts it
+caches never reach the real SoilCell table and cache, and every run starts
+cold. Start the stub first, then run this from the project root:
+
+    python manage.py provider_stub --latency 150 --provider-latency soilgrids=600
+    MAPS_PROVIDER_STUB=http://127.0.0.1:8099 python scripts/benchmark_providers.py --requests 200 --concurrency 16
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agrichain.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from maps import provider_client
+from maps.environment import fetch_environment
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--requests", type=int, default=100)
+parser.add_argument("--concurrency", type=int, default=8)
+parser.add_argument("--more-details", action="store_true")
+parser.add_argument("--seed", type=int, default=0)
+# Points are drawn around Kochi; a small spread exercises the grid-cell caches
+parser.add_argument("--spread", type=float, default=0.5, help="Degrees around the centre point")
+args = parser.parse_args()
+
+if not settings.MAPS_PROVIDER_URLS:
+    sys.exit("Set MAPS_PROVIDER_STUB to the provider stub address first.")
+
+random.seed(args.seed)
+points = [
+    (9.9312 + random.uniform(-args.spread, args.spread), 76.2673 + random.uniform(-args.spread, args.spread))
+    for _ in range(args.requests)
+]
+
+if connection.vendor == "sqlite":
+    # A file rather than the default in-memory test database, so the pool threads can write concurrently
+    connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+database = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+def timed(point):
+    start = time.perf_counter()
+    fetch_environment(*point, more_details=args.more_details)
+    return time.perf_counter() - start
+
+try:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = sorted(pool.map(timed, points))
+    elapsed = time.perf_counter() - start
+finally:
+    connection.creation.destroy_test_db(database, verbosity=0)
+
+def percentile(p):
+    return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+print(f"{args.requests} requests, concurrency {args.concurrency}: {elapsed:.2f}s, {args.requests / elapsed:.1f} req/s")
+print(f"latency ms: mean {statistics.mean(latencies) * 1000:.1f}, p50 {percentile(50):.1f}, "
+      f"p95 {percentile(95):.1f}, p99 {percentile(99):.1f}, max {latencies[-1] * 1000:.1f}")
+for name, counters in provider_client.stats().items():
+    print(f"{name}: {counters['requests']} requests, {counters['errors']} errors, "
+          f"{counters['retries']} retries, avg {counters['avg_latency'] * 1000:.1f} ms, circuit {counters['circuit']}")
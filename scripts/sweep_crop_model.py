@@ -0,0 +1,134 @@
+"""Sweep crop model sizes and keep the smallest one within an accuracy tolerance.
+
+Trains random forests over a grid of n_estimators, max_depth and leaf
+precision (float64 or float32 leaves of the array export served by
+maps.forest), then reports held-out accuracy, inference latency and artifact
+size for each. The smallest artifact whose accuracy is within --tolerance of
+the best is written as <output>.pkl plus its <output>.forest array export.
+
+Run from the project root, e.g. for the model in maps/:
+
+    python scripts/sweep_crop_model.py --data crop_ai/Crop_recommendation.csv --target label \
+        --output data/sweep/crop_recommendation_model
+
+or for the one trained by scripts/train_model.py:
+
+    python scripts/sweep_crop_model.py --data data/crop_data.csv --target crop
+"""
+import argparse
+import io
+import itertools
+import logging
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from maps import forest  # noqa: E402 (plain NumPy module, no Django setup needed)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+def parse_depth(value):
+    return None if value.lower() == "none" else int(value)
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--data", default="crop_ai/Crop_recommendation.csv")
+parser.add_argument("--target", default="label", help="Label column of --data")
+parser.add_argument("--estimators", type=int, nargs="+", default=[10, 25, 50, 100])
+parser.add_argument("--depths", type=parse_depth, nargs="+", default=[6, 8, 12, 16, None], help="Use 'none' for unlimited")
+parser.add_argument("--tolerance", type=float, default=0.01, help="Accepted accuracy drop from the best model")
+parser.add_argument("--test-size", type=float, default=0.2)
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--output", default="data/sweep/crop_recommendation_model", help="Path prefix of the chosen model")
+args = parser.parse_args()
+
+data = pd.read_csv(args.data)
+X = data[FEATURES]
+y = data[args.target]
+X_train, X_test, y_train, y_test = train_test_split(
+    X, y, test_size=args.test_size, random_state=args.seed, stratify=y
+)
+logger.info(f"Training set: {X_train.shape}, held-out set: {X_test.shape}")
+
+def pickle_size(model):
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell()
+
+def forest_size(arrays):
+    return sum(np.asarray(getattr(arrays, name)).nbytes for name in ("feature", "threshold", "left", "right", "value", "roots"))
+
+def row_latency_ms(arrays, rows, repeat=200):
+    samples = []
+    for i in range(repeat):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        arrays.predict_proba(row)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples) * 1000)
+
+def batch_latency_ms(arrays, rows, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        arrays.predict_proba(rows)
+    return (time.perf_counter() - start) / repeat * 1000
+
+test_rows = X_test.to_numpy(dtype=np.float64)
+batch = test_rows[:64]
+results = []
+for n_estimators, max_depth in itertools.product(args.estimators, args.depths):
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=args.seed)
+    model.fit(X_train, y_train)
+    for leaf_dtype in (np.float64, np.float32):
+        arrays = forest.export_forest(model, leaf_dtype=leaf_dtype)
+        accuracy = accuracy_score(y_test, arrays.predict(test_rows))
+        results.append({
+            "n_estimators": n_estimators,
+            "max_depth": max_depth,
+            "leaves": np.dtype(leaf_dtype).name,
+            "accuracy": accuracy,
+            "row_ms": row_latency_ms(arrays, test_rows),
+            "batch64_ms": batch_latency_ms(arrays, batch),
+            "pickle_bytes": pickle_size(model),
+            "forest_bytes": forest_size(arrays),
+            "model": model,
+            "arrays": arrays,
+        })
+        logger.info(
+            f"trees={n_estimators:<4} depth={str(max_depth):<5} leaves={np.dtype(leaf_dtype).name:<8} "
+            f"accuracy={accuracy:.4f} row={results[-1]['row_ms']:.3f}ms "
+            f"batch64={results[-1]['batch64_ms']:.2f}ms forest={results[-1]['forest_bytes'] / 1024:.0f}KiB"
+        )
+
+report = pd.DataFrame([{k: v for k, v in r.items() if k not in ("model", "arrays")} for r in results])
+print(report.sort_values(["forest_bytes", "accuracy"], ascending=[True, False]).to_string(index=False))
+
+best = max(r["accuracy"] for r in results)
+eligible = [r for r in results if r["accuracy"] >= best - args.tolerance]
+chosen = min(eligible, key=lambda r: (r["forest_bytes"], r["row_ms"]))
+logger.info(
+    f"Best accuracy {best:.4f}; chose trees={chosen['n_estimators']} depth={chosen['max_depth']} "
+    f"leaves={chosen['leaves']} with accuracy {chosen['accuracy']:.4f}, "
+    f"{chosen['forest_bytes'] / 1024:.0f}KiB array export, {chosen['row_ms']:.3f}ms per row"
+)
+
+os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+model_path = f"{args.output}.pkl"
+joblib.dump(chosen["model"], model_path)
+chosen["arrays"].save(f"{args.output}.forest", source=forest.source_signature(model_path))
+report.to_csv(f"{args.output}.sweep.csv", index=False)
+logger.info(
+    f"Saved {model_path} and its array export; publish it with "
+    f"`python manage.py model_registry publish {model_path} --name crop_recommendation --export-forest"
+    f"{' --float32-leaves' if chosen['leaves'] == 'float32' else ''}`"
+)